@@ -1,11 +1,15 @@
 ### Para coletar dado da FGV - Faixas de Renda e Classes Sociais ###
-import requests
 import pandas as pd
 import re
 import os
-from bs4 import BeautifulSoup
-import time
-from urllib.parse import urljoin, urlparse
+import sys
+from urllib.parse import urljoin
+from extracao_planilhas import extrair_planilhas
+from extracao_pdf import extrair_pdfs
+
+# Módulos compartilhados ficam na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classes_renda import definicao_classes
 
 def setup_directories():
     """Cria estrutura de diretórios necessária"""
@@ -19,10 +23,16 @@ def setup_directories():
         os.makedirs(directory, exist_ok=True)
         print(f"✓ Diretório {directory} criado/verificado")
 
-def get_fgv_social_data():
+def get_fgv_social_data(profundidade=0, max_concorrencia=4):
     """
     Coleta dados da FGV Social sobre classes sociais e desigualdade
+    
+    profundidade=0 visita só as páginas semente; valores maiores seguem os links
+    internos do site (ver FGV/crawler.py)
     """
+    # crawler (requests/bs4) só é necessário na coleta; o relatório roda sem ele
+    from crawler import rastrear_site, CABECALHOS_PADRAO
+
     print("Coletando dados da FGV Social...")
     
     base_url = "https://cps.fgv.br"
@@ -35,84 +45,44 @@ def get_fgv_social_data():
         f"{base_url}/series-sociais",
     ]
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    headers = dict(CABECALHOS_PADRAO)
     
-    all_reports = []
-    
-    for url in search_urls:
-        try:
-            print(f"🔍 Acessando: {url}")
-            response = requests.get(url, headers=headers, timeout=15)
-            
-            if response.status_code != 200:
-                print(f"⚠️  Página não encontrada: {url} (Status: {response.status_code})")
-                continue
-                
-            soup = BeautifulSoup(response.content, 'html.parser')
-            print(f"✓ Página {url} carregada com sucesso")
-            
-            # Estratégias múltiplas para encontrar dados
-            found_links = find_data_links(soup, base_url)
-            all_reports.extend(found_links)
-            
-            print(f"✅ {len(found_links)} links encontrados em {url}")
-            
-            # Delay para não sobrecarregar o servidor
-            time.sleep(1)
-                    
-        except Exception as e:
-            print(f"❌ Erro ao acessar {url}: {e}")
-            continue
+    # Crawler concorrente com 1s entre requisições ao mesmo host e estado persistente
+    all_reports = rastrear_site(
+        search_urls,
+        profundidade=profundidade,
+        max_concorrencia=max_concorrencia,
+        intervalo_por_host=1.0,
+        cabecalhos=headers,
+    )
     
     # Processar e salvar resultados
     return process_found_links(all_reports, headers)
 
 def find_data_links(soup, base_url):
-    """Encontra links para dados usando múltiplas estratégias"""
-    potential_links = []
+    """Encontra links para dados (extensão no href ou palavra-chave no texto) numa única passada"""
+    from crawler import classificar_link
+
+    unique_links = {}
     
-    # Estratégia 1: Links com extensões de arquivo de dados
-    file_extensions = ['.xlsx', '.xls', '.csv', '.zip', '.pdf']
     for link in soup.find_all('a', href=True):
-        href = link['href'].lower()
-        if any(ext in href for ext in file_extensions):
-            full_url = urljoin(base_url, link['href'])
-            potential_links.append({
-                'titulo': link.get_text(strip=True) or "Arquivo sem título",
-                'url': full_url,
-                'tipo': 'arquivo_dados',
-                'fonte': 'extensao_arquivo'
-            })
-    
-    # Estratégia 2: Links com palavras-chave específicas
-    data_keywords = [
-        'dados', 'dataset', 'planilha', 'excel', 'csv', 
-        'pesquisa', 'estudo', 'relatório', 'indicador', 
-        'série', 'estatística', 'número', 'resultado'
-    ]
+        classificacao = classificar_link(link['href'], link.get_text(strip=True))
+        if classificacao is None:
+            continue
+        
+        full_url = urljoin(base_url, link['href'])
+        if full_url in unique_links:
+            continue
+        
+        tipo, fonte = classificacao
+        unique_links[full_url] = {
+            'titulo': link.get_text(strip=True) or "Arquivo sem título",
+            'url': full_url,
+            'tipo': tipo,
+            'fonte': fonte
+        }
     
-    for link in soup.find_all('a', href=True):
-        text = link.get_text(strip=True).lower()
-        if any(keyword in text for keyword in data_keywords):
-            full_url = urljoin(base_url, link['href'])
-            potential_links.append({
-                'titulo': link.get_text(strip=True),
-                'url': full_url,
-                'tipo': 'link_dados',
-                'fonte': 'palavra_chave'
-            })
-    
-    # Remover duplicatas
-    unique_links = []
-    seen_urls = set()
-    for link in potential_links:
-        if link['url'] not in seen_urls:
-            unique_links.append(link)
-            seen_urls.add(link['url'])
-    
-    return unique_links
+    return list(unique_links.values())
 
 def process_found_links(reports, headers):
     """Processa os links encontrados e baixa arquivos relevantes"""
@@ -130,59 +100,92 @@ def process_found_links(reports, headers):
     # Baixar arquivos de dados
     downloaded_files = download_data_files(reports, headers)
     
-    if not downloaded_files:
-        print("📊 Nenhum arquivo de dados baixado. Criando dados realistas...")
+    # Extrair as tabelas das planilhas baixadas; dados de exemplo só se nada for aproveitável
+    tabelas = extract_spreadsheet_tables(downloaded_files)
+    serie_pdf, classes_pdf = extract_pdf_tables(downloaded_files)
+    
+    if tabelas.empty and serie_pdf.empty and classes_pdf.empty:
+        print("📊 Nenhuma tabela extraída dos arquivos baixados. Criando dados realistas...")
         create_realistic_fgv_data()
     
     return reports
 
-def download_data_files(reports, headers):
-    """Tenta baixar arquivos de dados"""
-    downloaded = []
-    
-    for i, report in enumerate(reports):
-        url = report['url']
-        
-        # Verificar se é um arquivo baixável
-        if any(ext in url.lower() for ext in ['.xlsx', '.xls', '.csv', '.zip']):
-            try:
-                print(f"⬇️  Tentando baixar: {report['titulo']}")
-                response = requests.get(url, headers=headers, timeout=15)
-                
-                if response.status_code == 200:
-                    # Extrair extensão do arquivo
-                    parsed_url = urlparse(url)
-                    filename = os.path.basename(parsed_url.path)
-                    if not filename:
-                        ext = url.split('.')[-1].lower() if '.' in url else 'dat'
-                        filename = f"fgv_dados_{i}.{ext}"
-                    
-                    filepath = f'data/raw/fgv/{filename}'
-                    
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                    
-                    downloaded.append({
-                        'arquivo': filename,
-                        'tamanho': len(response.content),
-                        'url': url,
-                        'titulo': report['titulo']
-                    })
-                    
-                    print(f"✅ Baixado: {filename} ({len(response.content)} bytes)")
-                else:
-                    print(f"❌ Falha no download: Status {response.status_code}")
-                    
-            except Exception as e:
-                print(f"❌ Erro ao baixar {url}: {e}")
+def download_data_files(reports, headers, max_workers=8):
+    """Baixa em paralelo os arquivos de dados (streaming, retomável e sem duplicatas)"""
+    from downloads import baixar_arquivos
+
+    registros = baixar_arquivos(
+        reports,
+        destino='data/raw/fgv',
+        manifesto='data/raw/fgv/arquivos_baixados.csv',
+        max_workers=max_workers,
+        cabecalhos=headers,
+    )
+    
+    # Arquivos disponíveis localmente: baixados agora, já baixados antes ou duplicatas de outro
+    downloaded = [
+        {
+            'arquivo': r['duplicado_de'] or r['arquivo'],
+            'tamanho': r['tamanho'],
+            'url': r['url'],
+            'titulo': r['titulo']
+        }
+        for r in registros if r['status'] != 'falha'
+    ]
     
     if downloaded:
-        df_downloads = pd.DataFrame(downloaded)
-        df_downloads.to_csv('data/raw/fgv/arquivos_baixados.csv', index=False, encoding='utf-8')
-        print(f"✅ {len(downloaded)} arquivos baixados com sucesso")
+        print(f"✅ {len(downloaded)} arquivos disponíveis ({sum(r['status'] == 'baixado' for r in registros)} baixados agora)")
     
     return downloaded
 
+def extract_spreadsheet_tables(downloaded_files, processos=None):
+    """Extrai as tabelas das planilhas baixadas para formato longo (com cache por hash do arquivo)"""
+    planilhas = sorted({
+        os.path.join('data/raw/fgv', f['arquivo'])
+        for f in downloaded_files
+        if f['arquivo'].lower().endswith(('.xlsx', '.xls'))
+    })
+    planilhas = [p for p in planilhas if os.path.exists(p)]
+    if not planilhas:
+        return pd.DataFrame()
+    
+    print(f"📑 Extraindo tabelas de {len(planilhas)} planilhas...")
+    tabelas = extrair_planilhas(planilhas, processos=processos)
+    
+    if not tabelas.empty:
+        tabelas.to_csv('data/raw/fgv/tabelas_extraidas.csv', index=False, encoding='utf-8')
+        print(f"✅ {len(tabelas)} valores salvos em data/raw/fgv/tabelas_extraidas.csv")
+    
+    return tabelas
+
+def extract_pdf_tables(downloaded_files, processos=None):
+    """Extrai dos relatórios em PDF a série de desigualdade e a distribuição por classes"""
+    pdfs = sorted({
+        os.path.join('data/raw/fgv', f['arquivo'])
+        for f in downloaded_files
+        if f['arquivo'].lower().endswith('.pdf')
+    })
+    pdfs = [p for p in pdfs if os.path.exists(p)]
+    if not pdfs:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    print(f"📄 Extraindo tabelas de {len(pdfs)} relatórios em PDF...")
+    try:
+        serie, classes = extrair_pdfs(pdfs, processos=processos)
+    except ImportError as e:
+        print(f"⚠️  {e}")
+        return pd.DataFrame(), pd.DataFrame()
+    
+    # Mesmo esquema dos arquivos principais, em arquivos próprios (com documento e página de origem)
+    if not serie.empty:
+        serie.to_csv('data/raw/fgv/serie_temporal_desigualdade_pdf.csv', index=False, encoding='utf-8')
+        print(f"✅ {len(serie)} linhas salvas em data/raw/fgv/serie_temporal_desigualdade_pdf.csv")
+    if not classes.empty:
+        classes.to_csv('data/raw/fgv/distribuicao_classes_sociais_pdf.csv', index=False, encoding='utf-8')
+        print(f"✅ {len(classes)} linhas salvas em data/raw/fgv/distribuicao_classes_sociais_pdf.csv")
+    
+    return serie, classes
+
 def create_realistic_fgv_data():
     """
     Cria dados realistas baseados em pesquisas reais da FGV
@@ -228,61 +231,8 @@ def create_enhanced_class_definition():
     """
     Cria definição detalhada baseada na metodologia FGV
     """
-    sm = 1320  # Salário mínimo 2023
-    
-    classes_sociais = {
-        'extrema_pobreza': {
-            'min': 0, 
-            'max': 0.25 * sm, 
-            'descricao': 'Até 0,25 SM',
-            'renda_maxima': 330,
-            'faixa_sm': 'Até 0,25 SM'
-        },
-        'pobreza': {
-            'min': 0.25 * sm, 
-            'max': 1 * sm, 
-            'descricao': '0,25 a 1 SM',
-            'renda_maxima': 1320,
-            'faixa_sm': '0,25-1 SM'
-        },
-        'vulnerabilidade': {
-            'min': 1 * sm, 
-            'max': 2 * sm, 
-            'descricao': '1 a 2 SM',
-            'renda_maxima': 2640,
-            'faixa_sm': '1-2 SM'
-        },
-        'classe_media_baixa': {
-            'min': 2 * sm, 
-            'max': 4 * sm, 
-            'descricao': '2 a 4 SM',
-            'renda_maxima': 5280,
-            'faixa_sm': '2-4 SM'
-        },
-        'classe_media': {
-            'min': 4 * sm, 
-            'max': 10 * sm, 
-            'descricao': '4 a 10 SM',
-            'renda_maxima': 13200,
-            'faixa_sm': '4-10 SM'
-        },
-        'classe_media_alta': {
-            'min': 10 * sm, 
-            'max': 20 * sm, 
-            'descricao': '10 a 20 SM',
-            'renda_maxima': 26400,
-            'faixa_sm': '10-20 SM'
-        },
-        'classe_alta': {
-            'min': 20 * sm, 
-            'max': None, 
-            'descricao': 'Acima de 20 SM',
-            'renda_maxima': None,
-            'faixa_sm': 'Acima de 20 SM'
-        }
-    }
-    
-    df_classes = pd.DataFrame.from_dict(classes_sociais, orient='index')
+    # Faixas de salário mínimo (SM) de 2023, mesma tabela usada pelo classificador de microdados
+    df_classes = definicao_classes(2023)
     df_classes.to_csv('data/processed/definicao_classes_sociais.csv', encoding='utf-8')
     
     # Criar também uma versão simplificada para uso geral
@@ -0,0 +1,238 @@
+### Crawler concorrente do site da FGV Social com escalonador de cortesia por host ###
+# - concorrência limitada (asyncio + semáforo), com intervalo mínimo entre requisições ao mesmo host
+# - profundidade configurável a partir das páginas semente, restrita aos hosts das sementes
+# - estado persistente (URLs visitadas, hash do conteúdo, ETag/Last-Modified e links extraídos):
+#   numa nova execução, páginas com hash igual não são reprocessadas
+# - a busca é injetável, então o crawler roda contra um espelho local do site
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+
+ARQUIVO_ESTADO = 'data/raw/fgv/estado_crawler.json'
+EXTENSOES_DADOS = ('xlsx', 'xls', 'csv', 'zip', 'pdf')
+PALAVRAS_CHAVE = (
+    'dados', 'dataset', 'planilha', 'excel', 'csv',
+    'pesquisa', 'estudo', 'relatório', 'indicador',
+    'série', 'estatística', 'número', 'resultado',
+)
+CABECALHOS_PADRAO = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Um único padrão para extensão (no href) e palavra-chave (no texto do link).
+# O texto analisado é "href\ntexto"; a posição do match diz de qual parte ele veio.
+PADRAO_LINK = re.compile(
+    r'(?P<extensao>\.(?:' + '|'.join(EXTENSOES_DADOS) + r'))(?=[?#\n])'
+    r'|(?P<palavra>' + '|'.join(re.escape(p) for p in PALAVRAS_CHAVE) + r')'
+)
+
+
+def normalizar_url(url):
+    """Remove o fragmento (#...) e usa '/' como caminho vazio, para não visitar a mesma página duas vezes"""
+    url = urldefrag(url)[0]
+    partes = urlparse(url)
+    if not partes.path:
+        url = partes._replace(path='/').geturl()
+    return url
+
+
+def classificar_link(href, texto):
+    """Retorna ('arquivo_dados', 'extensao_arquivo'), ('link_dados', 'palavra_chave') ou None"""
+    alvo = f"{href.lower()}\n{texto.lower()}"
+    fim_href = len(href)
+    palavra_no_texto = False
+    for match in PADRAO_LINK.finditer(alvo):
+        if match.group('extensao') and match.start() < fim_href:
+            return 'arquivo_dados', 'extensao_arquivo'
+        if match.group('palavra') and match.start() > fim_href:
+            palavra_no_texto = True
+    if palavra_no_texto:
+        return 'link_dados', 'palavra_chave'
+    return None
+
+
+def extrair_links(html, url_base):
+    """
+    Percorre os <a href> uma única vez
+
+    Retorna (links_de_dados, paginas_para_seguir); ambos sem duplicatas e na ordem da página.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    links_dados, paginas = {}, {}
+    for link in soup.find_all('a', href=True):
+        url = normalizar_url(urljoin(url_base, link['href']))
+        if not url.startswith(('http://', 'https://')):
+            continue
+        texto = link.get_text(strip=True)
+        classificacao = classificar_link(link['href'], texto)
+        if classificacao and url not in links_dados:
+            tipo, fonte = classificacao
+            links_dados[url] = {
+                'titulo': texto or "Arquivo sem título",
+                'url': url,
+                'tipo': tipo,
+                'fonte': fonte,
+            }
+        if not (classificacao and classificacao[0] == 'arquivo_dados'):
+            paginas.setdefault(url, None)
+    return list(links_dados.values()), list(paginas)
+
+
+def buscar_http(url, cabecalhos, timeout=15):
+    """Busca padrão via requests; devolve (status, conteúdo em bytes, cabeçalhos da resposta)"""
+    resposta = requests.get(url, headers=cabecalhos, timeout=timeout)
+    return resposta.status_code, resposta.content, dict(resposta.headers)
+
+
+def buscador_espelho_local(raiz):
+    """
+    Busca que lê de um espelho local: http://host/a/b -> <raiz>/host/a/b (ou .../index.html)
+
+    Útil para testes e para re-rodar o crawler offline.
+    """
+    def buscar(url, cabecalhos, timeout=None):
+        partes = urlparse(url)
+        caminho = os.path.join(raiz, partes.netloc, *[p for p in partes.path.split('/') if p])
+        if os.path.isdir(caminho):
+            caminho = os.path.join(caminho, 'index.html')
+        if not os.path.isfile(caminho):
+            return 404, b'', {}
+        with open(caminho, 'rb') as f:
+            return 200, f.read(), {}
+    return buscar
+
+
+class EscalonadorCortesia:
+    """Garante um intervalo mínimo entre inícios de requisições ao mesmo host"""
+
+    def __init__(self, intervalo_por_host=1.0):
+        self.intervalo = intervalo_por_host
+        self._proximo = {}
+        self._travas = {}
+
+    async def aguardar_vez(self, url):
+        host = urlparse(url).netloc
+        trava = self._travas.setdefault(host, asyncio.Lock())
+        async with trava:
+            agora = time.monotonic()
+            espera = self._proximo.get(host, 0) - agora
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._proximo[host] = max(agora, self._proximo.get(host, 0)) + self.intervalo
+
+
+def carregar_estado(caminho=ARQUIVO_ESTADO):
+    if caminho and os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    return {'paginas': {}}
+
+
+def salvar_estado(estado, caminho=ARQUIVO_ESTADO):
+    if not caminho:
+        return
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+
+
+async def _rastrear(sementes, profundidade, max_concorrencia, intervalo_por_host,
+                    cabecalhos, buscar, estado):
+    hosts_permitidos = {urlparse(url).netloc for url in sementes}
+    escalonador = EscalonadorCortesia(intervalo_por_host)
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    visitadas = set()
+    encontrados = {}
+    resumo = {'baixadas': 0, 'inalteradas': 0, 'falhas': 0}
+
+    async def visitar(url):
+        anterior = estado['paginas'].get(url, {})
+        cabecalhos_req = dict(cabecalhos)
+        if anterior.get('etag'):
+            cabecalhos_req['If-None-Match'] = anterior['etag']
+        if anterior.get('last_modified'):
+            cabecalhos_req['If-Modified-Since'] = anterior['last_modified']
+
+        async with semaforo:
+            await escalonador.aguardar_vez(url)
+            try:
+                status, conteudo, resposta = await asyncio.to_thread(buscar, url, cabecalhos_req)
+            except Exception as e:
+                print(f"❌ Erro ao acessar {url}: {e}")
+                resumo['falhas'] += 1
+                return None
+
+        if status == 304 and 'links' in anterior:
+            resumo['inalteradas'] += 1
+            return anterior['links'], anterior.get('paginas', [])
+        if status != 200:
+            print(f"⚠️  Página não encontrada: {url} (Status: {status})")
+            resumo['falhas'] += 1
+            return None
+
+        hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+        if hash_conteudo == anterior.get('hash') and 'links' in anterior:
+            resumo['inalteradas'] += 1
+            links, paginas = anterior['links'], anterior.get('paginas', [])
+        else:
+            resumo['baixadas'] += 1
+            links, paginas = extrair_links(conteudo, url)
+            print(f"✅ {len(links)} links encontrados em {url}")
+
+        estado['paginas'][url] = {
+            'hash': hash_conteudo,
+            'etag': resposta.get('ETag') or resposta.get('etag'),
+            'last_modified': resposta.get('Last-Modified') or resposta.get('last-modified'),
+            'visitado_em': datetime.now().isoformat(timespec='seconds'),
+            'links': links,
+            'paginas': paginas,
+        }
+        return links, paginas
+
+    nivel = [normalizar_url(url) for url in sementes]
+    for profundidade_atual in range(profundidade + 1):
+        nivel = [url for url in dict.fromkeys(nivel) if url not in visitadas]
+        if not nivel:
+            break
+        visitadas.update(nivel)
+        resultados = await asyncio.gather(*(visitar(url) for url in nivel))
+
+        proximo = []
+        for url, resultado in zip(nivel, resultados):
+            if resultado is None:
+                continue
+            links, paginas = resultado
+            for link in links:
+                encontrados.setdefault(link['url'], {**link, 'pagina_origem': url})
+            proximo.extend(p for p in paginas if urlparse(p).netloc in hosts_permitidos)
+        nivel = proximo
+
+    return list(encontrados.values()), resumo
+
+
+def rastrear_site(sementes, profundidade=1, max_concorrencia=8, intervalo_por_host=1.0,
+                  cabecalhos=None, buscar=buscar_http, caminho_estado=ARQUIVO_ESTADO):
+    """
+    Rastreia o site a partir das sementes e devolve a lista de links de dados encontrados
+
+    profundidade=0 visita só as sementes; cada nível a mais segue os links de página
+    (não de arquivo) que permanecem nos hosts das sementes.
+    """
+    estado = carregar_estado(caminho_estado)
+    links, resumo = asyncio.run(_rastrear(
+        sementes, profundidade, max_concorrencia, intervalo_por_host,
+        cabecalhos or CABECALHOS_PADRAO, buscar, estado,
+    ))
+    salvar_estado(estado, caminho_estado)
+    print(f"🕸️  Crawler: {resumo['baixadas']} páginas processadas, "
+          f"{resumo['inalteradas']} inalteradas, {resumo['falhas']} falhas, {len(links)} links de dados")
+    return links
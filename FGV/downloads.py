@@ -0,0 +1,226 @@
+### Gerenciador de downloads paralelo e retomável para os arquivos de dados encontrados ###
+# - pool de threads com número limitado de downloads simultâneos
+# - escrita em streaming para <destino>/.parciais/<arquivo>.part (memória limitada ao bloco)
+# - retomada via cabeçalho Range quando já existe um .part, com If-Range (ETag/Last-Modified guardado
+#   em <arquivo>.part.validador) para não emendar um arquivo alterado num prefixo antigo
+# - renomeação atômica para o nome final só depois do download completo
+# - deduplicação pelo SHA-256 do conteúdo e manifesto CSV com tamanho, hash e tempo
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+DIRETORIO_DESTINO = 'data/raw/fgv'
+ARQUIVO_MANIFESTO = 'data/raw/fgv/arquivos_baixados.csv'
+EXTENSOES_BAIXAVEIS = ('.xlsx', '.xls', '.csv', '.zip', '.pdf')
+TAMANHO_BLOCO = 1024 * 1024
+COLUNAS_MANIFESTO = ['arquivo', 'url', 'titulo', 'status', 'tamanho', 'sha256',
+                     'duplicado_de', 'segundos', 'tentativas', 'baixado_em']
+
+
+def nome_arquivo_para(url, posicao):
+    """Nome local do arquivo a partir da URL (ou fgv_dados_<n>.<ext> se a URL não tiver nome)"""
+    nome = os.path.basename(urlparse(url).path)
+    if not nome:
+        ext = url.split('.')[-1].lower() if '.' in url else 'dat'
+        nome = f"fgv_dados_{posicao}.{ext}"
+    return nome
+
+
+def carregar_manifesto(caminho=ARQUIVO_MANIFESTO):
+    if caminho and os.path.exists(caminho):
+        manifesto = pd.read_csv(caminho, encoding='utf-8')
+        for coluna in COLUNAS_MANIFESTO:
+            if coluna not in manifesto.columns:
+                manifesto[coluna] = None
+        return manifesto[COLUNAS_MANIFESTO]
+    return pd.DataFrame(columns=COLUNAS_MANIFESTO)
+
+
+def _validador(resposta):
+    """ETag forte ou Last-Modified da resposta, para o If-Range de uma retomada (None se não houver)"""
+    etag = resposta.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return resposta.headers.get('Last-Modified')
+
+
+def _hash_parcial(caminho):
+    """SHA-256 já alimentado com o conteúdo existente de um .part (para retomar sem reler depois)"""
+    h = hashlib.sha256()
+    if os.path.exists(caminho):
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                h.update(bloco)
+    return h
+
+
+class GerenciadorDownloads:
+    """Baixa uma lista de URLs em paralelo e mantém o manifesto de arquivos baixados"""
+
+    def __init__(self, destino=DIRETORIO_DESTINO, manifesto=ARQUIVO_MANIFESTO, max_workers=8,
+                 cabecalhos=None, timeout=30, tentativas=3, sessao=None):
+        self.destino = destino
+        self.caminho_manifesto = manifesto
+        self.max_workers = max_workers
+        self.cabecalhos = cabecalhos or {}
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.sessao = sessao or requests.Session()
+        self._trava = threading.Lock()
+
+        self.manifesto = carregar_manifesto(manifesto)
+        baixados = self.manifesto[self.manifesto['status'] == 'baixado']
+        duplicados = self.manifesto[self.manifesto['status'] == 'duplicado']
+        # hash -> arquivo já presente em disco (entre execuções e entre threads desta execução)
+        self._por_hash = {h: a for h, a in zip(baixados['sha256'], baixados['arquivo'])
+                          if isinstance(h, str) and os.path.exists(os.path.join(destino, a))}
+        # url -> arquivo local com o conteúdo dela (o próprio ou o original de um duplicado)
+        self._por_url = {u: a for u, a in [*zip(baixados['url'], baixados['arquivo']),
+                                           *zip(duplicados['url'], duplicados['duplicado_de'])]
+                         if isinstance(a, str) and os.path.exists(os.path.join(destino, a))}
+
+    def _transferir(self, url, caminho_parcial):
+        """Uma tentativa de download (retomando o .part se existir); devolve o hash do conteúdo"""
+        cabecalhos = dict(self.cabecalhos)
+        caminho_validador = caminho_parcial + '.validador'
+        ja_baixado = os.path.getsize(caminho_parcial) if os.path.exists(caminho_parcial) else 0
+        if ja_baixado:
+            cabecalhos['Range'] = f'bytes={ja_baixado}-'
+            if os.path.exists(caminho_validador):
+                # Se o arquivo mudou no servidor, a resposta é 200 com o arquivo inteiro
+                with open(caminho_validador, encoding='utf-8') as f:
+                    cabecalhos['If-Range'] = f.read().strip()
+
+        with self.sessao.get(url, headers=cabecalhos, timeout=self.timeout, stream=True) as resposta:
+            if resposta.status_code == 416 and ja_baixado:
+                # O .part já tem o arquivo inteiro
+                return _hash_parcial(caminho_parcial)
+            if resposta.status_code == 206 and ja_baixado:
+                h = _hash_parcial(caminho_parcial)
+                modo = 'ab'
+            elif resposta.status_code == 200:
+                # Servidor ignorou o Range, arquivo mudou (If-Range) ou não havia .part: recomeça do zero
+                h = hashlib.sha256()
+                modo = 'wb'
+                validador = _validador(resposta)
+                if validador:
+                    with open(caminho_validador, 'w', encoding='utf-8') as f:
+                        f.write(validador)
+                elif os.path.exists(caminho_validador):
+                    os.remove(caminho_validador)
+            else:
+                raise requests.HTTPError(f"Status {resposta.status_code}")
+
+            with open(caminho_parcial, modo) as f:
+                for bloco in resposta.iter_content(chunk_size=TAMANHO_BLOCO):
+                    if bloco:
+                        f.write(bloco)
+                        h.update(bloco)
+        return h
+
+    def _baixar(self, posicao, item):
+        url = item['url']
+        arquivo = item.get('arquivo') or nome_arquivo_para(url, posicao)
+        registro = {'arquivo': arquivo, 'url': url, 'titulo': item.get('titulo'),
+                    'status': 'falha', 'tamanho': None, 'sha256': None, 'duplicado_de': None,
+                    'segundos': None, 'tentativas': 0,
+                    'baixado_em': datetime.now().isoformat(timespec='seconds')}
+
+        with self._trava:
+            existente = self._por_url.get(url)
+        if existente and not item.get('forcar'):
+            registro.update(status='inalterado', arquivo=existente)
+            return registro
+
+        os.makedirs(os.path.join(self.destino, '.parciais'), exist_ok=True)
+        caminho_parcial = os.path.join(self.destino, '.parciais', arquivo + '.part')
+        inicio = time.perf_counter()
+
+        for tentativa in range(1, self.tentativas + 1):
+            registro['tentativas'] = tentativa
+            try:
+                print(f"⬇️  Baixando: {item.get('titulo') or arquivo} (tentativa {tentativa})")
+                h = self._transferir(url, caminho_parcial)
+                break
+            except Exception as e:
+                print(f"❌ Erro ao baixar {url}: {e}")
+                if tentativa == self.tentativas:
+                    registro['segundos'] = round(time.perf_counter() - inicio, 3)
+                    return registro
+                time.sleep(2 ** (tentativa - 1))
+
+        registro['sha256'] = h.hexdigest()
+        registro['tamanho'] = os.path.getsize(caminho_parcial)
+        registro['segundos'] = round(time.perf_counter() - inicio, 3)
+        if os.path.exists(caminho_parcial + '.validador'):
+            os.remove(caminho_parcial + '.validador')
+
+        with self._trava:
+            duplicado = self._por_hash.get(registro['sha256'])
+            if duplicado:
+                os.remove(caminho_parcial)
+                registro.update(status='duplicado', duplicado_de=duplicado)
+                print(f"♻️  {arquivo} tem o mesmo conteúdo de {duplicado}; não foi salvo de novo")
+            else:
+                os.replace(caminho_parcial, os.path.join(self.destino, arquivo))
+                self._por_hash[registro['sha256']] = arquivo
+                self._por_url[url] = arquivo
+                registro['status'] = 'baixado'
+                print(f"✅ Baixado: {arquivo} ({registro['tamanho']} bytes)")
+        return registro
+
+    def _nomes_unicos(self, itens):
+        """Garante nomes locais distintos para URLs diferentes com o mesmo nome de arquivo"""
+        donos = dict(zip(self.manifesto['arquivo'], self.manifesto['url']))
+        resultado = []
+        for posicao, item in enumerate(itens):
+            arquivo = item.get('arquivo') or nome_arquivo_para(item['url'], posicao)
+            if donos.get(arquivo, item['url']) != item['url']:
+                base, ext = os.path.splitext(arquivo)
+                arquivo = f"{base}-{hashlib.sha1(item['url'].encode('utf-8')).hexdigest()[:8]}{ext}"
+            donos[arquivo] = item['url']
+            resultado.append({**item, 'arquivo': arquivo})
+        return resultado
+
+    def baixar(self, itens):
+        """Baixa os itens ({'url', 'titulo', ['arquivo']}) e devolve os registros desta execução"""
+        # URL repetida no lote: um download só (dois escreveriam no mesmo .part ao mesmo tempo)
+        unicos = {}
+        for item in itens:
+            unicos.setdefault(item['url'], item)
+        itens = self._nomes_unicos(list(unicos.values()))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            registros = list(executor.map(lambda par: self._baixar(*par), enumerate(itens)))
+        self._salvar_manifesto(registros)
+        return registros
+
+    def _salvar_manifesto(self, registros):
+        if not self.caminho_manifesto or not registros:
+            return
+        # 'inalterado' não gera linha nova: a linha original (baixado/duplicado) continua valendo
+        novos = pd.DataFrame([r for r in registros if r['status'] != 'inalterado'], columns=COLUNAS_MANIFESTO)
+        if novos.empty:
+            return
+        manifesto = pd.concat([self.manifesto, novos], ignore_index=True) if len(self.manifesto) else novos
+        # Última tentativa de cada URL prevalece
+        manifesto = manifesto.drop_duplicates(subset='url', keep='last')
+        os.makedirs(os.path.dirname(self.caminho_manifesto) or '.', exist_ok=True)
+        manifesto.to_csv(self.caminho_manifesto + '.tmp', index=False, encoding='utf-8')
+        os.replace(self.caminho_manifesto + '.tmp', self.caminho_manifesto)
+        self.manifesto = manifesto
+
+
+def baixar_arquivos(itens, extensoes=EXTENSOES_BAIXAVEIS, **kwargs):
+    """Filtra os links com extensão baixável e baixa em paralelo; devolve os registros"""
+    baixaveis = [item for item in itens
+                 if any(ext in item['url'].lower() for ext in extensoes)]
+    if not baixaveis:
+        return []
+    return GerenciadorDownloads(**kwargs).baixar(baixaveis)
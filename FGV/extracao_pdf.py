@@ -0,0 +1,262 @@
+### Extração de tabelas dos relatórios em PDF da FGV Social ###
+# As páginas de cada documento são distribuídas em faixas por um pool de processos (pdfplumber).
+# As tabelas encontradas são mapeadas para os esquemas de serie_temporal_desigualdade.csv
+# (uma linha por ano) e distribuicao_classes_sociais.csv (uma linha por classe), com o documento
+# e a página de origem. O resultado de cada documento fica em cache pelo SHA-256 do PDF.
+import json
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from extracao_planilhas import como_numero, hash_arquivo
+
+DIRETORIO_CACHE = 'data/cache/pdf'
+VERSAO_EXTRACAO_PDF = 1
+PAGINAS_POR_TAREFA = 8
+
+COLUNAS_SERIE = ['ano', 'pobreza_percentual', 'extrema_pobreza_percentual', 'indice_gini',
+                 'renda_media_50pobres', 'renda_media_10ricos', 'classe_media_percentual']
+COLUNAS_CLASSES = ['classe_social', 'percentual_populacao', 'renda_media_mensal', 'faixa_renda_sm']
+COLUNAS_ORIGEM = ['documento', 'pagina']
+
+# Ordem importa: o primeiro padrão que casar com o texto (sem acentos, minúsculo) define a coluna
+PADROES_SERIE = [
+    (re.compile(r'gini'), 'indice_gini'),
+    (re.compile(r'50\s*%?\s*(mais\s+)?pobres'), 'renda_media_50pobres'),
+    (re.compile(r'10\s*%?\s*(mais\s+)?ricos'), 'renda_media_10ricos'),
+    (re.compile(r'extrema'), 'extrema_pobreza_percentual'),
+    (re.compile(r'pobreza|pobres'), 'pobreza_percentual'),
+    (re.compile(r'classe\s+(media|c)\b'), 'classe_media_percentual'),
+]
+PADROES_CLASSES = [
+    (re.compile(r'faixa|salario|\bsm\b'), 'faixa_renda_sm'),
+    (re.compile(r'renda'), 'renda_media_mensal'),
+    (re.compile(r'%|popula|propor|participa'), 'percentual_populacao'),
+]
+PADRAO_CLASSE = re.compile(
+    r'^(extrema pobreza|pobreza|vulnerabilidade|vulneraveis'
+    r'|classe (media baixa|media alta|media|alta|baixa|[a-e]))$'
+)
+PADRAO_ANO = re.compile(r'^(19\d{2}|20\d{2})$')
+
+
+def _normalizar(texto):
+    """Minúsculo, sem acentos e com espaços simples (para casar padrões)"""
+    texto = unicodedata.normalize('NFKD', str(texto or '')).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.lower().split())
+
+
+def _limpar(celula):
+    return ' '.join(str(celula).split()) if celula is not None else ''
+
+
+def _ano(celula):
+    texto = _limpar(celula).split(',')[0].split('.')[0]
+    return int(texto) if PADRAO_ANO.match(texto) else None
+
+
+def _coluna_para(texto, padroes):
+    normalizado = _normalizar(texto)
+    for padrao, coluna in padroes:
+        if padrao.search(normalizado):
+            return coluna
+    return None
+
+
+def _nome_classe(texto):
+    """'CLASSE MÉDIA' -> 'Classe Média'; None se o texto não for uma classe social"""
+    limpo = _limpar(texto)
+    if not PADRAO_CLASSE.match(_normalizar(limpo)):
+        return None
+    return ' '.join(p.capitalize() for p in limpo.split())
+
+
+def mapear_tabela(linhas):
+    """
+    Converte as linhas de uma tabela nos registros dos dois esquemas
+
+    Reconhece séries com anos nas linhas (cabeçalho com os indicadores) ou nas colunas
+    (rótulo do indicador na primeira célula) e tabelas de classes sociais (rótulo da classe
+    na primeira célula). Retorna (registros_serie, registros_classes).
+    """
+    linhas = [[_limpar(c) for c in linha] for linha in linhas if linha and any(c for c in linha)]
+    serie, classes = {}, []
+    cabecalho = []
+
+    for linha in linhas:
+        primeiro = linha[0]
+        anos_na_linha = [_ano(c) for c in linha]
+
+        # Cabeçalho com anos nas colunas: guarda a posição de cada ano
+        if sum(a is not None for a in anos_na_linha[1:]) >= 2 and _ano(primeiro) is None:
+            cabecalho = linha
+            continue
+
+        ano = _ano(primeiro)
+        if ano is not None:
+            # Anos nas linhas: cada célula vai para a coluna indicada pelo cabeçalho
+            registro = serie.setdefault(ano, {'ano': ano})
+            for titulo, celula in zip(cabecalho[1:], linha[1:]):
+                coluna = _coluna_para(titulo, PADROES_SERIE)
+                valor = como_numero(celula)
+                if coluna and valor is not None:
+                    registro.setdefault(coluna, valor)
+            continue
+
+        # Com anos no cabeçalho, 'Pobreza' e 'Extrema pobreza' são indicadores, não classes
+        anos_cabecalho = [_ano(c) for c in cabecalho]
+        anos_nas_colunas = any(a is not None for a in anos_cabecalho[1:])
+        classe = None if anos_nas_colunas else _nome_classe(primeiro)
+        if classe is not None:
+            registro = {'classe_social': classe}
+            for titulo, celula in zip(cabecalho[1:], linha[1:]):
+                coluna = _coluna_para(titulo, PADROES_CLASSES)
+                if coluna == 'faixa_renda_sm':
+                    registro.setdefault(coluna, celula or None)
+                elif coluna and como_numero(celula) is not None:
+                    registro.setdefault(coluna, como_numero(celula))
+            if len(registro) > 1:
+                classes.append(registro)
+            continue
+
+        coluna = _coluna_para(primeiro, PADROES_SERIE)
+        if coluna and anos_nas_colunas:
+            # Anos nas colunas: a linha é um indicador
+            for ano_coluna, celula in zip(anos_cabecalho[1:], linha[1:]):
+                valor = como_numero(celula)
+                if ano_coluna is not None and valor is not None:
+                    serie.setdefault(ano_coluna, {'ano': ano_coluna}).setdefault(coluna, valor)
+            continue
+
+        # Linha sem números reconhecíveis é o cabeçalho das linhas seguintes
+        if all(como_numero(c) is None for c in linha):
+            cabecalho = linha
+
+    registros_serie = [r for r in serie.values() if len(r) > 1]
+    return registros_serie, classes
+
+
+def _tabelas_da_pagina(pagina):
+    """Tabelas com linhas desenhadas; se não houver, tenta o alinhamento do texto"""
+    tabelas = pagina.extract_tables()
+    if not tabelas:
+        tabelas = pagina.extract_tables({'vertical_strategy': 'text', 'horizontal_strategy': 'text'})
+    return tabelas
+
+
+def _extrair_faixa(args):
+    """Processa as páginas [inicio, fim) de um documento (executa num processo do pool)"""
+    caminho, inicio, fim = args
+    import pdfplumber
+
+    serie, classes = [], []
+    try:
+        with pdfplumber.open(caminho) as pdf:
+            for numero in range(inicio, min(fim, len(pdf.pages))):
+                pagina = pdf.pages[numero]
+                for tabela in _tabelas_da_pagina(pagina):
+                    registros_serie, registros_classes = mapear_tabela(tabela)
+                    serie.extend({**r, 'pagina': numero + 1} for r in registros_serie)
+                    classes.extend({**r, 'pagina': numero + 1} for r in registros_classes)
+                pagina.close()
+    except Exception as e:
+        return caminho, inicio, serie, classes, str(e)
+    return caminho, inicio, serie, classes, None
+
+
+def _contar_paginas(caminho):
+    import pdfplumber
+
+    with pdfplumber.open(caminho) as pdf:
+        return len(pdf.pages)
+
+
+def _caminho_cache(diretorio, hash_conteudo):
+    return os.path.join(diretorio, f'{hash_conteudo}.v{VERSAO_EXTRACAO_PDF}.json')
+
+
+def _ler_cache(caminho_cache):
+    with open(caminho_cache, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _gravar_cache(caminho_cache, resultado):
+    os.makedirs(os.path.dirname(caminho_cache), exist_ok=True)
+    temporario = f'{caminho_cache}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False)
+    os.replace(temporario, caminho_cache)
+
+
+def extrair_pdfs(caminhos, processos=None, diretorio_cache=DIRETORIO_CACHE, paginas_por_tarefa=PAGINAS_POR_TAREFA):
+    """
+    Extrai as tabelas de vários PDFs, com as páginas divididas entre processos
+
+    Retorna (df_serie, df_classes) nos esquemas de serie_temporal_desigualdade.csv e
+    distribuicao_classes_sociais.csv, mais as colunas documento e pagina.
+    """
+    try:
+        import pdfplumber  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Extração de PDF requer o pacote pdfplumber (pip install pdfplumber)") from e
+
+    resultados, pendentes = {}, {}
+    for caminho in sorted(set(caminhos)):
+        cache = _caminho_cache(diretorio_cache, hash_arquivo(caminho))
+        if os.path.exists(cache):
+            resultados[caminho] = _ler_cache(cache)
+            print(f"✓ {os.path.basename(caminho)}: resultado em cache")
+        else:
+            pendentes[caminho] = cache
+
+    tarefas = []
+    for caminho in pendentes:
+        try:
+            total = _contar_paginas(caminho)
+        except Exception as e:
+            print(f"❌ Erro ao abrir {os.path.basename(caminho)}: {e}")
+            continue
+        tarefas.extend((caminho, inicio, inicio + paginas_por_tarefa)
+                       for inicio in range(0, total, paginas_por_tarefa))
+
+    if processos != 1 and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            faixas = list(executor.map(_extrair_faixa, tarefas))
+    else:
+        faixas = [_extrair_faixa(t) for t in tarefas]
+
+    novos, falhas = {}, set()
+    # Ordem das faixas (por início) mantém os registros na ordem das páginas
+    for caminho, inicio, serie, classes, erro in sorted(faixas, key=lambda f: (f[0], f[1])):
+        resultado = novos.setdefault(caminho, {'serie': [], 'classes': []})
+        if erro:
+            print(f"❌ Erro ao extrair {os.path.basename(caminho)} (páginas a partir de {inicio + 1}): {erro}")
+            falhas.add(caminho)
+        resultado['serie'].extend(serie)
+        resultado['classes'].extend(classes)
+
+    for caminho, resultado in novos.items():
+        print(f"✓ {os.path.basename(caminho)}: {len(resultado['serie'])} anos, "
+              f"{len(resultado['classes'])} classes (extraído)")
+        # Documento com faixa que falhou não vai para o cache: será tentado de novo
+        if caminho not in falhas:
+            _gravar_cache(pendentes[caminho], resultado)
+        resultados[caminho] = resultado
+
+    return _montar(resultados, 'serie', COLUNAS_SERIE), _montar(resultados, 'classes', COLUNAS_CLASSES)
+
+
+def _montar(resultados, chave, colunas):
+    registros = [{**r, 'documento': os.path.basename(caminho)}
+                 for caminho in sorted(resultados) for r in resultados[caminho][chave]]
+    df = pd.DataFrame(registros, columns=colunas + COLUNAS_ORIGEM)
+    if chave == 'serie' and not df.empty:
+        # O mesmo ano pode aparecer em várias tabelas do documento: junta as colunas numa linha
+        df = (df.groupby(['documento', 'ano'], sort=False, as_index=False)
+                .agg({c: 'first' for c in colunas[1:] + ['pagina']}))
+        df = df[colunas + COLUNAS_ORIGEM]
+        df['ano'] = df['ano'].astype('int64')
+    return df
@@ -0,0 +1,255 @@
+### Extração de tabelas de planilhas (xlsx/xls) da FGV/IBGE para formato longo ###
+# As planilhas são lidas em modo streaming (openpyxl read_only / xlrd on_demand), linha a linha.
+# Cada bloco de linhas não vazias vira uma tabela: linhas de título no topo, uma linha de cabeçalho
+# e linhas de dados com rótulo(s) à esquerda e valores numéricos. A saída por arquivo fica em cache
+# pelo SHA-256 do conteúdo, então cada pasta de trabalho só é interpretada uma vez.
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_CACHE = 'data/cache/planilhas'
+VERSAO_EXTRACAO = 2
+COLUNAS_SAIDA = ['arquivo', 'aba', 'tabela', 'titulo', 'rotulo', 'coluna', 'ano', 'valor']
+PADRAO_ANO = re.compile(r'(?<!\d)(19\d{2}|20\d{2})(?!\d)')
+PADRAO_NUMERO = re.compile(r'^-?[\d.]*\d(,\d+)?%?$')
+PADRAO_MILHAR = re.compile(r'^-?[1-9]\d{0,2}(\.\d{3})+$')
+PREFIXOS_MOEDA = ('R$', 'US$')
+PADRAO_CODIGO = re.compile(r'^(c[oó]d|id\b|ibge|geoc)', re.IGNORECASE)
+COLUNAS_TEXTO = ['arquivo', 'aba', 'titulo', 'rotulo', 'coluna']
+
+
+def hash_arquivo(caminho):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def como_numero(celula):
+    """Converte célula em float (aceita '1.234,5', '12%' e 'R$ 1.320'); None se não for número"""
+    if celula is None or isinstance(celula, bool):
+        return None
+    if isinstance(celula, (int, float, np.integer, np.floating)):
+        return float(celula)
+    texto = str(celula).strip()
+    for prefixo in PREFIXOS_MOEDA:
+        if texto.startswith(prefixo):
+            texto = texto[len(prefixo):].strip()
+    texto = texto.replace(' ', '')
+    if not PADRAO_NUMERO.match(texto):
+        return None
+    texto = texto.rstrip('%')
+    if ',' in texto or PADRAO_MILHAR.match(texto):
+        # Formato brasileiro: ponto separa milhar ('45.000', '1.234,5')
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def _vazia(celula):
+    return celula is None or (isinstance(celula, str) and not celula.strip())
+
+
+def iterar_abas(caminho):
+    """Gera (nome_da_aba, gerador de linhas) sem carregar a pasta de trabalho inteira"""
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+        livro = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            for aba in livro.worksheets:
+                yield aba.title, aba.iter_rows(values_only=True)
+        finally:
+            livro.close()
+    elif extensao == '.xls':
+        try:
+            import xlrd
+        except ImportError as e:
+            raise ImportError("Leitura de .xls requer o pacote xlrd (pip install xlrd)") from e
+        livro = xlrd.open_workbook(caminho, on_demand=True)
+        try:
+            for nome in livro.sheet_names():
+                aba = livro.sheet_by_name(nome)
+                yield nome, (aba.row_values(i) for i in range(aba.nrows))
+                livro.unload_sheet(nome)
+        finally:
+            livro.release_resources()
+    else:
+        raise ValueError(f"Formato de planilha não suportado: {caminho}")
+
+
+def _blocos(linhas):
+    """Agrupa linhas consecutivas não vazias (uma linha vazia encerra o bloco)"""
+    bloco = []
+    for linha in linhas:
+        celulas = list(linha)
+        if all(_vazia(c) for c in celulas):
+            if bloco:
+                yield bloco
+                bloco = []
+            continue
+        bloco.append(celulas)
+    if bloco:
+        yield bloco
+
+
+def _eh_ano(celula):
+    numero = como_numero(celula)
+    return numero is not None and numero.is_integer() and 1900 <= numero <= 2099
+
+
+def _interpretar_bloco(bloco):
+    """
+    Separa título, cabeçalho, colunas de rótulo e dados de um bloco
+
+    A primeira linha de dados é a primeira com um número que não seja um ano; a linha
+    logo acima é o cabeçalho (anos são aceitos como cabeçalho) e as anteriores formam o título.
+    Com anos no cabeçalho, as colunas à esquerda do primeiro ano são colunas de rótulo; sem eles,
+    as colunas à esquerda só com texto ou anos, ou com cabeçalho de código ('Código', 'Cód. IBGE').
+    Retorna None se o bloco não tiver dados numéricos.
+    """
+    primeira_dado = next((i for i, linha in enumerate(bloco)
+                          if any(como_numero(c) is not None and not _eh_ano(c) for c in linha)), None)
+    if primeira_dado is None:
+        return None
+
+    largura = max(len(linha) for linha in bloco)
+    bloco = [linha + [None] * (largura - len(linha)) for linha in bloco]
+    dados = bloco[primeira_dado:]
+
+    if primeira_dado > 0:
+        cabecalho = [None if _vazia(c) else _texto(c) for c in bloco[primeira_dado - 1]]
+        titulo = ' '.join(_texto(c) for linha in bloco[:primeira_dado - 1] for c in linha if not _vazia(c))
+    else:
+        cabecalho, titulo = [None] * largura, ''
+
+    # O cabeçalho decide: um código numérico ('05') à esquerda da UF ainda é rótulo, não valor
+    n_rotulos = next((i for i, c in enumerate(cabecalho) if i > 0 and c is not None and _eh_ano(c)), None)
+    if n_rotulos is None:
+        n_rotulos = 0
+        while n_rotulos < largura - 1 and (
+                PADRAO_CODIGO.match(cabecalho[n_rotulos] or '')
+                or all(como_numero(linha[n_rotulos]) is None or _eh_ano(linha[n_rotulos]) for linha in dados)):
+            n_rotulos += 1
+
+    cabecalho = [c if c is not None else f'coluna_{i + 1}' for i, c in enumerate(cabecalho)]
+    return titulo, cabecalho, n_rotulos, dados
+
+
+def _texto(celula):
+    """Texto da célula; anos/inteiros lidos como float (2019.0) voltam a ser '2019'"""
+    if isinstance(celula, float) and celula.is_integer():
+        return str(int(celula))
+    return str(celula).strip()
+
+
+def _ano_de(*textos):
+    for texto in textos:
+        match = PADRAO_ANO.search(texto or '')
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def extrair_arquivo(caminho):
+    """Extrai todas as tabelas de uma pasta de trabalho em formato longo (sem cache)"""
+    registros = []
+    arquivo = os.path.basename(caminho)
+    for aba, linhas in iterar_abas(caminho):
+        tabela, titulo_pendente = 0, ''
+        for bloco in _blocos(linhas):
+            interpretado = _interpretar_bloco(bloco)
+            if interpretado is None:
+                # Bloco só de texto (título separado da tabela por linha vazia): vale para a próxima tabela
+                titulo_pendente = ' '.join(_texto(c) for linha in bloco for c in linha if not _vazia(c))
+                continue
+            tabela += 1
+            titulo, cabecalho, n_rotulos, dados = interpretado
+            titulo = ' '.join(t for t in (titulo_pendente, titulo) if t)
+            titulo_pendente = ''
+            for linha in dados:
+                rotulo = ' | '.join(_texto(c) for c in linha[:n_rotulos] if not _vazia(c))
+                for posicao in range(n_rotulos, len(linha)):
+                    valor = como_numero(linha[posicao])
+                    if valor is None:
+                        continue
+                    coluna = cabecalho[posicao]
+                    registros.append((arquivo, aba, tabela, titulo, rotulo, coluna,
+                                      _ano_de(coluna, rotulo), valor))
+
+    df = pd.DataFrame(registros, columns=COLUNAS_SAIDA)
+    return _tipar(df)
+
+
+def _tipar(df):
+    df['tabela'] = df['tabela'].astype('int16')
+    df['ano'] = df['ano'].astype('Int16')
+    df['valor'] = df['valor'].astype('float64')
+    for coluna in COLUNAS_TEXTO:
+        df[coluna] = df[coluna].astype('string')
+    return df
+
+
+def _caminho_cache(diretorio, hash_conteudo):
+    return os.path.join(diretorio, f'{hash_conteudo}.v{VERSAO_EXTRACAO}.csv.gz')
+
+
+def extrair_com_cache(caminho, diretorio_cache=DIRETORIO_CACHE):
+    """Extrai uma pasta de trabalho reaproveitando o resultado em cache pelo hash do conteúdo"""
+    hash_conteudo = hash_arquivo(caminho)
+    cache = _caminho_cache(diretorio_cache, hash_conteudo) if diretorio_cache else None
+    if cache and os.path.exists(cache):
+        # Texto como texto: rótulos e abas como '05' ou '2019' não viram números
+        df = pd.read_csv(cache, keep_default_na=False, na_values={'ano': [''], 'valor': ['']},
+                         dtype={coluna: str for coluna in COLUNAS_TEXTO})
+        df['arquivo'] = os.path.basename(caminho)
+        return _tipar(df), True
+
+    df = extrair_arquivo(caminho)
+    if cache:
+        os.makedirs(diretorio_cache, exist_ok=True)
+        temporario = f'{cache}.{os.getpid()}.tmp'
+        df.to_csv(temporario, index=False, compression='gzip')
+        os.replace(temporario, cache)
+    return df, False
+
+
+def _extrair_seguro(args):
+    caminho, diretorio_cache = args
+    try:
+        df, do_cache = extrair_com_cache(caminho, diretorio_cache)
+        return caminho, df, do_cache, None
+    except Exception as e:
+        return caminho, None, False, str(e)
+
+
+def extrair_planilhas(caminhos, processos=None, diretorio_cache=DIRETORIO_CACHE):
+    """Extrai várias pastas de trabalho em paralelo (uma por processo) e concatena o resultado"""
+    caminhos = sorted(caminhos)
+    tarefas = [(c, diretorio_cache) for c in caminhos]
+    if processos != 1 and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(_extrair_seguro, tarefas))
+    else:
+        resultados = [_extrair_seguro(t) for t in tarefas]
+
+    tabelas = []
+    for caminho, df, do_cache, erro in resultados:
+        nome = os.path.basename(caminho)
+        if erro:
+            print(f"❌ Erro ao extrair {nome}: {erro}")
+            continue
+        origem = 'cache' if do_cache else 'extraído'
+        print(f"✓ {nome}: {df['tabela'].nunique()} tabelas, {len(df)} valores ({origem})")
+        tabelas.append(df)
+
+    if not tabelas:
+        return _tipar(pd.DataFrame(columns=COLUNAS_SAIDA))
+    return pd.concat(tabelas, ignore_index=True)
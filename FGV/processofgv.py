@@ -1,18 +1,20 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import os
+import sys
+
+# Módulos compartilhados ficam na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from validacao import validar, regras_distribuicao_classes, faixa, nao_nulo, periodos_unicos, sem_lacunas
+
+# Sem gráficos: python processofgv.py --sem-graficos (ou cli.py process --fonte fgv --sem-graficos)
+GERAR_GRAFICOS = '--sem-graficos' not in sys.argv[1:]
 
 # Configurar o diretório de trabalho
 diretorio_base = r"C:\Users\Pedro\Documents\coisas que o FDP do ENZO quer\data\raw\fgv"
 os.makedirs(diretorio_base, exist_ok=True)
 
-# Configuração para visualização
-plt.style.use('default')
-sns.set_palette("husl")
-
 # 1. CARREGAR OS DADOS
 print("=== CARREGANDO DADOS ===")
 
@@ -45,11 +47,10 @@ df_classes_clean = df_classes.copy()
 df_classes_clean['percentual_populacao'] = df_classes_clean['percentual_populacao'].astype(float)
 df_classes_clean['renda_media_mensal'] = df_classes_clean['renda_media_mensal'].astype(float)
 
-# Verificar consistência dos percentuais
+# Verificar consistência dos percentuais (e demais regras de qualidade)
 total_percentual = df_classes_clean['percentual_populacao'].sum()
 print(f"Total percentual população: {total_percentual}%")
-if abs(total_percentual - 100) > 1:
-    print("Atenção: Soma dos percentuais difere significativamente de 100%")
+validar(df_classes_clean, regras_distribuicao_classes(), 'distribuicao_classes_sociais')
 
 # 2.2 Limpar dados de links (remover duplicatas)
 print("\n=== LIMPEZA - METADADOS LINKS ===")
@@ -70,6 +71,15 @@ colunas_numericas = ['pobreza_percentual', 'extrema_pobreza_percentual', 'indice
 for coluna in colunas_numericas:
     df_serie_clean[coluna] = pd.to_numeric(df_serie_clean[coluna], errors='coerce')
 
+anos_serie = pd.to_datetime(df_serie_clean['ano'].astype(str), format='%Y')
+validar(df_serie_clean.assign(data_ano=anos_serie), [
+    nao_nulo('ano'),
+    periodos_unicos(['ano']),
+    sem_lacunas('data_ano', 'Y'),
+    faixa('indice_gini', 0, 1),
+    *[faixa(c, 0, 100) for c in ['pobreza_percentual', 'extrema_pobreza_percentual', 'classe_media_percentual']],
+], 'serie_temporal_desigualdade')
+
 # 3. ANÁLISE EXPLORATÓRIA
 
 # 3.1 Análise da distribuição de classes sociais
@@ -118,55 +128,69 @@ for ano in [2012, 2019, 2020, 2023]:
         razao = df_serie_clean.loc[df_serie_clean['ano'] == ano, 'razao_ricos_pobres'].values[0]
         print(f"{ano}: {razao:.1f} vezes")
 
-# 4. VISUALIZAÇÕES
-
-print("\n=== GERANDO VISUALIZAÇÕES ===")
-
-# Criar diretório para imagens
-diretorio_imagens = os.path.join(diretorio_base, "imagens")
-os.makedirs(diretorio_imagens, exist_ok=True)
-
-plt.figure(figsize=(15, 12))
-
-# 4.1 Gráfico de distribuição de classes sociais
-plt.subplot(2, 2, 1)
-colors = ['#ff6b6b', '#ffa726', '#ffee58', '#90caf9', '#42a5f5', '#1e88e5', '#0d47a1']
-plt.pie(df_classes_clean['percentual_populacao'], labels=df_classes_clean['classe_social'], 
-        autopct='%1.1f%%', colors=colors, startangle=90)
-plt.title('Distribuição da População por Classe Social')
-
-# 4.2 Evolução temporal da pobreza
-plt.subplot(2, 2, 2)
-plt.plot(df_serie_clean['ano'], df_serie_clean['pobreza_percentual'], marker='o', label='Pobreza', linewidth=2)
-plt.plot(df_serie_clean['ano'], df_serie_clean['extrema_pobreza_percentual'], marker='s', label='Extrema Pobreza', linewidth=2)
-plt.xlabel('Ano')
-plt.ylabel('Percentual (%)')
-plt.title('Evolução da Pobreza e Extrema Pobreza')
-plt.legend()
-plt.grid(True, alpha=0.3)
-
-# 4.3 Evolução da classe média e desigualdade
-plt.subplot(2, 2, 3)
-plt.plot(df_serie_clean['ano'], df_serie_clean['classe_media_percentual'], marker='o', color='green', label='Classe Média', linewidth=2)
-plt.xlabel('Ano')
-plt.ylabel('Percentual (%)')
-plt.title('Evolução da Classe Média')
-plt.grid(True, alpha=0.3)
-
-# 4.4 Índice de Gini
-plt.subplot(2, 2, 4)
-plt.plot(df_serie_clean['ano'], df_serie_clean['indice_gini'], marker='o', color='red', linewidth=2)
-plt.xlabel('Ano')
-plt.ylabel('Índice de Gini')
-plt.title('Evolução da Desigualdade (Índice de Gini)')
-plt.grid(True, alpha=0.3)
-
-plt.tight_layout()
-
-# Salvar gráfico
-caminho_grafico = os.path.join(diretorio_imagens, "analise_desigualdade.png")
-plt.savefig(caminho_grafico, dpi=300, bbox_inches='tight')
-plt.show()
+# 4. VISUALIZAÇÕES (puladas com --sem-graficos, ex. atualização agendada só de dados)
+
+def gerar_visualizacoes(df_classes_clean, df_serie_clean, diretorio_base):
+    """Gráficos de classes, pobreza, classe média e Gini; devolve o caminho do PNG"""
+    print("\n=== GERANDO VISUALIZAÇÕES ===")
+
+    # Bibliotecas de gráficos só são carregadas aqui, depois da parte de dados
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('default')
+    sns.set_palette("husl")
+
+    # Criar diretório para imagens
+    diretorio_imagens = os.path.join(diretorio_base, "imagens")
+    os.makedirs(diretorio_imagens, exist_ok=True)
+
+    plt.figure(figsize=(15, 12))
+
+    # 4.1 Gráfico de distribuição de classes sociais
+    plt.subplot(2, 2, 1)
+    colors = ['#ff6b6b', '#ffa726', '#ffee58', '#90caf9', '#42a5f5', '#1e88e5', '#0d47a1']
+    plt.pie(df_classes_clean['percentual_populacao'], labels=df_classes_clean['classe_social'], 
+            autopct='%1.1f%%', colors=colors, startangle=90)
+    plt.title('Distribuição da População por Classe Social')
+
+    # 4.2 Evolução temporal da pobreza
+    plt.subplot(2, 2, 2)
+    plt.plot(df_serie_clean['ano'], df_serie_clean['pobreza_percentual'], marker='o', label='Pobreza', linewidth=2)
+    plt.plot(df_serie_clean['ano'], df_serie_clean['extrema_pobreza_percentual'], marker='s', label='Extrema Pobreza', linewidth=2)
+    plt.xlabel('Ano')
+    plt.ylabel('Percentual (%)')
+    plt.title('Evolução da Pobreza e Extrema Pobreza')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+
+    # 4.3 Evolução da classe média e desigualdade
+    plt.subplot(2, 2, 3)
+    plt.plot(df_serie_clean['ano'], df_serie_clean['classe_media_percentual'], marker='o', color='green', label='Classe Média', linewidth=2)
+    plt.xlabel('Ano')
+    plt.ylabel('Percentual (%)')
+    plt.title('Evolução da Classe Média')
+    plt.grid(True, alpha=0.3)
+
+    # 4.4 Índice de Gini
+    plt.subplot(2, 2, 4)
+    plt.plot(df_serie_clean['ano'], df_serie_clean['indice_gini'], marker='o', color='red', linewidth=2)
+    plt.xlabel('Ano')
+    plt.ylabel('Índice de Gini')
+    plt.title('Evolução da Desigualdade (Índice de Gini)')
+    plt.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+
+    # Salvar gráfico
+    caminho_grafico = os.path.join(diretorio_imagens, "analise_desigualdade.png")
+    plt.savefig(caminho_grafico, dpi=300, bbox_inches='tight')
+    plt.show()
+    return caminho_grafico
+
+
+caminho_grafico = None
+if GERAR_GRAFICOS:
+    caminho_grafico = gerar_visualizacoes(df_classes_clean, df_serie_clean, diretorio_base)
 
 # 5. ANÁLISE DETALHADA DO IMPACTO DA PANDEMIA
 print("\n=== ANÁLISE DO IMPACTO DA PANDEMIA (2020) ===")
@@ -222,11 +246,13 @@ with open(caminho_relatorio, 'w', encoding='utf-8') as f:
 
 print(" Análise concluída!")
 print(f" Dados salvos em: {diretorio_processado}")
-print(" Gráficos gerados e salvos")
+if caminho_grafico:
+    print(" Gráficos gerados e salvos")
 print(" Relatório criado")
 print("\nArquivos gerados:")
 print(f"   - {os.path.join(diretorio_processado, 'classes_sociais_processado.csv')}")
 print(f"   - {os.path.join(diretorio_processado, 'serie_temporal_processado.csv')}") 
 print(f"   - {os.path.join(diretorio_processado, 'links_processado.csv')}")
 print(f"   - {os.path.join(diretorio_processado, 'relatorio_analise.txt')}")
-print(f"   - {caminho_grafico}")
\ No newline at end of file
+if caminho_grafico:
+    print(f"   - {caminho_grafico}")
\ No newline at end of file
@@ -1,6 +1,11 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 import os
+import sys
+
+# Módulos compartilhados ficam na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingestao import ler_csv, obter_esquema
 
 # CONFIGURAÇÃO DO CAMINHO
 CAMINHO_BASE = r"C:\Users\Pedro\Documents\coisas que o FDP do ENZO quer\csv"
@@ -46,18 +51,11 @@ def carregar_dados(arquivo_csv):
         caminho_completo = os.path.join(CAMINHO_BASE, arquivo_csv)
         print(f"📂 Tentando carregar: {caminho_completo}")
         
-        codificacoes = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252', 'windows-1252']
-        
-        for encoding in codificacoes:
-            try:
-                df = pd.read_csv(caminho_completo, encoding=encoding)
-                print(f"✅ Arquivo '{arquivo_csv}' carregado com encoding: {encoding}")
-                return df
-            except UnicodeDecodeError:
-                continue
-        
-        print("❌ Não foi possível ler o arquivo com nenhum encoding comum")
-        return None
+        # Encoding, delimitador e tipos detectados uma vez e guardados ao lado do arquivo
+        df = ler_csv(caminho_completo)
+        esquema = obter_esquema(caminho_completo)
+        print(f"✅ Arquivo '{arquivo_csv}' carregado com encoding: {esquema['encoding']} (separador '{esquema['sep']}')")
+        return df
         
     except Exception as e:
         print(f"❌ Erro ao carregar arquivo: {e}")
@@ -0,0 +1,257 @@
+### Ajuste sazonal (decomposição clássica) para séries mensais e trimestrais ###
+# A decomposição é vetorizada sobre uma matriz (n períodos x k séries) e os blocos de séries
+# podem ser distribuídos entre processos. Os fatores sazonais ficam em cache por série (nome da
+# coluna + hash dos dados) e versão, e só são reestimados quando a série é revisada ou quando
+# acumula um ciclo completo novo; o cache novo de uma coluna substitui os anteriores dela.
+# Valores ausentes não se propagam: as somas das janelas ignoram NaN e contam os valores válidos,
+# e uma janela incompleta dá tendência NaN só naquele ponto.
+import glob
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+VERSAO_AJUSTE = 1
+DIRETORIO_CACHE = 'data/cache/sazonal'
+MODELOS = ('aditivo', 'multiplicativo')
+
+
+def media_movel_centrada(matriz, periodo):
+    """
+    Média móvel centrada 2xP (P par) ou P (P ímpar) de cada coluna
+
+    NaN onde a janela não cabe ou contém algum valor ausente (o NaN não contamina as janelas seguintes).
+    """
+    n = matriz.shape[0]
+    validos = np.isfinite(matriz)
+    acumulado = np.zeros((n + 1, matriz.shape[1]))
+    np.cumsum(np.where(validos, matriz, 0.0), axis=0, out=acumulado[1:])
+    contagem = np.zeros((n + 1, matriz.shape[1]), dtype='int64')
+    np.cumsum(validos, axis=0, out=contagem[1:])
+
+    def medias_janela():
+        completas = (contagem[periodo:] - contagem[:-periodo]) == periodo
+        return np.where(completas, (acumulado[periodo:] - acumulado[:-periodo]) / periodo, np.nan)
+
+    tendencia = np.full(matriz.shape, np.nan)
+    if periodo % 2 == 1:
+        meio = periodo // 2
+        if n >= periodo:
+            tendencia[meio:n - meio] = medias_janela()
+        return tendencia
+
+    # Para período par: média de duas médias de P termos defasadas em 1 (pesos 1/2P nas pontas)
+    if n < periodo + 1:
+        return tendencia
+    simples = medias_janela()
+    meio = periodo // 2
+    tendencia[meio:n - meio] = (simples[:-1] + simples[1:]) / 2
+    return tendencia
+
+
+def estacoes_do_indice(indice, periodo):
+    """Posição de cada data no ciclo sazonal (mês-1 para mensal, trimestre-1 para trimestral)"""
+    indice = pd.DatetimeIndex(indice)
+    if periodo == 12:
+        return np.asarray(indice.month - 1)
+    if periodo == 4:
+        return np.asarray(indice.quarter - 1)
+    raise ValueError(f"Período sazonal não suportado: {periodo}")
+
+
+def decompor(matriz, estacoes, periodo=12, modelo='aditivo'):
+    """
+    Decomposição clássica de todas as colunas de uma vez
+
+    Retorna (tendencia, fatores, ajustada); fatores tem formato (periodo, k).
+    No modelo multiplicativo, colunas com valores ≤ 0 geram aviso (os fatores não têm sentido).
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo inválido: {modelo}")
+    matriz = np.asarray(matriz, dtype='float64')
+    if modelo == 'multiplicativo':
+        with np.errstate(invalid='ignore'):
+            nao_positivas = np.flatnonzero((matriz <= 0).any(axis=0))
+        if len(nao_positivas):
+            warnings.warn(f"Modelo multiplicativo com valores ≤ 0 nas colunas {nao_positivas.tolist()}; "
+                          "use o modelo aditivo")
+    tendencia = media_movel_centrada(matriz, periodo)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        razao = matriz - tendencia if modelo == 'aditivo' else matriz / tendencia
+
+    # Média por estação via somas agrupadas (evita laço sobre meses)
+    valido = np.isfinite(razao)
+    somas = np.zeros((periodo, matriz.shape[1]))
+    contagens = np.zeros((periodo, matriz.shape[1]))
+    np.add.at(somas, estacoes, np.where(valido, razao, 0.0))
+    np.add.at(contagens, estacoes, valido)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fatores = somas / contagens
+
+    # Normalização: fatores somam zero (aditivo) ou têm média 1 (multiplicativo);
+    # colunas sem nenhum fator estimável ficam NaN
+    estimados = np.isfinite(fatores)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(estimados, fatores, 0.0).sum(axis=0) / estimados.sum(axis=0)
+    if modelo == 'aditivo':
+        fatores = fatores - media
+    else:
+        fatores = fatores / media
+
+    return tendencia, fatores, aplicar_fatores(matriz, estacoes, fatores, modelo)
+
+
+def aplicar_fatores(matriz, estacoes, fatores, modelo='aditivo'):
+    """Remove fatores sazonais já estimados de uma matriz de valores"""
+    por_linha = fatores[estacoes]
+    if modelo == 'aditivo':
+        return matriz - por_linha
+    return matriz / por_linha
+
+
+def _decompor_bloco(args):
+    matriz, estacoes, periodo, modelo = args
+    return decompor(matriz, estacoes, periodo, modelo)[1]
+
+
+def estimar_fatores(df, periodo=12, modelo='aditivo', processos=None, series_por_bloco=64):
+    """Estima fatores sazonais de todas as colunas, dividindo em blocos entre processos se pedido"""
+    estacoes = estacoes_do_indice(df.index, periodo)
+    matriz = df.to_numpy(dtype='float64')
+    blocos = [(matriz[:, i:i + series_por_bloco], estacoes, periodo, modelo)
+              for i in range(0, matriz.shape[1], series_por_bloco)]
+
+    if processos and processos > 1 and len(blocos) > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            fatores = list(executor.map(_decompor_bloco, blocos))
+    else:
+        fatores = [_decompor_bloco(bloco) for bloco in blocos]
+
+    if not fatores:
+        return np.empty((periodo, 0))
+    return np.concatenate(fatores, axis=1)
+
+
+def _assinatura(serie):
+    """Hash das datas e valores da série (NaN incluso) para detectar revisões"""
+    h = hashlib.sha1()
+    h.update(np.asarray(serie.index.asi8, dtype='int64').tobytes())
+    h.update(np.ascontiguousarray(serie.to_numpy(dtype='float64')).tobytes())
+    return h.hexdigest()
+
+
+def _nome_seguro(nome):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(nome))
+
+
+def _caminho_cache(diretorio, nome, assinatura):
+    """Arquivo do cache chaveado pelo nome da coluna e pelo hash dos dados que geraram os fatores"""
+    return os.path.join(diretorio, f'{_nome_seguro(nome)}-{assinatura[:16]}.json')
+
+
+def _ler_caches(diretorio, nome):
+    """[(caminho, conteúdo)] de todos os caches de uma coluna (colunas homônimas de dados diferentes)"""
+    caches = []
+    for caminho in sorted(glob.glob(os.path.join(glob.escape(diretorio), f'{glob.escape(_nome_seguro(nome))}-*.json'))):
+        with open(caminho, encoding='utf-8') as f:
+            caches.append((caminho, json.load(f)))
+    return caches
+
+
+def _gravar_cache(diretorio, nome, conteudo):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = _caminho_cache(diretorio, nome, conteudo['assinatura'])
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(conteudo, f, ensure_ascii=False)
+    os.replace(caminho + '.tmp', caminho)
+    return caminho
+
+
+def _mesma_serie(cache, serie, periodo, modelo, versao):
+    """O cache foi gerado por um prefixo não revisado desta série, com a mesma versão/modelo"""
+    if (cache['versao'], cache['periodo'], cache['modelo']) != (versao, periodo, modelo):
+        return False
+    n_cache = cache['n_obs']
+    if n_cache > len(serie):
+        return False
+    return _assinatura(serie.iloc[:n_cache]) == cache['assinatura']
+
+
+def _cache_reaproveitavel(cache, serie, periodo, modelo, versao):
+    """O cache vale se a versão/modelo batem, o histórico não foi revisado e faltam < 1 ciclo novo"""
+    if cache is None:
+        return False
+    return len(serie) - cache['n_obs'] < periodo and _mesma_serie(cache, serie, periodo, modelo, versao)
+
+
+def ajustar_sazonalmente(df, periodo=12, modelo='aditivo', versao=VERSAO_AJUSTE,
+                         diretorio_cache=DIRETORIO_CACHE, processos=None):
+    """
+    Etapa de ajuste sazonal: retorna um DataFrame com as colunas dessazonalizadas
+
+    df deve ter índice de datas regular (mensal ou trimestral) e uma coluna por série.
+    No modelo multiplicativo, colunas com valores ≤ 0 usam o aditivo (com aviso).
+    Com diretorio_cache=None nada é lido ou gravado em disco.
+    """
+    df = df.sort_index()
+    estacoes = estacoes_do_indice(df.index, periodo)
+
+    modelos = dict.fromkeys(df.columns, modelo)
+    if modelo == 'multiplicativo':
+        nao_positivas = [c for c in df.columns if (df[c] <= 0).any()]
+        if nao_positivas:
+            warnings.warn(f"Modelo multiplicativo requer valores positivos; usando o aditivo em {nao_positivas}")
+            modelos.update(dict.fromkeys(nao_positivas, 'aditivo'))
+
+    fatores = {}
+    recalcular = []
+    # Caches anteriores de cada coluna reestimada (apagados quando o novo é gravado)
+    superados = {}
+    for coluna in df.columns:
+        serie = df[coluna].loc[df[coluna].first_valid_index():df[coluna].last_valid_index()]
+        caches = _ler_caches(diretorio_cache, coluna) if diretorio_cache else []
+        reaproveitavel = next((c for _, c in caches
+                               if _cache_reaproveitavel(c, serie, periodo, modelos[coluna], versao)), None)
+        if reaproveitavel is not None:
+            fatores[coluna] = np.asarray(reaproveitavel['fatores'], dtype='float64')
+        else:
+            recalcular.append(coluna)
+            superados[coluna] = [caminho for caminho, _ in caches]
+
+    for modelo_grupo in MODELOS:
+        grupo = [c for c in recalcular if modelos[c] == modelo_grupo]
+        if not grupo:
+            continue
+        novos = estimar_fatores(df[grupo], periodo, modelo_grupo, processos)
+        for posicao, coluna in enumerate(grupo):
+            fatores[coluna] = novos[:, posicao]
+            if diretorio_cache:
+                serie = df[coluna].loc[df[coluna].first_valid_index():df[coluna].last_valid_index()]
+                novo = _gravar_cache(diretorio_cache, coluna, {
+                    'versao': versao,
+                    'periodo': periodo,
+                    'modelo': modelo_grupo,
+                    'n_obs': len(serie),
+                    'ultima_data': str(serie.index[-1]),
+                    'assinatura': _assinatura(serie),
+                    'fatores': [None if np.isnan(f) else float(f) for f in fatores[coluna]],
+                })
+                for caminho in superados[coluna]:
+                    if caminho != novo:
+                        os.remove(caminho)
+
+    print(f"✓ Ajuste sazonal: {len(recalcular)} séries estimadas, "
+          f"{len(df.columns) - len(recalcular)} reaproveitadas do cache")
+
+    ajustada = pd.DataFrame(index=df.index, columns=df.columns, dtype='float64')
+    for modelo_grupo in MODELOS:
+        grupo = [c for c in df.columns if modelos[c] == modelo_grupo]
+        if grupo:
+            matriz_fatores = np.column_stack([fatores[c] for c in grupo])
+            ajustada[grupo] = aplicar_fatores(df[grupo].to_numpy(dtype='float64'), estacoes, matriz_fatores, modelo_grupo)
+    return ajustada
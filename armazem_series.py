@@ -0,0 +1,229 @@
+### Armazém binário de séries numéricas com leitura via numpy.memmap ###
+# Cada série ocupa dois arquivos contíguos: valores float64 e períodos int32 (AAAAMMDD, ordenados).
+# Um índice JSON pequeno guarda tamanho, frequência e versão de cada série. Uma fatia
+# (série, início, fim) é uma view sem cópia encontrada por busca binária nos períodos.
+# Os arquivos de uma versão substituída só são apagados depois que o novo índice está em disco e
+# passado um prazo, para que leitores que ainda seguem o índice anterior consigam mapeá-los.
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_ARMAZEM = 'data/series'
+ARQUIVO_INDICE = 'indice.json'
+SUFIXOS = ('.periodos.i32', '.valores.f64')
+PRAZO_REMOCAO = 60  # segundos entre substituir uma versão e apagar seus arquivos
+
+
+def datas_para_periodos(datas):
+    """Converte datas em inteiros AAAAMMDD (int32)"""
+    datas = pd.DatetimeIndex(pd.to_datetime(datas))
+    return (datas.year * 10000 + datas.month * 100 + datas.day).to_numpy(dtype='int32')
+
+
+def periodos_para_datas(periodos):
+    """Converte inteiros AAAAMMDD de volta em datas"""
+    return pd.to_datetime(np.asarray(periodos).astype(str), format='%Y%m%d')
+
+
+def _periodo(valor):
+    """Aceita AAAAMMDD, data/Timestamp ou texto de data e devolve o inteiro AAAAMMDD"""
+    if valor is None:
+        return None
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    return int(datas_para_periodos([valor])[0])
+
+
+def _nome_arquivo(chave):
+    seguro = ''.join(c if c.isalnum() or c in '-_' else '_' for c in chave)[:60]
+    return f"{seguro}-{hashlib.sha1(chave.encode('utf-8')).hexdigest()[:8]}"
+
+
+class ArmazemSeries:
+    """Conjunto de séries em disco; arquivos só são mapeados quando a série é consultada"""
+
+    def __init__(self, diretorio=DIRETORIO_ARMAZEM, prazo_remocao=PRAZO_REMOCAO):
+        self.diretorio = diretorio
+        self.prazo_remocao = prazo_remocao
+        self._mapas = {}
+        self._mtime_indice = None
+        self._em_lote = False
+        self._pendentes = []
+        self.indice = {}
+        self.recarregar_indice()
+        self._remover_orfaos()
+
+    # ------------------------------------------------------------------ índice
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def recarregar_indice(self):
+        """Relê o índice se ele mudou em disco; retorna as chaves cuja versão mudou"""
+        caminho = self._caminho(ARQUIVO_INDICE)
+        if not os.path.exists(caminho):
+            self.indice = {}
+            return []
+        mtime = os.stat(caminho).st_mtime_ns
+        if mtime == self._mtime_indice:
+            return []
+        with open(caminho, encoding='utf-8') as f:
+            novo = json.load(f)['series']
+        alteradas = [chave for chave, info in novo.items()
+                     if self.indice.get(chave, {}).get('versao') != info['versao']]
+        for chave in set(self._mapas) - set(novo) | set(alteradas):
+            self._mapas.pop(chave, None)
+        self.indice = novo
+        self._mtime_indice = mtime
+        return alteradas
+
+    def _gravar_indice(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'series': self.indice}, f, ensure_ascii=False, indent=1)
+        os.replace(caminho + '.tmp', caminho)
+        self._mtime_indice = os.stat(caminho).st_mtime_ns
+        self._remover_pendentes()
+
+    @contextmanager
+    def lote(self):
+        """Agrupa várias gravações numa única atualização do índice"""
+        self._em_lote = True
+        try:
+            yield self
+        finally:
+            self._em_lote = False
+            self._gravar_indice()
+
+    def series(self):
+        return sorted(self.indice)
+
+    def metadados(self, chave):
+        return dict(self.indice[chave])
+
+    # ------------------------------------------------------------------ escrita
+    def gravar(self, chave, datas, valores, frequencia=None, **metadados):
+        """Grava (ou substitui) uma série; períodos repetidos mantêm o último valor"""
+        periodos = datas_para_periodos(datas)
+        valores = np.asarray(valores, dtype='float64')
+        ordem = np.argsort(periodos, kind='stable')
+        periodos, valores = periodos[ordem], valores[ordem]
+        ultimo = np.r_[periodos[1:] != periodos[:-1], True]
+        periodos, valores = periodos[ultimo], valores[ultimo]
+
+        versao = self.indice.get(chave, {}).get('versao', 0) + 1
+        base = f"{_nome_arquivo(chave)}.v{versao}"
+        os.makedirs(self.diretorio, exist_ok=True)
+        # Arquivos novos a cada versão: leitores com a versão anterior mapeada não são afetados
+        for sufixo, array in zip(SUFIXOS, (periodos, valores)):
+            caminho = self._caminho(base + sufixo)
+            array.tofile(caminho + '.tmp')
+            os.replace(caminho + '.tmp', caminho)
+
+        anterior = self.indice.get(chave)
+        self.indice[chave] = {
+            **metadados,
+            'arquivo': base,
+            'n': int(len(periodos)),
+            'inicio': int(periodos[0]) if len(periodos) else None,
+            'fim': int(periodos[-1]) if len(periodos) else None,
+            'frequencia': frequencia,
+            'versao': versao,
+        }
+        if anterior:
+            # Só some depois que o novo índice estiver em disco (no fim do lote, se houver um)
+            self._pendentes.append((anterior['arquivo'], time.time()))
+        if not self._em_lote:
+            self._gravar_indice()
+        self._mapas.pop(chave, None)
+
+    def _remover_arquivos(self, base):
+        for sufixo in SUFIXOS:
+            try:
+                os.remove(self._caminho(base + sufixo))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # No Windows o arquivo pode estar mapeado por outro leitor; fica para depois
+                return False
+        return True
+
+    def _remover_pendentes(self):
+        """Apaga as versões substituídas há mais de prazo_remocao segundos"""
+        agora = time.time()
+        restantes = []
+        for base, instante in self._pendentes:
+            if agora - instante < self.prazo_remocao or not self._remover_arquivos(base):
+                restantes.append((base, instante))
+        self._pendentes = restantes
+
+    def _remover_orfaos(self):
+        """
+        Apaga arquivos de versões que não estão no índice (pendentes de uma execução anterior)
+
+        Só quando o índice e os próprios arquivos têm mais de prazo_remocao segundos: leitores do
+        índice anterior já tiveram tempo de mapeá-los e gravações em andamento não são tocadas.
+        """
+        caminho_indice = self._caminho(ARQUIVO_INDICE)
+        if not os.path.exists(caminho_indice):
+            return
+        limite = time.time() - self.prazo_remocao
+        if os.stat(caminho_indice).st_mtime > limite:
+            return
+        em_uso = {info['arquivo'] for info in self.indice.values()}
+        for nome in os.listdir(self.diretorio):
+            base = next((nome[:-len(s)] for s in SUFIXOS if nome.endswith(s)), None)
+            if base is None or base in em_uso:
+                continue
+            try:
+                if os.stat(self._caminho(nome)).st_mtime <= limite:
+                    os.remove(self._caminho(nome))
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------------ leitura
+    def _mapear(self, chave):
+        if chave not in self._mapas:
+            info = self.indice[chave]
+            if info['n'] == 0:
+                self._mapas[chave] = (np.empty(0, dtype='int32'), np.empty(0, dtype='float64'))
+            else:
+                periodos = np.memmap(self._caminho(info['arquivo'] + '.periodos.i32'),
+                                     dtype='int32', mode='r', shape=(info['n'],))
+                valores = np.memmap(self._caminho(info['arquivo'] + '.valores.f64'),
+                                    dtype='float64', mode='r', shape=(info['n'],))
+                self._mapas[chave] = (periodos, valores)
+        return self._mapas[chave]
+
+    def fatia(self, chave, inicio=None, fim=None):
+        """Views (períodos, valores) da série entre inicio e fim, inclusive, sem copiar"""
+        periodos, valores = self._mapear(chave)
+        ini = 0 if inicio is None else int(np.searchsorted(periodos, _periodo(inicio), side='left'))
+        fin = len(periodos) if fim is None else int(np.searchsorted(periodos, _periodo(fim), side='right'))
+        return periodos[ini:fin], valores[ini:fin]
+
+    def serie(self, chave, inicio=None, fim=None):
+        """Fatia como pandas.Series indexada por data (copia os dados da janela)"""
+        periodos, valores = self.fatia(chave, inicio, fim)
+        return pd.Series(np.array(valores), index=periodos_para_datas(periodos), name=chave)
+
+
+def importar_csv(armazem, caminho, coluna_data, colunas_valor=None, prefixo='', frequencia=None):
+    """Publica no armazém as colunas numéricas de um CSV (uma série por coluna)"""
+    from ingestao import ler_csv
+
+    df = ler_csv(caminho)
+    datas = pd.to_datetime(df[coluna_data])
+    if colunas_valor is None:
+        colunas_valor = [c for c in df.select_dtypes(include='number').columns if c != coluna_data]
+    with armazem.lote():
+        for coluna in colunas_valor:
+            armazem.gravar(f"{prefixo}{coluna}", datas, pd.to_numeric(df[coluna], errors='coerce'),
+                           frequencia=frequencia, origem=os.path.basename(caminho))
+    print(f"✓ {len(colunas_valor)} séries de {os.path.basename(caminho)} publicadas em {armazem.diretorio}")
+    return list(colunas_valor)
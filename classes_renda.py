@@ -0,0 +1,145 @@
+### Classificação vetorizada de renda em classes sociais por faixas de salário mínimo ###
+# Cada pessoa/domicílio é classificado pela razão renda / salário mínimo do seu ano,
+# com uma busca binária (np.searchsorted) contra os limites das faixas. As participações
+# ponderadas por UF e período saem de um único np.bincount sobre (grupo, classe).
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Salário mínimo nacional vigente em cada ano (R$)
+SALARIO_MINIMO = {
+    2012: 622, 2013: 678, 2014: 724, 2015: 788, 2016: 880, 2017: 937, 2018: 954,
+    2019: 998, 2020: 1045, 2021: 1100, 2022: 1212, 2023: 1320, 2024: 1412, 2025: 1518,
+}
+
+# Limites superiores das faixas em múltiplos do salário mínimo (a última classe é aberta)
+LIMITES_SM = np.array([0.25, 1, 2, 4, 10, 20], dtype='float64')
+# (chave, nome, faixa_renda_sm, descrição)
+CLASSES = [
+    ('extrema_pobreza', 'Extrema Pobreza', 'Até 0,25 SM', 'Até 0,25 SM'),
+    ('pobreza', 'Pobreza', '0,25-1 SM', '0,25 a 1 SM'),
+    ('vulnerabilidade', 'Vulnerabilidade', '1-2 SM', '1 a 2 SM'),
+    ('classe_media_baixa', 'Classe Média Baixa', '2-4 SM', '2 a 4 SM'),
+    ('classe_media', 'Classe Média', '4-10 SM', '4 a 10 SM'),
+    ('classe_media_alta', 'Classe Média Alta', '10-20 SM', '10 a 20 SM'),
+    ('classe_alta', 'Classe Alta', 'Acima de 20 SM', 'Acima de 20 SM'),
+]
+CHAVES_CLASSES = [c[0] for c in CLASSES]
+NOMES_CLASSES = [c[1] for c in CLASSES]
+FAIXAS_SM = [c[2] for c in CLASSES]
+DESCRICOES_CLASSES = [c[3] for c in CLASSES]
+SEM_CLASSE = -1
+
+_ANOS_SM = np.array(sorted(SALARIO_MINIMO), dtype='int64')
+_VALORES_SM = np.array([SALARIO_MINIMO[a] for a in _ANOS_SM], dtype='float64')
+
+
+def salario_minimo(anos):
+    """Salário mínimo de cada ano (anos fora da tabela usam o ano mais próximo disponível)"""
+    anos = np.asarray(anos, dtype='int64')
+    fora = (anos < _ANOS_SM[0]) | (anos > _ANOS_SM[-1])
+    if fora.any():
+        warnings.warn(f"Salário mínimo não tabelado para {sorted(set(anos[fora].tolist()))}; "
+                      f"usando o ano mais próximo ({_ANOS_SM[0]}-{_ANOS_SM[-1]})")
+    return _VALORES_SM[np.clip(anos, _ANOS_SM[0], _ANOS_SM[-1]) - _ANOS_SM[0]]
+
+
+def classificar(renda, anos):
+    """
+    Código da classe (0 = extrema pobreza ... 6 = classe alta) de cada renda
+
+    As faixas são fechadas à direita ('Até 0,25 SM' inclui exatamente 0,25 SM).
+    Rendas ausentes recebem SEM_CLASSE (-1).
+    """
+    renda = np.asarray(renda, dtype='float64')
+    razao = renda / salario_minimo(np.broadcast_to(anos, renda.shape))
+    codigos = np.searchsorted(LIMITES_SM, razao, side='left').astype('int8')
+    codigos[np.isnan(razao)] = SEM_CLASSE
+    return codigos
+
+
+def definicao_classes(ano=2023):
+    """Tabela de limites das classes em R$ para o salário mínimo do ano"""
+    sm = float(salario_minimo([ano])[0])
+    minimos = np.r_[0, LIMITES_SM] * sm
+    maximos = np.r_[LIMITES_SM * sm, np.nan]
+    df = pd.DataFrame({
+        'min': minimos,
+        'max': maximos,
+        'descricao': DESCRICOES_CLASSES,
+        'renda_maxima': maximos,
+        'faixa_sm': FAIXAS_SM,
+    }, index=CHAVES_CLASSES)
+    df['max'] = df['max'].astype(object).where(df['max'].notna(), None)
+    df['renda_maxima'] = df['renda_maxima'].astype(object).where(df['renda_maxima'].notna(), None)
+    return df
+
+
+def tabela_participacao(df, coluna_renda, coluna_ano, coluna_uf=None, coluna_peso=None, coluna_periodo=None):
+    """
+    Participação ponderada de cada classe por UF e período, numa única passada
+
+    O período padrão é o ano. Sem coluna de UF, o resultado é nacional (uf = 'BR').
+    Retorna formato longo com uf, periodo, classe_social, faixa_renda_sm,
+    percentual_populacao, renda_media_mensal e populacao (soma dos pesos).
+    """
+    n_classes = len(CLASSES)
+    renda = df[coluna_renda].to_numpy(dtype='float64', na_value=np.nan)
+    anos = pd.to_numeric(df[coluna_ano], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    # Sem ano não há salário mínimo de referência: a linha fica sem classe
+    tem_ano = np.isfinite(anos)
+    codigos = classificar(np.where(tem_ano, renda, np.nan), np.where(tem_ano, anos, _ANOS_SM[0]).astype('int64'))
+    pesos = (np.ones(len(df)) if coluna_peso is None
+             else df[coluna_peso].to_numpy(dtype='float64', na_value=0.0))
+
+    # Grupo = (UF, período) numa grade completa; grupos sem observações são descartados no fim
+    codigos_uf, ufs = pd.factorize(df[coluna_uf] if coluna_uf else pd.Series('BR', index=df.index), sort=True)
+    codigos_periodo, periodos = pd.factorize(df[coluna_periodo or coluna_ano], sort=True)
+    grupos = codigos_uf.astype('int64') * len(periodos) + codigos_periodo
+    validos = (codigos != SEM_CLASSE) & (pesos > 0) & (codigos_uf >= 0) & (codigos_periodo >= 0)
+
+    posicao = grupos[validos] * n_classes + codigos[validos]
+    tamanho = len(ufs) * len(periodos) * n_classes
+    peso_total = np.bincount(posicao, weights=pesos[validos], minlength=tamanho).reshape(-1, n_classes)
+    renda_total = np.bincount(posicao, weights=pesos[validos] * renda[validos], minlength=tamanho).reshape(-1, n_classes)
+
+    total_grupo = peso_total.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentual = peso_total / total_grupo * 100
+        renda_media = renda_total / peso_total
+
+    n_grupos = len(ufs) * len(periodos)
+    resultado = pd.DataFrame({
+        'uf': np.repeat(np.repeat(np.asarray(ufs), len(periodos)), n_classes),
+        'periodo': np.repeat(np.tile(np.asarray(periodos), len(ufs)), n_classes),
+        'classe_social': np.tile(NOMES_CLASSES, n_grupos),
+        'faixa_renda_sm': np.tile(FAIXAS_SM, n_grupos),
+        'percentual_populacao': percentual.ravel(),
+        'renda_media_mensal': renda_media.ravel(),
+        'populacao': peso_total.ravel(),
+    })
+    com_dados = np.repeat(total_grupo.ravel() > 0, n_classes)
+    return resultado[com_dados].reset_index(drop=True)
+
+
+def gerar_distribuicao_classes(df, coluna_renda, coluna_ano, coluna_uf=None, coluna_peso=None,
+                               coluna_periodo=None, diretorio='data/raw/fgv'):
+    """
+    Gera as distribuições por classe a partir de microdados
+
+    Grava distribuicao_classes_uf_periodo.csv (por UF e período) e substitui
+    distribuicao_classes_sociais.csv pela distribuição nacional do período mais recente.
+    """
+    por_uf = tabela_participacao(df, coluna_renda, coluna_ano, coluna_uf, coluna_peso, coluna_periodo)
+    nacional = tabela_participacao(df, coluna_renda, coluna_ano, None, coluna_peso, coluna_periodo)
+    recente = nacional[nacional['periodo'] == nacional['periodo'].max()]
+
+    os.makedirs(diretorio, exist_ok=True)
+    por_uf.to_csv(os.path.join(diretorio, 'distribuicao_classes_uf_periodo.csv'), index=False, encoding='utf-8')
+    recente[['classe_social', 'percentual_populacao', 'renda_media_mensal', 'faixa_renda_sm']].round(2).to_csv(
+        os.path.join(diretorio, 'distribuicao_classes_sociais.csv'), index=False, encoding='utf-8')
+    print(f"✅ Distribuição de classes gerada: {por_uf['uf'].nunique()} UFs, "
+          f"{por_uf['periodo'].nunique()} períodos, {len(df):,} registros")
+    return por_uf
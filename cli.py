@@ -0,0 +1,159 @@
+### Ponto de entrada único do projeto: collect, process, plot e report ###
+# Cada subcomando importa só o que usa: uma atualização de dados (cron, container) não carrega
+# matplotlib/seaborn, e os relatórios não carregam requests/bs4 (FGV.py e 'coletar bcb.py' só os
+# importam dentro das funções de coleta). Os scripts existentes continuam rodando sozinhos; aqui
+# eles são chamados como funções ou executados como __main__.
+#
+# Uso:
+#   python cli.py collect [bcb] [fgv]
+#   python cli.py process [--fonte ipea|fgv] [--sem-graficos]
+#   python cli.py plot [--fonte ipea|fgv|credito]
+#   python cli.py report [--fonte metricas|bcb|fgv]
+import argparse
+import json
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+DIRETORIO_FGV = os.path.join(RAIZ, 'FGV')
+SCRIPT_BCB = os.path.join(RAIZ, 'coletar bcb.py')
+
+
+def _carregar_script(caminho, nome):
+    """Importa um script pelo caminho (o nome 'coletar bcb.py' não é importável com import)"""
+    import importlib.util
+
+    pasta = os.path.dirname(caminho)
+    if pasta not in sys.path:
+        sys.path.insert(0, pasta)
+    especificacao = importlib.util.spec_from_file_location(nome, caminho)
+    modulo = importlib.util.module_from_spec(especificacao)
+    especificacao.loader.exec_module(modulo)
+    return modulo
+
+
+def _executar_script(caminho, argumentos=()):
+    """Executa um script como se fosse chamado direto (bloco __main__ e sys.argv incluídos)"""
+    import runpy
+
+    pasta = os.path.dirname(caminho)
+    if pasta not in sys.path:
+        sys.path.insert(0, pasta)
+    argv_original = sys.argv
+    sys.argv = [caminho, *argumentos]
+    try:
+        runpy.run_path(caminho, run_name='__main__')
+    finally:
+        sys.argv = argv_original
+
+
+# ---------------------------------------------------------------------- subcomandos
+def coletar(argumentos):
+    fontes = argumentos.fontes or ['bcb', 'fgv']
+    invalidas = set(fontes) - {'bcb', 'fgv'}
+    if invalidas:
+        raise SystemExit(f"❌ Fonte desconhecida: {', '.join(sorted(invalidas))} (use bcb e/ou fgv)")
+    for fonte in fontes:
+        print(f"\n🚀 Coleta: {fonte}")
+        if fonte == 'bcb':
+            _executar_script(SCRIPT_BCB)
+        else:
+            _executar_script(os.path.join(DIRETORIO_FGV, 'FGV.py'))
+
+
+def processar(argumentos):
+    if argumentos.fonte == 'ipea':
+        import processo
+        processo.main(graficos=not argumentos.sem_graficos)
+    else:
+        # Com --sem-graficos o script pula a seção de gráficos (nem importa matplotlib/seaborn)
+        _executar_script(os.path.join(DIRETORIO_FGV, 'processofgv.py'),
+                         ['--sem-graficos'] if argumentos.sem_graficos else [])
+
+
+def plotar(argumentos):
+    if argumentos.fonte == 'ipea':
+        import processo
+        processo.visualizar_dados(processo.carregar_dados_processados())
+    elif argumentos.fonte == 'fgv':
+        _executar_script(os.path.join(DIRETORIO_FGV, 'processofgv.py'))
+    else:
+        _executar_script(os.path.join(DIRETORIO_FGV, 'grafico.py'))
+
+
+def _ultimas_linhas_jsonl(caminho, chave):
+    """Último registro de cada valor de chave num arquivo JSONL"""
+    ultimos = {}
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    ultimos[registro.get(chave)] = registro
+    return ultimos
+
+
+def relatar(argumentos):
+    if argumentos.fonte == 'bcb':
+        _carregar_script(SCRIPT_BCB, 'coletar_bcb').generate_summary_report()
+        return
+    if argumentos.fonte == 'fgv':
+        _carregar_script(os.path.join(DIRETORIO_FGV, 'FGV.py'), 'FGV').generate_analysis_report()
+        return
+
+    from instrumentacao import ARQUIVO_METRICAS
+    from validacao import ARQUIVO_RELATORIO
+
+    etapas = _ultimas_linhas_jsonl(ARQUIVO_METRICAS, 'etapa')
+    print(f"\n⏱️  Última execução de cada etapa ({ARQUIVO_METRICAS}):")
+    if not etapas:
+        print("   (sem métricas registradas)")
+    for etapa, r in etapas.items():
+        simbolo = '✓' if r.get('status') == 'ok' else '❌'
+        linhas = r.get('linhas_saida')
+        print(f"   {simbolo} {etapa:<30} {r.get('tempo_parede_s', 0):>9.3f} s"
+              f"{'' if linhas is None else f'  {linhas:>10,} linhas'}  ({r.get('timestamp')})")
+
+    validacoes = _ultimas_linhas_jsonl(ARQUIVO_RELATORIO, 'tabela')
+    print(f"\n🔎 Última validação de cada tabela ({ARQUIVO_RELATORIO}):")
+    if not validacoes:
+        print("   (sem validações registradas)")
+    for tabela, r in validacoes.items():
+        ocorrencias = sum(1 for regra in r['regras'] if regra['violacoes'] != 0)
+        print(f"   {'✅' if r['ok'] else '❌'} {tabela}: {ocorrencias} de {len(r['regras'])} regras com ocorrências"
+              f" ({r['validado_em']})")
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description='Coleta, processamento e relatórios de desigualdade')
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    coleta = subparsers.add_parser('collect', help='coleta dados das fontes (BCB, FGV Social)')
+    coleta.add_argument('fontes', nargs='*', metavar='fonte', help='bcb e/ou fgv (padrão: todas)')
+    coleta.set_defaults(funcao=coletar)
+
+    processamento = subparsers.add_parser('process', help='processa os dados coletados')
+    processamento.add_argument('--fonte', choices=['ipea', 'fgv'], default='ipea')
+    processamento.add_argument('--sem-graficos', action='store_true', help='não gera gráficos (execuções agendadas)')
+    processamento.set_defaults(funcao=processar)
+
+    graficos = subparsers.add_parser('plot', help='gera os gráficos a partir dos dados já processados')
+    graficos.add_argument('--fonte', choices=['ipea', 'fgv', 'credito'], default='ipea')
+    graficos.set_defaults(funcao=plotar)
+
+    relatorio = subparsers.add_parser('report', help='resume métricas, validações e dados coletados')
+    relatorio.add_argument('--fonte', choices=['metricas', 'bcb', 'fgv'], default='metricas')
+    relatorio.set_defaults(funcao=relatar)
+    return parser
+
+
+def main(argv=None):
+    argumentos = criar_parser().parse_args(argv)
+    inicio = time.perf_counter()
+    argumentos.funcao(argumentos)
+    print(f"\n✓ {argumentos.comando} concluído em {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
-import requests
 import pandas as pd
 import time
 import os
 from datetime import datetime
+from instrumentacao import medir_etapa, exportar_prometheus
+from lacunas import detectar_lacunas, preencher_lacunas
+from revisoes import RevisoesSeries
 
 def create_directories():
     """Cria os diretórios necessários para salvar os dados"""
@@ -13,6 +15,8 @@ def get_bcb_series_with_retry():
     """
     Coleta séries do Banco Central Brasil (2018-2024) com retry para timeouts
     """
+    # requests só é necessário na coleta (relatórios e análises rodam sem ele)
+    import requests
     print("Coletando dados do Banco Central...")
     
     # Códigos das séries do SGS
@@ -29,66 +33,95 @@ def get_bcb_series_with_retry():
     
     bcb_data = {}
     failed_series = []
+    # O CSV é sobrescrito a cada coleta; o histórico de revisões guarda os valores anteriores
+    revisoes = RevisoesSeries()
     
     for name, code in series_bcb.items():
         print(f"Coletando série BCB: {name} ({code})")
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # API do BCB
-                url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
-                params = {
-                    'formato': 'json',
-                    'dataInicial': '01/01/2018',
-                    'dataFinal': '31/12/2024'
-                }
+        with medir_etapa('coleta_bcb', serie=name, codigo=code) as registro:
+            max_retries = 3
+            for attempt in range(max_retries):
+                inicio_requisicao = None
+                try:
+                    # API do BCB
+                    url = f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{code}/dados"
+                    params = {
+                        'formato': 'json',
+                        'dataInicial': '01/01/2018',
+                        'dataFinal': '31/12/2024'
+                    }
                 
-                # Timeout menor para tentativas iniciais, maior para as seguintes
-                timeout = 15 if attempt == 0 else 30
-                response = requests.get(url, params=params, timeout=timeout)
+                    # Timeout menor para tentativas iniciais, maior para as seguintes
+                    timeout = 15 if attempt == 0 else 30
+                    inicio_requisicao = time.perf_counter()
+                    duracao = None
+                    response = requests.get(url, params=params, timeout=timeout)
+                    duracao = time.perf_counter() - inicio_requisicao
                 
-                if response.status_code == 200:
-                    data = response.json()
+                    if response.status_code == 200:
+                        data = response.json()
                     
-                    if data:
-                        df = pd.DataFrame(data)
-                        df['data'] = pd.to_datetime(df['data'], dayfirst=True)
-                        df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
+                        if data:
+                            df = pd.DataFrame(data)
+                            df['data'] = pd.to_datetime(df['data'], dayfirst=True)
+                            df['valor'] = pd.to_numeric(df['valor'], errors='coerce')
                         
-                        # Ordenar por data
-                        df = df.sort_values('data')
+                            # Ordenar por data
+                            df = df.sort_values('data')
+                            # Só conta como sucesso depois que a resposta foi interpretada
+                            registro.requisicao_http(duracao, tentativa=attempt + 1, sucesso=True)
+                            inicio_requisicao = None
                         
-                        bcb_data[name] = df
-                        df.to_csv(f'data/raw/bcb/{name}_2018_2024.csv', index=False)
-                        print(f"✓ {name}: {len(df)} registros (de {df['data'].min().strftime('%Y-%m')} a {df['data'].max().strftime('%Y-%m')})")
-                        break  # Sai do loop de retry se bem-sucedido
+                            bcb_data[name] = df
+                            df.to_csv(f'data/raw/bcb/{name}_2018_2024.csv', index=False)
+                            registro.escrita(f'data/raw/bcb/{name}_2018_2024.csv')
+                            registro.linhas(entrada=len(data), saida=len(df))
+                            # Falha no histórico não invalida a coleta (o CSV já foi gravado): sem nova tentativa
+                            try:
+                                resumo = revisoes.registrar(f'bcb/{name}', df['data'], df['valor'], codigo=code)
+                            except (ValueError, OSError) as e:
+                                print(f"  ⚠️ {name}: histórico de revisões não atualizado ({e})")
+                            else:
+                                if resumo['alterados']:
+                                    print(f"  🔁 {name}: {resumo['alterados']} valores revisados, {resumo['inseridos']} novos")
+                            print(f"✓ {name}: {len(df)} registros (de {df['data'].min().strftime('%Y-%m')} a {df['data'].max().strftime('%Y-%m')})")
+                            break  # Sai do loop de retry se bem-sucedido
+                        else:
+                            registro.requisicao_http(duracao, tentativa=attempt + 1, sucesso=True)
+                            print(f"✗ {name}: Dados vazios")
+                            break
                     else:
-                        print(f"✗ {name}: Dados vazios")
-                        break
-                else:
-                    print(f"✗ {name}: HTTP {response.status_code} (tentativa {attempt + 1}/{max_retries})")
+                        registro.requisicao_http(duracao, tentativa=attempt + 1, sucesso=False)
+                        inicio_requisicao = None
+                        print(f"✗ {name}: HTTP {response.status_code} (tentativa {attempt + 1}/{max_retries})")
+                        if attempt == max_retries - 1:
+                            failed_series.append(name)
+            
+                except requests.exceptions.Timeout:
+                    registro.requisicao_http(time.perf_counter() - inicio_requisicao,
+                                             tentativa=attempt + 1, sucesso=False)
+                    print(f"✗ Timeout na série {name} (tentativa {attempt + 1}/{max_retries})")
                     if attempt == max_retries - 1:
                         failed_series.append(name)
+                        print(f"  ⚠️ Série {name} falhou após {max_retries} tentativas")
             
-            except requests.exceptions.Timeout:
-                print(f"✗ Timeout na série {name} (tentativa {attempt + 1}/{max_retries})")
-                if attempt == max_retries - 1:
-                    failed_series.append(name)
-                    print(f"  ⚠️ Série {name} falhou após {max_retries} tentativas")
-            
-            except Exception as e:
-                print(f"✗ Erro na série {name}: {e} (tentativa {attempt + 1}/{max_retries})")
-                if attempt == max_retries - 1:
-                    failed_series.append(name)
+                except Exception as e:
+                    # Conexão recusada, resposta ilegível etc.: também é uma requisição que falhou
+                    if inicio_requisicao is not None:
+                        registro.requisicao_http(duracao if duracao is not None else time.perf_counter() - inicio_requisicao,
+                                                 tentativa=attempt + 1, sucesso=False)
+                    print(f"✗ Erro na série {name}: {e} (tentativa {attempt + 1}/{max_retries})")
+                    if attempt == max_retries - 1:
+                        failed_series.append(name)
             
-            # Aguarda antes da próxima tentativa (backoff exponencial)
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt  # 1, 2, 4 segundos
-                print(f"  Aguardando {wait_time}s antes da próxima tentativa...")
-                time.sleep(wait_time)
-            else:
-                time.sleep(1)  # Aguarda 1s entre séries diferentes
+                # Aguarda antes da próxima tentativa (backoff exponencial)
+                if attempt < max_retries - 1:
+                    wait_time = 2 ** attempt  # 1, 2, 4 segundos
+                    print(f"  Aguardando {wait_time}s antes da próxima tentativa...")
+                    time.sleep(wait_time)
+                else:
+                    time.sleep(1)  # Aguarda 1s entre séries diferentes
     
     if failed_series:
         print(f"\n⚠️ Séries que falharam: {', '.join(failed_series)}")
@@ -186,6 +219,13 @@ def analyze_debt_credit_data():
         # Ordenar por data
         analise_df = analise_df.sort_values('data')
         
+        # Grade mensal completa em todo o período coletado; meses faltantes dentro de cada série são
+        # interpolados e marcados nas colunas <serie>_origem (bordas sem dado continuam vazias)
+        lacunas = detectar_lacunas(analise_df, 'data', frequencia='M')
+        analise_df = preencher_lacunas(analise_df, 'data', metodo='linear', frequencia='M')
+        if len(lacunas):
+            print(f"  ⚠️ {int(lacunas['periodos_faltantes'].sum())} meses faltantes preenchidos em {lacunas['serie'].nunique()} séries")
+        
         # Salvar análise consolidada
         analise_df.to_csv('data/processed/analise_divida_credito.csv', index=False)
         print(f"✓ Análise de dívida e crédito consolidada ({len(available_files)} séries)")
@@ -245,5 +285,6 @@ if __name__ == "__main__":
     
     # Gerar relatório
     generate_summary_report()
+    exportar_prometheus()
     
     print("\n✅ Processamento concluído!")
\ No newline at end of file
@@ -0,0 +1,204 @@
+### Consolidação out-of-core de extratos do SIDRA (Censo/PNAD) num dataset Parquet particionado ###
+# Cada extrato CSV é lido em blocos (pandas chunksize), normalizado com o mesmo mapeamento de
+# colunas da limpeza do IBGE e gravado como arquivos Parquet particionados por tabela e nível
+# territorial. A memória fica limitada ao tamanho do bloco, qualquer que seja o total de linhas.
+# Um manifesto guarda tamanho/mtime/hash de cada extrato: extratos inalterados não são relidos
+# e um extrato alterado tem suas partes antigas substituídas.
+import glob
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional fora desta etapa
+    pa = None
+
+from validacao import MARCADORES_SIDRA
+
+DIRETORIO_DATASET = 'data/processed/ibge/censo_parquet'
+ARQUIVO_MANIFESTO = '_manifesto.json'
+TAMANHO_BLOCO = 200_000
+VERSAO_CONSOLIDACAO = 1
+
+MAPEAMENTO_IBGE = {
+    'NC': 'nivel_territorial_codigo',
+    'NN': 'nivel_territorial_nome',
+    'MC': 'unidade_medida_codigo',
+    'MN': 'unidade_medida_nome',
+    'V': 'valor',
+    'D1C': 'dimensao1_codigo',
+    'D1N': 'dimensao1_nome',
+    'D2C': 'dimensao2_codigo',
+    'D2N': 'dimensao2_nome',
+    'D3C': 'dimensao3_codigo',
+    'D3N': 'dimensao3_nome',
+    'D4C': 'dimensao4_codigo',
+    'D4N': 'dimensao4_nome',
+    'D5C': 'dimensao5_codigo',
+    'D5N': 'dimensao5_nome',
+}
+PARTICOES = ['tabela', 'nivel_territorial_codigo']
+COLUNAS_TEXTO = [c for c in MAPEAMENTO_IBGE.values() if c != 'valor']
+
+
+def _esquema():
+    """Esquema fixo das partes (colunas de partição ficam no caminho, não no arquivo)"""
+    campos = [(c, pa.string()) for c in COLUNAS_TEXTO if c not in PARTICOES]
+    campos += [('valor', pa.float64()), ('valor_marcador', pa.string()), ('arquivo_origem', pa.string())]
+    return pa.schema(campos)
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ImportError("A consolidação em Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+
+def nome_tabela(caminho):
+    """censo2022_educacao_raw.csv -> censo2022_educacao"""
+    return re.sub(r'_raw$', '', os.path.splitext(os.path.basename(caminho))[0])
+
+
+def normalizar_bloco(bloco, tabela, arquivo_origem):
+    """
+    Normaliza um bloco lido como texto: nomes de colunas IBGE, linha de rótulos do sidrapy
+    removida, valor numérico e o sinal do SIDRA ('..', '-', 'X') preservado em valor_marcador
+    """
+    bloco = bloco.rename(columns=MAPEAMENTO_IBGE)
+    # O sidrapy grava na primeira linha os rótulos das colunas ('Valor', 'Nível Territorial', ...)
+    if 'valor' in bloco.columns:
+        bloco = bloco[bloco['valor'] != 'Valor']
+
+    valor_texto = bloco['valor'].str.strip() if 'valor' in bloco.columns else pd.Series(np.nan, index=bloco.index, dtype=object)
+    marcador = valor_texto.where(valor_texto.isin(MARCADORES_SIDRA))
+
+    resultado = pd.DataFrame(index=bloco.index)
+    for coluna in COLUNAS_TEXTO:
+        resultado[coluna] = bloco[coluna] if coluna in bloco.columns else None
+    resultado['valor'] = pd.to_numeric(valor_texto.where(marcador.isna()), errors='coerce')
+    resultado['valor_marcador'] = marcador
+    resultado['arquivo_origem'] = arquivo_origem
+    resultado['tabela'] = tabela
+    resultado['nivel_territorial_codigo'] = resultado['nivel_territorial_codigo'].fillna('sem_nivel')
+    return resultado.reset_index(drop=True)
+
+
+def _assinatura(caminho):
+    estado = os.stat(caminho)
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return {'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns, 'sha1': h.hexdigest(),
+            'versao': VERSAO_CONSOLIDACAO}
+
+
+def carregar_manifesto(destino=DIRETORIO_DATASET):
+    caminho = os.path.join(destino, ARQUIVO_MANIFESTO)
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    return {'extratos': {}}
+
+
+def _salvar_manifesto(manifesto, destino):
+    caminho = os.path.join(destino, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _inalterado(anterior, caminho):
+    """Compara tamanho/mtime e, se só o mtime mudou, o hash do conteúdo"""
+    if not anterior or anterior.get('versao') != VERSAO_CONSOLIDACAO:
+        return False
+    estado = os.stat(caminho)
+    if anterior['tamanho'] != estado.st_size:
+        return False
+    if anterior['mtime_ns'] == estado.st_mtime_ns:
+        return True
+    return _assinatura(caminho)['sha1'] == anterior['sha1']
+
+
+def consolidar_extrato(caminho, destino=DIRETORIO_DATASET, tamanho_bloco=TAMANHO_BLOCO, tabela=None):
+    """
+    Lê um extrato CSV em blocos e grava cada bloco como partes Parquet particionadas
+
+    Retorna (linhas gravadas, lista de partes relativas a destino).
+    """
+    _exigir_pyarrow()
+    tabela = tabela or nome_tabela(caminho)
+    arquivo = os.path.basename(caminho)
+    prefixo = hashlib.sha1(arquivo.encode('utf-8')).hexdigest()[:10]
+    esquema = _esquema()
+    linhas, partes = 0, []
+
+    leitor = pd.read_csv(caminho, dtype=str, keep_default_na=False, na_values=[''], chunksize=tamanho_bloco)
+    for numero, bloco in enumerate(leitor):
+        normalizado = normalizar_bloco(bloco, tabela, arquivo)
+        if normalizado.empty:
+            continue
+        for chaves, grupo in normalizado.groupby(PARTICOES, sort=False):
+            pasta = os.path.join(*[f'{c}={v}' for c, v in zip(PARTICOES, chaves)])
+            os.makedirs(os.path.join(destino, pasta), exist_ok=True)
+            parte = os.path.join(pasta, f'{prefixo}-{numero:05d}.parquet')
+            tabela_arrow = pa.Table.from_pandas(grupo.drop(columns=PARTICOES), schema=esquema, preserve_index=False)
+            pq.write_table(tabela_arrow, os.path.join(destino, parte))
+            partes.append(parte)
+        linhas += len(normalizado)
+    return linhas, partes
+
+
+def consolidar_extratos(caminhos, destino=DIRETORIO_DATASET, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Acrescenta ao dataset os extratos novos ou alterados (os inalterados são pulados)
+
+    Aceita caminhos ou padrões glob. Retorna o manifesto atualizado.
+    """
+    _exigir_pyarrow()
+    os.makedirs(destino, exist_ok=True)
+    manifesto = carregar_manifesto(destino)
+    arquivos = sorted({a for c in caminhos for a in (glob.glob(c) if glob.has_magic(c) else [c])})
+
+    for caminho in arquivos:
+        arquivo = os.path.basename(caminho)
+        anterior = manifesto['extratos'].get(arquivo)
+        if _inalterado(anterior, caminho):
+            print(f"✓ {arquivo}: inalterado, mantido no dataset")
+            continue
+
+        # Partes antigas do mesmo extrato saem antes das novas entrarem
+        for parte in (anterior or {}).get('partes', []):
+            try:
+                os.remove(os.path.join(destino, parte))
+            except FileNotFoundError:
+                pass
+
+        linhas, partes = consolidar_extrato(caminho, destino, tamanho_bloco)
+        manifesto['extratos'][arquivo] = {**_assinatura(caminho), 'linhas': linhas, 'partes': partes}
+        _salvar_manifesto(manifesto, destino)
+        print(f"✅ {arquivo}: {linhas:,} linhas em {len(partes)} partes")
+
+    return manifesto
+
+
+def abrir_dataset(destino=DIRETORIO_DATASET):
+    """Dataset pyarrow com partição hive (tabela, nivel_territorial_codigo)"""
+    _exigir_pyarrow()
+    particao = ds.partitioning(pa.schema([(c, pa.string()) for c in PARTICOES]), flavor='hive')
+    return ds.dataset(destino, format='parquet', partitioning=particao)
+
+
+def ler_consolidado(destino=DIRETORIO_DATASET, colunas=None, filtro=None):
+    """
+    Lê (parte d)o dataset para pandas, lendo só as colunas e partições necessárias
+
+    filtro: expressão pyarrow, ex. (ds.field('tabela') == 'censo2022_educacao').
+    """
+    return abrir_dataset(destino).to_table(columns=colunas, filter=filtro).to_pandas()
@@ -0,0 +1,343 @@
+### Decomposição da variação da desigualdade e da pobreza entre dois períodos ###
+# Shapley por fontes de renda: em cada um dos 2^k subconjuntos de fontes, as fontes do subconjunto
+# assumem a distribuição do período final (troca por posto: quem está no quantil q da fonte no
+# período inicial recebe o quantil q da fonte no período final) e as demais ficam no período inicial.
+# Todos os contrafactuais de um bloco de subconjuntos são uma única matriz n × b (renda = A0·(1-M)ᵀ + T·Mᵀ),
+# e os blocos são avaliados em paralelo (threads: ordenação e somas acumuladas do numpy liberam o GIL).
+# Shapley por grupos populacionais: fatores = composição (participação dos grupos) e a distribuição
+# interna de cada grupo; os contrafactuais só mudam pesos, então a renda é ordenada uma vez só.
+# Oaxaca-Blinder: diferença de médias (de log da renda) em dotações, coeficientes e interação.
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from math import factorial
+
+import numpy as np
+import pandas as pd
+
+# Indicadores disponíveis; os de pobreza são FGT(α) e exigem linha_pobreza
+INDICADORES = {'gini': None, 'pobreza': 0, 'hiato_pobreza': 1, 'severidade_pobreza': 2}
+MAX_FATORES = 16
+# Limite de elementos (linhas × subconjuntos) de cada bloco de contrafactuais
+MAX_ELEMENTOS_BLOCO = 2 ** 24
+
+
+# ---------------------------------------------------------------------- indicadores por coluna
+def _ordenar(renda, pesos):
+    """Ordena a renda (n ou n × m) e os pesos (n ou n × m) coluna a coluna; devolve matrizes n × m"""
+    if renda.ndim == 1:
+        ordem = np.argsort(renda, kind='stable')
+        renda = renda[ordem][:, None]
+        pesos = pesos[ordem]
+        return renda, pesos if pesos.ndim == 2 else pesos[:, None]
+    ordem = np.argsort(renda, axis=0, kind='stable')
+    renda = np.take_along_axis(renda, ordem, axis=0)
+    pesos = np.take_along_axis(pesos, ordem, axis=0) if pesos.ndim == 2 else pesos[ordem]
+    return renda, pesos
+
+
+def _gini_ordenado(renda, pesos):
+    """Gini de cada coluna com a renda já ordenada: 1 - Σ (P_i - P_{i-1}) (L_i + L_{i-1})"""
+    massa = pesos * renda
+    populacao = np.cumsum(pesos, axis=0)
+    acumulada = np.cumsum(massa, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        acumulada = acumulada / acumulada[-1]
+        anterior = np.vstack([np.zeros((1, acumulada.shape[1])), acumulada[:-1]])
+        return 1 - (pesos / populacao[-1] * (acumulada + anterior)).sum(axis=0)
+
+
+def _fgt(renda, pesos, linha, alfa):
+    """FGT(α) de cada coluna (renda e pesos n × m ou com broadcast)"""
+    hiato = np.clip(1 - renda / linha, 0, None)
+    termo = (hiato > 0) if alfa == 0 else hiato ** alfa
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (pesos * termo).sum(axis=0) / pesos.sum(axis=0)
+
+
+def _avaliar(renda, pesos, indicadores, linha_pobreza, ordenada=False):
+    """{indicador: vetor com um valor por coluna}"""
+    if renda.ndim == 1:
+        renda = renda[:, None]
+    if pesos.ndim == 1:
+        pesos = pesos[:, None]
+    resultado = {}
+    if 'gini' in indicadores:
+        r, p = (renda, pesos) if ordenada else _ordenar(renda, pesos)
+        resultado['gini'] = _gini_ordenado(r, np.broadcast_to(p, np.broadcast(r, p).shape))
+    for nome in indicadores:
+        if nome != 'gini':
+            resultado[nome] = _fgt(renda, pesos, linha_pobreza, INDICADORES[nome])
+    return resultado
+
+
+def _checar_indicadores(indicadores, linha_pobreza):
+    indicadores = list(indicadores)
+    desconhecidos = [i for i in indicadores if i not in INDICADORES]
+    if desconhecidos:
+        raise ValueError(f"Indicadores desconhecidos: {desconhecidos} (use {list(INDICADORES)})")
+    if linha_pobreza is None and any(i != 'gini' for i in indicadores):
+        raise ValueError("Indicadores de pobreza exigem linha_pobreza")
+    return indicadores
+
+
+def gini(renda, peso=None):
+    """Gini (ponderado) de um vetor de rendas"""
+    renda = np.asarray(renda, dtype='float64')
+    peso = np.ones_like(renda) if peso is None else np.asarray(peso, dtype='float64')
+    return float(_avaliar(renda, peso, ['gini'], None)['gini'][0])
+
+
+# ---------------------------------------------------------------------- Shapley
+def _mascaras(k):
+    """Matriz 2^k × k com os bits de cada subconjunto (linha m = subconjunto de bitmask m)"""
+    return ((np.arange(2 ** k)[:, None] >> np.arange(k)) & 1).astype('float64')
+
+
+def _valores_shapley(valores, k):
+    """
+    Contribuição de Shapley de cada fator a partir de v(S) para os 2^k subconjuntos (indexados por bitmask)
+
+    φ_j = Σ_{S ∌ j} |S|! (k-|S|-1)! / k! · [v(S ∪ {j}) - v(S)]
+    """
+    mascaras = np.arange(2 ** k)
+    tamanhos = _mascaras(k).sum(axis=1).astype(int)
+    pesos = np.array([factorial(s) * factorial(k - s - 1) / factorial(k) if s < k else 0.0
+                      for s in range(k + 1)])
+    contribuicoes = np.empty(k)
+    for j in range(k):
+        sem_j = mascaras[(mascaras >> j) & 1 == 0]
+        contribuicoes[j] = (pesos[tamanhos[sem_j]] * (valores[sem_j | (1 << j)] - valores[sem_j])).sum()
+    return contribuicoes
+
+
+def _blocos(n_linhas, n_subconjuntos, max_elementos=MAX_ELEMENTOS_BLOCO):
+    tamanho = max(1, min(n_subconjuntos, max_elementos // max(n_linhas, 1)))
+    return [np.arange(inicio, min(inicio + tamanho, n_subconjuntos)) for inicio in range(0, n_subconjuntos, tamanho)]
+
+
+def _avaliar_subconjuntos(avaliar_bloco, n_linhas, k, indicadores, threads):
+    """Avalia os 2^k contrafactuais em blocos (em paralelo) e devolve {indicador: v[bitmask]}"""
+    blocos = _blocos(n_linhas, 2 ** k)
+    if threads == 1 or len(blocos) == 1:
+        resultados = [avaliar_bloco(b) for b in blocos]
+    else:
+        with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as executor:
+            resultados = list(executor.map(avaliar_bloco, blocos))
+    return {nome: np.concatenate([r[nome] for r in resultados]) for nome in indicadores}
+
+
+def _tabela_shapley(valores, fatores, inicial, final, indicadores, residuo=False):
+    """DataFrame (uma linha por indicador) com níveis, variação e contribuições"""
+    k = len(fatores)
+    linhas = []
+    for nome in indicadores:
+        v = valores[nome]
+        linha = {'indicador': nome, 'periodo_inicial': inicial[nome], 'periodo_final': final[nome],
+                 'variacao': final[nome] - inicial[nome]}
+        linha.update(zip(fatores, _valores_shapley(v, k)))
+        if residuo:
+            # Parte que a troca fonte a fonte não reproduz (mudança na dependência entre as fontes)
+            linha['residuo'] = final[nome] - v[-1]
+        linhas.append(linha)
+    return pd.DataFrame(linhas).set_index('indicador')
+
+
+def _transportar(origem, peso_origem, destino, peso_destino):
+    """
+    Troca por posto: cada valor de origem vira o valor de destino no mesmo quantil ponderado
+
+    Empates na origem recebem o posto médio do bloco (o resultado não depende da ordem das linhas).
+    """
+    ordem = np.argsort(origem, kind='stable')
+    _, inicio, inverso = np.unique(origem[ordem], return_index=True, return_inverse=True)
+    acumulado = np.r_[0, np.cumsum(peso_origem[ordem])]
+    fim = np.r_[inicio[1:], len(origem)]
+    posto_bloco = (acumulado[inicio] + acumulado[fim]) / 2 / acumulado[-1]
+
+    ordem_destino = np.argsort(destino, kind='stable')
+    acumulado_destino = np.cumsum(peso_destino[ordem_destino])
+    meio_destino = (acumulado_destino - peso_destino[ordem_destino] / 2) / acumulado_destino[-1]
+
+    transportado = np.empty(len(origem))
+    transportado[ordem] = np.interp(posto_bloco, meio_destino, destino[ordem_destino])[inverso]
+    return transportado
+
+
+def _matriz(df, colunas):
+    return df[list(colunas)].to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _pesos(df, coluna_peso):
+    return np.ones(len(df)) if coluna_peso is None else df[coluna_peso].to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _validos(matriz, pesos):
+    return np.isfinite(matriz).all(axis=1) & np.isfinite(pesos) & (pesos > 0)
+
+
+def shapley_fontes(df_inicial, df_final, colunas_fontes, coluna_peso=None, indicadores=('gini',),
+                   linha_pobreza=None, threads=None):
+    """
+    Decompõe a variação dos indicadores entre dois períodos nas fontes de renda (Shapley)
+
+    A renda total é a soma de colunas_fontes (ex.: trabalho, transferências, outras). Cada linha do
+    resultado traz o indicador nos dois períodos, a variação, a contribuição de cada fonte e o
+    resíduo (variação não explicada pela troca das distribuições marginais das fontes).
+    Contribuições + resíduo = variação.
+    """
+    indicadores = _checar_indicadores(indicadores, linha_pobreza)
+    colunas_fontes = list(colunas_fontes)
+    k = len(colunas_fontes)
+    if not 1 <= k <= MAX_FATORES:
+        raise ValueError(f"Informe de 1 a {MAX_FATORES} fontes (recebido: {k})")
+
+    fontes_inicial, peso_inicial = _matriz(df_inicial, colunas_fontes), _pesos(df_inicial, coluna_peso)
+    fontes_final, peso_final = _matriz(df_final, colunas_fontes), _pesos(df_final, coluna_peso)
+    validos = _validos(fontes_inicial, peso_inicial)
+    fontes_inicial, peso_inicial = fontes_inicial[validos], peso_inicial[validos]
+    validos = _validos(fontes_final, peso_final)
+    fontes_final, peso_final = fontes_final[validos], peso_final[validos]
+
+    transportadas = np.column_stack([
+        _transportar(fontes_inicial[:, j], peso_inicial, fontes_final[:, j], peso_final) for j in range(k)
+    ])
+    mascaras = _mascaras(k)
+
+    def avaliar_bloco(subconjuntos):
+        m = mascaras[subconjuntos]
+        renda = fontes_inicial @ (1 - m).T + transportadas @ m.T
+        return _avaliar(renda, peso_inicial, indicadores, linha_pobreza)
+
+    valores = _avaliar_subconjuntos(avaliar_bloco, len(peso_inicial), k, indicadores, threads)
+    inicial = {nome: v[0] for nome, v in valores.items()}
+    final = {nome: v[0] for nome, v in _avaliar(fontes_final.sum(axis=1), peso_final,
+                                                 indicadores, linha_pobreza).items()}
+    return _tabela_shapley(valores, colunas_fontes, inicial, final, indicadores, residuo=True)
+
+
+def shapley_grupos(df_inicial, df_final, coluna_renda, coluna_grupo, coluna_peso=None, indicadores=('gini',),
+                   linha_pobreza=None, threads=None):
+    """
+    Decompõe a variação dos indicadores em composição (participação dos grupos na população) e
+    distribuição interna de cada grupo (Shapley)
+
+    No contrafactual de um subconjunto S, os grupos em S usam as observações do período final, os
+    demais as do período inicial, e a participação dos grupos vem do período final se 'composicao'
+    estiver em S. A decomposição é exata: a soma das contribuições é a variação.
+    """
+    indicadores = _checar_indicadores(indicadores, linha_pobreza)
+    partes = []
+    for periodo, df in enumerate((df_inicial, df_final)):
+        renda, pesos = df[coluna_renda].to_numpy(dtype='float64', na_value=np.nan), _pesos(df, coluna_peso)
+        validos = np.isfinite(renda) & np.isfinite(pesos) & (pesos > 0) & df[coluna_grupo].notna().to_numpy()
+        partes.append(pd.DataFrame({'renda': renda[validos], 'peso': pesos[validos],
+                                    'grupo': df[coluna_grupo].to_numpy()[validos], 'periodo': periodo}))
+    dados = pd.concat(partes, ignore_index=True)
+
+    grupos, codigos = np.unique(dados['grupo'].to_numpy(), return_inverse=True)
+    periodos = dados['periodo'].to_numpy()
+    pesos = dados['peso'].to_numpy()
+    g = len(grupos)
+    # massa[t, g]: peso total do grupo g no período t
+    massa = np.bincount(periodos * g + codigos, weights=pesos, minlength=2 * g).reshape(2, g)
+    ausentes = [str(grupos[j]) for j in range(g) if (massa[:, j] == 0).any()]
+    if ausentes:
+        raise ValueError(f"Grupos presentes em só um dos períodos: {ausentes}")
+    if g + 1 > MAX_FATORES:
+        raise ValueError(f"No máximo {MAX_FATORES - 1} grupos (recebido: {g})")
+    participacao = massa / massa.sum(axis=1, keepdims=True)
+
+    # Ordena uma vez: os contrafactuais só trocam os pesos
+    ordem = np.argsort(dados['renda'].to_numpy(), kind='stable')
+    renda, codigos, periodos = dados['renda'].to_numpy()[ordem], codigos[ordem], periodos[ordem]
+    base = pesos[ordem] / massa[periodos, codigos]
+    fatores = ['composicao'] + [str(x) for x in grupos]
+    mascaras = _mascaras(g + 1).astype(int)
+
+    def avaliar_bloco(subconjuntos):
+        m = mascaras[subconjuntos]
+        composicao = participacao[m[:, 0]]              # b × g
+        periodo_escolhido = m[:, 1:]                    # b × g
+        pesos_bloco = (base[:, None] * composicao[:, codigos].T
+                       * (periodos[:, None] == periodo_escolhido[:, codigos].T))
+        return _avaliar(renda, pesos_bloco, indicadores, linha_pobreza, ordenada=True)
+
+    valores = _avaliar_subconjuntos(avaliar_bloco, len(renda), g + 1, indicadores, threads)
+    inicial = {nome: v[0] for nome, v in valores.items()}
+    final = {nome: v[-1] for nome, v in valores.items()}
+    return _tabela_shapley(valores, fatores, inicial, final, indicadores)
+
+
+def decompor_periodos(df, coluna_periodo, colunas_fontes, coluna_peso=None, indicadores=('gini',),
+                      linha_pobreza=None, threads=None):
+    """
+    Shapley por fontes entre cada par de períodos consecutivos dos microdados
+
+    Uma linha por (período, indicador), alinhável à série anual (ex.: serie_temporal_desigualdade)
+    para explicar cada variação em vez de só reportá-la.
+    """
+    periodos = sorted(df[coluna_periodo].dropna().unique())
+    partes = []
+    for anterior, atual in zip(periodos[:-1], periodos[1:]):
+        tabela = shapley_fontes(df[df[coluna_periodo] == anterior], df[df[coluna_periodo] == atual],
+                                colunas_fontes, coluna_peso, indicadores, linha_pobreza, threads)
+        tabela.insert(0, 'periodo_anterior', anterior)
+        tabela.insert(0, coluna_periodo, atual)
+        partes.append(tabela.reset_index())
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True)
+
+
+# ---------------------------------------------------------------------- Oaxaca-Blinder
+def _mqp(x, y, pesos):
+    """Mínimos quadrados ponderados: coeficientes"""
+    raiz = np.sqrt(pesos)
+    return np.linalg.lstsq(x * raiz[:, None], y * raiz, rcond=None)[0]
+
+
+def oaxaca_blinder(df_inicial, df_final, coluna_renda, colunas_x, coluna_peso=None, log=True):
+    """
+    Decomposição de Oaxaca-Blinder (tripla) da diferença de médias entre os dois períodos (ou grupos)
+
+    Δ = (x̄1 - x̄0)'β0 [dotacoes] + x̄0'(β1 - β0) [coeficientes] + (x̄1 - x̄0)'(β1 - β0) [interacao]
+    Com log=True a variável dependente é ln(renda) (rendas ≤ 0 são descartadas com aviso).
+    colunas_x devem ser numéricas (variáveis categóricas entram como dummies).
+    Retorna uma linha por regressor (mais 'constante') e a linha 'total'.
+    """
+    colunas_x = list(colunas_x)
+    medias, coeficientes = [], []
+    for df in (df_inicial, df_final):
+        x = _matriz(df, colunas_x)
+        y = df[coluna_renda].to_numpy(dtype='float64', na_value=np.nan)
+        pesos = _pesos(df, coluna_peso)
+        validos = _validos(x, pesos) & np.isfinite(y)
+        if log:
+            positivos = y > 0
+            descartados = int((validos & ~positivos).sum())
+            if descartados:
+                warnings.warn(f"{descartados} observações com {coluna_renda} ≤ 0 descartadas (log)")
+            validos &= positivos
+            y = np.log(np.where(positivos, y, 1))
+        x = np.column_stack([np.ones(int(validos.sum())), x[validos]])
+        y, pesos = y[validos], pesos[validos]
+        medias.append(pesos @ x / pesos.sum())
+        coeficientes.append(_mqp(x, y, pesos))
+
+    (x0, x1), (b0, b1) = medias, coeficientes
+    tabela = pd.DataFrame({
+        'media_inicial': x0,
+        'media_final': x1,
+        'coef_inicial': b0,
+        'coef_final': b1,
+        'dotacoes': (x1 - x0) * b0,
+        'coeficientes': x0 * (b1 - b0),
+        'interacao': (x1 - x0) * (b1 - b0),
+    }, index=['constante'] + colunas_x)
+    total = tabela[['dotacoes', 'coeficientes', 'interacao']].sum()
+    tabela.loc['total', ['dotacoes', 'coeficientes', 'interacao']] = total
+    tabela['explicado'] = tabela['dotacoes']
+    tabela['nao_explicado'] = tabela['coeficientes'] + tabela['interacao']
+    tabela.loc['total', ['media_inicial', 'media_final']] = [x0 @ b0, x1 @ b1]
+    return tabela
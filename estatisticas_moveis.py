@@ -0,0 +1,134 @@
+### Estatísticas em janelas móveis (correlações, volatilidades e z-scores) ###
+# Todas as estatísticas saem de somas acumuladas sobre uma matriz (n períodos x k séries),
+# então o custo é O(n·k²) independente do tamanho da janela.
+import numpy as np
+import pandas as pd
+
+JANELAS_PADRAO = (12, 24, 36)
+
+
+def _como_matriz(dados):
+    """Converte DataFrame/array em (matriz float64 n x k, índice, nomes das colunas)"""
+    if isinstance(dados, pd.DataFrame):
+        return dados.to_numpy(dtype='float64'), dados.index, list(dados.columns)
+    matriz = np.asarray(dados, dtype='float64')
+    if matriz.ndim == 1:
+        matriz = matriz[:, None]
+    return matriz, pd.RangeIndex(len(matriz)), list(range(matriz.shape[1]))
+
+
+def _somas_janela(acumulado, janela):
+    """Soma das últimas `janela` linhas a partir de um acumulado com linha zero no início"""
+    n = acumulado.shape[0] - 1
+    fim = np.arange(1, n + 1)
+    inicio = np.maximum(fim - janela, 0)
+    return acumulado[fim] - acumulado[inicio]
+
+
+def _acumular(matriz):
+    """Soma acumulada com uma linha de zeros na frente (facilita diferença de janelas)"""
+    acumulado = np.zeros((matriz.shape[0] + 1,) + matriz.shape[1:])
+    np.cumsum(matriz, axis=0, out=acumulado[1:])
+    return acumulado
+
+
+def _momentos_univariados(matriz, janela):
+    """Contagem, média e variância amostral por série em cada janela"""
+    valido = np.isfinite(matriz)
+    # Centralizar pela média global reduz o cancelamento numérico das somas acumuladas
+    centro = np.nanmean(np.where(valido, matriz, np.nan), axis=0)
+    z = np.where(valido, matriz - centro, 0.0)
+
+    n = _somas_janela(_acumular(valido.astype('float64')), janela)
+    s1 = _somas_janela(_acumular(z), janela)
+    s2 = _somas_janela(_acumular(z * z), janela)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = s1 / n
+        variancia = (s2 - s1 * media) / (n - 1)
+    variancia = np.maximum(variancia, 0.0)
+    return n, media + centro, variancia
+
+
+def volatilidades_moveis(dados, janela, min_obs=None):
+    """Desvio-padrão amostral móvel de cada série (n x k)"""
+    matriz, _, _ = _como_matriz(dados)
+    min_obs = janela if min_obs is None else min_obs
+    n, _, variancia = _momentos_univariados(matriz, janela)
+    return np.where(n >= max(min_obs, 2), np.sqrt(variancia), np.nan)
+
+
+def zscores_moveis(dados, janela, min_obs=None):
+    """Z-score de cada observação em relação à média e desvio da própria janela (n x k)"""
+    matriz, _, _ = _como_matriz(dados)
+    min_obs = janela if min_obs is None else min_obs
+    n, media, variancia = _momentos_univariados(matriz, janela)
+    desvio = np.sqrt(variancia)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (matriz - media) / desvio
+    return np.where((n >= max(min_obs, 2)) & (desvio > 0), z, np.nan)
+
+
+def correlacoes_moveis(dados, janela, min_obs=None):
+    """
+    Correlações de Pearson móveis entre todos os pares de séries em uma única passada
+
+    Retorna um array (n, k, k). Pares com observações faltantes usam apenas os períodos
+    em que ambas as séries existem (pairwise complete), como o `DataFrame.corr()`.
+    """
+    matriz, _, _ = _como_matriz(dados)
+    min_obs = janela if min_obs is None else min_obs
+
+    valido = np.isfinite(matriz)
+    centro = np.nanmean(np.where(valido, matriz, np.nan), axis=0)
+    z = np.where(valido, matriz - centro, 0.0)
+    m = valido.astype('float64')
+
+    # Somas acumuladas de todos os produtos cruzados (t, i, j)
+    n_par = _somas_janela(_acumular(np.einsum('ti,tj->tij', m, m)), janela)
+    soma_x = _somas_janela(_acumular(np.einsum('ti,tj->tij', z, m)), janela)
+    soma_xx = _somas_janela(_acumular(np.einsum('ti,tj->tij', z * z, m)), janela)
+    soma_xy = _somas_janela(_acumular(np.einsum('ti,tj->tij', z, z)), janela)
+
+    soma_y = soma_x.transpose(0, 2, 1)
+    soma_yy = soma_xx.transpose(0, 2, 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = soma_xy - soma_x * soma_y / n_par
+        var_x = soma_xx - soma_x ** 2 / n_par
+        var_y = soma_yy - soma_y ** 2 / n_par
+        corr = cov / np.sqrt(var_x * var_y)
+
+    corr = np.clip(corr, -1.0, 1.0)
+    return np.where((n_par >= max(min_obs, 2)) & (var_x > 0) & (var_y > 0), corr, np.nan)
+
+
+def tabela_correlacoes_moveis(df, janelas=JANELAS_PADRAO, min_obs=None):
+    """Correlações móveis em formato longo: uma linha por (período, janela, par de séries)"""
+    _, indice, nomes = _como_matriz(df)
+    i, j = np.triu_indices(len(nomes), k=1)
+
+    tabelas = []
+    for janela in janelas:
+        corr = correlacoes_moveis(df, janela, min_obs)[:, i, j]
+        tabela = pd.DataFrame({
+            'periodo': np.repeat(np.asarray(indice), len(i)),
+            'janela': janela,
+            'serie_a': np.tile(np.asarray(nomes, dtype=object)[i], len(indice)),
+            'serie_b': np.tile(np.asarray(nomes, dtype=object)[j], len(indice)),
+            'correlacao': corr.ravel(),
+        })
+        tabelas.append(tabela.dropna(subset=['correlacao']))
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def estatisticas_moveis(df, janelas=JANELAS_PADRAO, min_obs=None):
+    """Volatilidades e z-scores móveis de todas as colunas, com sufixo da janela (ex.: IPCA_VOL_12M)"""
+    resultado = pd.DataFrame(index=df.index)
+    for janela in janelas:
+        vol = volatilidades_moveis(df, janela, min_obs)
+        z = zscores_moveis(df, janela, min_obs)
+        for posicao, coluna in enumerate(df.columns):
+            resultado[f'{coluna}_VOL_{janela}M'] = vol[:, posicao]
+            resultado[f'{coluna}_Z_{janela}M'] = z[:, posicao]
+    return resultado
@@ -0,0 +1,288 @@
+### Ingestão de CSV com detecção de encoding/delimitador/tipos e esquema em cache ###
+# O esquema detectado numa amostra do arquivo é gravado ao lado dele (<arquivo>.esquema.json),
+# indexado por tamanho, mtime e hash. Leituras seguintes fazem um único parse com dtypes explícitos.
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ENCODINGS_CANDIDATOS = ['utf-8', 'cp1252', 'latin-1']
+DELIMITADORES_CANDIDATOS = ',;\t|'
+SUFIXO_ESQUEMA = '.esquema.json'
+VERSAO_ESQUEMA = 1
+
+
+def _hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _chave_arquivo(caminho):
+    estado = os.stat(caminho)
+    return {'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def detectar_encoding(amostra):
+    """Primeiro encoding candidato que decodifica a amostra (tolerando caractere cortado no fim)"""
+    if amostra.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in ENCODINGS_CANDIDATOS:
+        decodificador = codecs.getincrementaldecoder(encoding)()
+        try:
+            decodificador.decode(amostra, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def detectar_delimitador(texto):
+    """Delimitador mais provável a partir das primeiras linhas"""
+    try:
+        return csv.Sniffer().sniff(texto, delimiters=DELIMITADORES_CANDIDATOS).delimiter
+    except csv.Error:
+        return ','
+
+
+def _tipos_da_amostra(texto, sep):
+    """Infere dtypes e colunas de data lendo apenas as linhas completas da amostra"""
+    linhas_completas = texto[:texto.rfind('\n') + 1] if '\n' in texto else texto
+    amostra = pd.read_csv(io.StringIO(linhas_completas), sep=sep)
+
+    dtypes, datas = {}, []
+    for coluna in amostra.columns:
+        serie = amostra[coluna]
+        if pd.api.types.is_bool_dtype(serie):
+            dtypes[coluna] = 'boolean'
+        elif pd.api.types.is_integer_dtype(serie):
+            # Inteiro nullable: uma lacuna fora da amostra não quebra o parse
+            dtypes[coluna] = 'Int64'
+        elif pd.api.types.is_float_dtype(serie):
+            dtypes[coluna] = 'float64'
+        else:
+            nao_nulos = serie.dropna()
+            convertidos = pd.to_datetime(nao_nulos, errors='coerce', format='mixed')
+            if len(nao_nulos) and convertidos.notna().all() and nao_nulos.astype(str).str.contains(r'\d[-/]\d').all():
+                datas.append(coluna)
+            else:
+                dtypes[coluna] = 'string'
+    return list(amostra.columns), dtypes, datas
+
+
+def detectar_esquema(caminho, bytes_amostra=64 * 1024):
+    """Detecta encoding, delimitador, colunas, dtypes e colunas de data de um CSV"""
+    with open(caminho, 'rb') as f:
+        amostra = f.read(bytes_amostra)
+    encoding = detectar_encoding(amostra)
+    texto = codecs.getincrementaldecoder(encoding)(errors='replace').decode(amostra, final=False)
+    sep = detectar_delimitador(texto[:8192])
+    colunas, dtypes, datas = _tipos_da_amostra(texto, sep)
+    return {
+        'versao': VERSAO_ESQUEMA,
+        'encoding': encoding,
+        'sep': sep,
+        'colunas': colunas,
+        'dtypes': dtypes,
+        'datas': datas,
+    }
+
+
+def _gravar_esquema(caminho, chave, esquema):
+    destino = caminho + SUFIXO_ESQUEMA
+    try:
+        with open(destino + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'chave': chave, 'esquema': esquema}, f, ensure_ascii=False, indent=2)
+        os.replace(destino + '.tmp', destino)
+    except OSError as e:
+        # Diretório somente leitura: segue sem cache
+        print(f"⚠️  Não foi possível gravar o esquema de {caminho}: {e}")
+
+
+def obter_esquema(caminho, redetectar=False):
+    """
+    Retorna o esquema do arquivo, reaproveitando o cache ao lado dele quando válido
+
+    Tamanho + mtime iguais: usa o cache direto. Se só o mtime mudou (cópia, checkout),
+    compara o hash do conteúdo antes de redetectar.
+    """
+    chave = _chave_arquivo(caminho)
+    destino = caminho + SUFIXO_ESQUEMA
+
+    if not redetectar and os.path.exists(destino):
+        with open(destino, encoding='utf-8') as f:
+            cache = json.load(f)
+        anterior = cache.get('chave', {})
+        if cache.get('esquema', {}).get('versao') == VERSAO_ESQUEMA and anterior.get('tamanho') == chave['tamanho']:
+            if anterior.get('mtime_ns') == chave['mtime_ns']:
+                return cache['esquema']
+            chave['sha1'] = _hash_arquivo(caminho)
+            if anterior.get('sha1') == chave['sha1']:
+                _gravar_esquema(caminho, chave, cache['esquema'])
+                return cache['esquema']
+
+    esquema = detectar_esquema(caminho)
+    chave.setdefault('sha1', _hash_arquivo(caminho))
+    _gravar_esquema(caminho, chave, esquema)
+    return esquema
+
+
+def ler_csv(caminho, usecols=None, **kwargs):
+    """
+    Lê um CSV num único parse usando o esquema detectado (encoding, sep, dtypes, datas)
+
+    Se um valor fora da amostra não couber no dtype detectado, o esquema é redetectado
+    com o arquivo inteiro como amostra e a leitura é refeita uma vez.
+    """
+    esquema = obter_esquema(caminho)
+    try:
+        return _ler_com_esquema(caminho, esquema, usecols, **kwargs)
+    except (ValueError, TypeError):
+        esquema = detectar_esquema(caminho, bytes_amostra=os.path.getsize(caminho) + 1)
+        chave = _chave_arquivo(caminho)
+        chave['sha1'] = _hash_arquivo(caminho)
+        _gravar_esquema(caminho, chave, esquema)
+        return _ler_com_esquema(caminho, esquema, usecols, **kwargs)
+
+
+def _ler_com_esquema(caminho, esquema, usecols=None, **kwargs):
+    colunas = esquema['colunas'] if usecols is None else list(usecols)
+    dtypes = {c: t for c, t in esquema['dtypes'].items() if c in colunas}
+    datas = [c for c in esquema['datas'] if c in colunas]
+    df = pd.read_csv(
+        caminho,
+        encoding=esquema['encoding'],
+        sep=esquema['sep'],
+        usecols=usecols,
+        dtype=dtypes,
+        **kwargs,
+    )
+    for coluna in datas:
+        df[coluna] = pd.to_datetime(df[coluna], format='mixed')
+    return df
+
+
+# ---------------------------------------------------------------------- representação compacta
+# Texto repetido vira categoria (códigos inteiros + dicionário), códigos numéricos viram o menor
+# inteiro que os comporta e valores decimais viram float32 quando nenhum dígito se perde.
+LIMITE_CATEGORIAS = 0.5  # fração máxima de valores distintos para uma coluna de texto virar categoria
+DIGITOS_FLOAT32 = 6      # float32 reproduz qualquer decimal de até 6 dígitos significativos
+TIPOS_INTEIROS = ('int8', 'int16', 'int32', 'int64')
+
+
+def _inteiro_compacto(valores):
+    """Menor inteiro que comporta os valores (nullable, ex. Int16, se houver ausentes)"""
+    validos = valores[~np.isnan(valores)]
+    tipo = 'int64'
+    if len(validos):
+        for candidato in TIPOS_INTEIROS:
+            info = np.iinfo(candidato)
+            if validos.min() >= info.min and validos.max() <= info.max:
+                tipo = candidato
+                break
+    if len(validos) < len(valores):
+        return pd.array(valores, dtype=tipo.capitalize())
+    return valores.astype(tipo)
+
+
+def cabe_em_float32(valores, digitos=DIGITOS_FLOAT32):
+    """Verdadeiro se todo valor finito tem no máximo `digitos` dígitos significativos"""
+    x = valores[np.isfinite(valores) & (valores != 0)]
+    if len(x) == 0:
+        return True
+    escala = 10.0 ** (digitos - 1 - np.floor(np.log10(np.abs(x))))
+    return bool(np.all(np.abs(np.round(x * escala) / escala - x) <= 1e-9 * np.abs(x)))
+
+
+def compactar_tipos(df, limite_categorias=LIMITE_CATEGORIAS, sufixo_codigo='_codigo'):
+    """
+    Converte as colunas para a representação mais compacta que preserva os valores
+
+    Colunas <...>_codigo inteiramente numéricas viram int8/16/32 (nullable se houver lacunas);
+    demais textos com poucos valores distintos viram category; float64 vira float32 quando
+    cabe_em_float32; inteiros são reduzidos ao menor tipo.
+    """
+    compacto = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(serie):
+            compacto[coluna] = serie
+        elif pd.api.types.is_float_dtype(serie):
+            valores = serie.to_numpy(dtype='float64', na_value=np.nan)
+            compacto[coluna] = serie.astype('float32') if cabe_em_float32(valores) else serie
+        elif pd.api.types.is_integer_dtype(serie):
+            valores = serie.to_numpy(dtype='float64', na_value=np.nan)
+            compacto[coluna] = pd.Series(_inteiro_compacto(valores), index=serie.index)
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            compacto[coluna] = serie
+        else:
+            numeros = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+            eh_codigo = (coluna.endswith(sufixo_codigo)
+                         and np.isfinite(numeros).sum() == serie.notna().sum()
+                         and np.all(np.mod(numeros[np.isfinite(numeros)], 1) == 0))
+            if eh_codigo:
+                compacto[coluna] = pd.Series(_inteiro_compacto(numeros), index=serie.index)
+            elif serie.nunique(dropna=True) <= limite_categorias * max(len(serie), 1):
+                compacto[coluna] = serie.astype('category')
+            else:
+                compacto[coluna] = serie
+    return pd.DataFrame(compacto, index=df.index)
+
+
+def relatorio_memoria(antes, depois, imprimir=True):
+    """Memória (bytes, deep) e tipo de cada coluna antes e depois da compactação"""
+    bytes_antes = antes.memory_usage(deep=True, index=False)
+    bytes_depois = depois.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'tipo_depois': depois.dtypes.astype(str).reindex(antes.columns),
+        'bytes_antes': bytes_antes,
+        'bytes_depois': bytes_depois.reindex(antes.columns),
+    })
+    if imprimir:
+        total_antes, total_depois = int(bytes_antes.sum()), int(bytes_depois.sum())
+        print(f"💾 Memória: {total_antes / 1e6:.2f} MB -> {total_depois / 1e6:.2f} MB "
+              f"({total_antes / max(total_depois, 1):.1f}x menor)")
+    return relatorio
+
+
+def remover_categorias_vazias(df):
+    """Tira das colunas categóricas as categorias sem linhas (após um filtro), sem tocar nos dados"""
+    df = df.copy()
+    for coluna in df.select_dtypes(include='category').columns:
+        df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
+
+
+def ler_ibge_consolidado(caminho, manter_valor_texto=False, relatorio=True):
+    """
+    Lê o dados_ibge_consolidado.csv já na representação compacta
+
+    As linhas de rótulos do sidrapy ('Valor', 'Nível Territorial (Código)', ...) são descartadas.
+    O texto de 'valor' só guarda informação além de valor_convertido nos sinais do SIDRA, que
+    ficam em valor_marcador (categoria); a coluna de texto é descartada salvo manter_valor_texto.
+    """
+    from validacao import MARCADORES_SIDRA
+
+    df = ler_csv(caminho)
+    original = df
+    if 'valor' in df.columns:
+        df = df[(df['valor'] != 'Valor').fillna(True).to_numpy(dtype=bool)]
+        valor_texto = df['valor'].astype('string').str.strip()
+        if 'valor_convertido' not in df.columns:
+            df = df.assign(valor_convertido=pd.to_numeric(valor_texto, errors='coerce'))
+        df = df.assign(valor_marcador=valor_texto.where(valor_texto.isin(MARCADORES_SIDRA)).astype('category'))
+        if not manter_valor_texto:
+            df = df.drop(columns='valor')
+
+    compacto = compactar_tipos(df.reset_index(drop=True))
+    if relatorio:
+        relatorio_memoria(original, compacto)
+    return compacto
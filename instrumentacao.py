@@ -0,0 +1,189 @@
+### Instrumentação das etapas do pipeline - tempo, memória, linhas e HTTP ###
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows não tem o módulo resource
+    resource = None
+
+DIRETORIO_METRICAS = 'data/diagnostics'
+ARQUIVO_METRICAS = os.path.join(DIRETORIO_METRICAS, 'metricas_execucao.jsonl')
+ARQUIVO_PROMETHEUS = os.path.join(DIRETORIO_METRICAS, 'metricas_execucao.prom')
+
+# Registros da execução atual (uma entrada por etapa finalizada)
+_registros = []
+_configuracao = {'destino': ARQUIVO_METRICAS, 'formato': 'jsonl'}
+
+
+def configurar(destino=ARQUIVO_METRICAS, formato='jsonl'):
+    """Define onde e em qual formato ('jsonl', 'prometheus' ou None) as métricas são gravadas"""
+    if formato not in ('jsonl', 'prometheus', None):
+        raise ValueError(f"Formato de métricas inválido: {formato}")
+    _configuracao['destino'] = destino
+    _configuracao['formato'] = formato
+
+
+def rss_pico_mb():
+    """
+    Retorna o pico de memória residente do processo em MB (None se indisponível)
+
+    É o pico desde o início do processo (ru_maxrss), não o de uma etapa: uma etapa leve
+    depois de uma pesada repete o pico da pesada.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    if os.uname().sysname == 'Darwin':
+        return pico / (1024 * 1024)
+    return pico / 1024
+
+
+class RegistroEtapa:
+    """Acumula as métricas de uma etapa enquanto ela executa"""
+
+    def __init__(self, etapa, rotulos=None):
+        self.etapa = etapa
+        self.rotulos = dict(rotulos or {})
+        self.linhas_entrada = None
+        self.linhas_saida = None
+        self.bytes_lidos = 0
+        self.bytes_escritos = 0
+        self.requisicoes = 0
+        self.tentativas_extras = 0
+        self.falhas_http = 0
+        self.latencias_http = []
+
+    def linhas(self, entrada=None, saida=None):
+        """Registra a quantidade de linhas que entraram e/ou saíram da etapa"""
+        if entrada is not None:
+            self.linhas_entrada = int(entrada)
+        if saida is not None:
+            self.linhas_saida = int(saida)
+
+    def leitura(self, caminho):
+        """Soma o tamanho de um arquivo lido pela etapa"""
+        if os.path.exists(caminho):
+            self.bytes_lidos += os.path.getsize(caminho)
+
+    def escrita(self, caminho):
+        """Soma o tamanho de um arquivo gravado pela etapa"""
+        if os.path.exists(caminho):
+            self.bytes_escritos += os.path.getsize(caminho)
+
+    def requisicao_http(self, latencia, tentativa=1, sucesso=True):
+        """Registra uma chamada HTTP (latência em segundos, tentativa começando em 1)"""
+        self.requisicoes += 1
+        self.latencias_http.append(latencia)
+        if tentativa > 1:
+            self.tentativas_extras += 1
+        if not sucesso:
+            self.falhas_http += 1
+
+    def como_dict(self):
+        latencias = sorted(self.latencias_http)
+        return {
+            'etapa': self.etapa,
+            **self.rotulos,
+            'linhas_entrada': self.linhas_entrada,
+            'linhas_saida': self.linhas_saida,
+            'bytes_lidos': self.bytes_lidos,
+            'bytes_escritos': self.bytes_escritos,
+            'http_requisicoes': self.requisicoes,
+            'http_retentativas': self.tentativas_extras,
+            'http_falhas': self.falhas_http,
+            'http_latencia_total_s': round(sum(latencias), 6),
+            'http_latencia_max_s': round(latencias[-1], 6) if latencias else None,
+        }
+
+
+@contextmanager
+def medir_etapa(etapa, **rotulos):
+    """
+    Mede tempo de parede, tempo de CPU e pico de RSS de um bloco de código
+
+    Uso:
+        with medir_etapa('carregar_dados') as registro:
+            df = pd.read_csv(caminho)
+            registro.leitura(caminho)
+            registro.linhas(saida=len(df))
+    """
+    registro = RegistroEtapa(etapa, rotulos)
+    inicio_parede = time.perf_counter()
+    inicio_cpu = time.process_time()
+    status = 'ok'
+    try:
+        yield registro
+    except BaseException:
+        status = 'erro'
+        raise
+    finally:
+        metricas = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            **registro.como_dict(),
+            'status': status,
+            'tempo_parede_s': round(time.perf_counter() - inicio_parede, 6),
+            'tempo_cpu_s': round(time.process_time() - inicio_cpu, 6),
+            'rss_pico_processo_mb': rss_pico_mb(),
+        }
+        _registros.append(metricas)
+        if _configuracao['formato'] == 'jsonl':
+            _gravar_jsonl(metricas, _configuracao['destino'])
+
+
+def _gravar_jsonl(metricas, destino):
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    with open(destino, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(metricas, ensure_ascii=False) + '\n')
+
+
+def registros():
+    """Retorna as métricas coletadas nesta execução"""
+    return list(_registros)
+
+
+def exportar_prometheus(destino=ARQUIVO_PROMETHEUS):
+    """Grava as métricas da execução no formato texto do Prometheus (node_exporter textfile)"""
+    campos = {
+        'tempo_parede_s': ('pipeline_etapa_tempo_parede_segundos', 'Tempo de parede da etapa'),
+        'tempo_cpu_s': ('pipeline_etapa_tempo_cpu_segundos', 'Tempo de CPU da etapa'),
+        'rss_pico_processo_mb': ('pipeline_processo_rss_pico_megabytes',
+                                 'Pico de RSS do processo desde o início, medido ao fim da etapa'),
+        'linhas_entrada': ('pipeline_etapa_linhas_entrada', 'Linhas recebidas pela etapa'),
+        'linhas_saida': ('pipeline_etapa_linhas_saida', 'Linhas produzidas pela etapa'),
+        'bytes_lidos': ('pipeline_etapa_bytes_lidos', 'Bytes lidos do disco'),
+        'bytes_escritos': ('pipeline_etapa_bytes_escritos', 'Bytes gravados em disco'),
+        'http_requisicoes': ('pipeline_http_requisicoes', 'Requisições HTTP feitas'),
+        'http_retentativas': ('pipeline_http_retentativas', 'Requisições HTTP que foram novas tentativas'),
+        'http_falhas': ('pipeline_http_falhas', 'Requisições HTTP sem sucesso'),
+        'http_latencia_total_s': ('pipeline_http_latencia_segundos_total', 'Soma das latências HTTP'),
+    }
+
+    linhas = []
+    for campo, (metrica, ajuda) in campos.items():
+        linhas.append(f"# HELP {metrica} {ajuda}")
+        linhas.append(f"# TYPE {metrica} gauge")
+        for registro in _registros:
+            valor = registro.get(campo)
+            if valor is None:
+                continue
+            rotulos = {k: v for k, v in registro.items()
+                       if k not in campos and k not in ('timestamp', 'http_latencia_max_s')}
+            texto_rotulos = ','.join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items())
+            linhas.append(f"{metrica}{{{texto_rotulos}}} {valor}")
+
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    # Grava em arquivo temporário e renomeia para o coletor nunca ler um arquivo pela metade
+    temporario = destino + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(linhas) + '\n')
+    os.replace(temporario, destino)
+    return destino
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,178 @@
+### Detecção e preenchimento de lacunas em séries macro numa grade completa de períodos ###
+# As séries são colocadas numa matriz (períodos x séries) sobre a grade completa da frequência
+# (diária, mensal, trimestral ou anual). Lacunas internas são preenchidas por coluna com
+# carry (último valor), interpolação linear ou interpolação sazonal (linear na série
+# dessazonalizada + fator sazonal), e cada valor recebe uma marca de origem.
+import numpy as np
+import pandas as pd
+
+from ajuste_sazonal import decompor, estacoes_do_indice
+
+# Passo típico de cada frequência em dias (para inferir a frequência das datas)
+FREQUENCIAS = {'D': 1.0, 'M': 30.44, 'Q': 91.31, 'Y': 365.25}
+PERIODOS_SAZONAIS = {'M': 12, 'Q': 4}
+METODOS = ('carry', 'linear', 'sazonal')
+# Códigos de origem: posição nesta lista (a coluna <serie>_origem é categórica com estes nomes)
+ORIGENS = ['observado', 'carry', 'linear', 'sazonal', 'ausente']
+SUFIXO_ORIGEM = '_origem'
+
+
+def inferir_frequencia(datas):
+    """Frequência ('D', 'M', 'Q' ou 'Y') mais próxima do passo mediano entre as datas"""
+    dias = np.unique(pd.DatetimeIndex(pd.to_datetime(datas)).dropna().to_numpy(dtype='datetime64[D]'))
+    if len(dias) < 2:
+        return 'M'
+    passo = float(np.median(np.diff(dias.astype('int64'))))
+    return min(FREQUENCIAS, key=lambda f: abs(FREQUENCIAS[f] - passo))
+
+
+def _matriz_grade(df, coluna_data, colunas, frequencia):
+    """Matriz (períodos da grade x colunas) com os valores observados e os ordinais da grade"""
+    datas = pd.to_datetime(df[coluna_data], errors='coerce')
+    validas = datas.notna().to_numpy()
+    ordinais = pd.PeriodIndex(datas[validas], freq=frequencia).asi8
+    valores = df.loc[validas, colunas].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    if len(ordinais) == 0:
+        return np.empty(0, dtype='int64'), np.empty((0, len(colunas)))
+
+    grade = np.arange(ordinais.min(), ordinais.max() + 1)
+    matriz = np.full((len(grade), len(colunas)), np.nan)
+    # Período repetido: vale a última observação não ausente de cada série
+    linhas = ordinais - grade[0]
+    for j in range(len(colunas)):
+        presentes = np.isfinite(valores[:, j])
+        matriz[linhas[presentes], j] = valores[presentes, j]
+    return grade, matriz
+
+
+def _interior(valido):
+    """Posições entre a primeira e a última observação de cada coluna"""
+    depois_do_inicio = np.maximum.accumulate(valido, axis=0)
+    antes_do_fim = np.maximum.accumulate(valido[::-1], axis=0)[::-1]
+    return depois_do_inicio & antes_do_fim
+
+
+def detectar_lacunas(df, coluna_data, colunas=None, frequencia=None):
+    """
+    Lacunas internas de cada série (períodos sem valor entre a primeira e a última observação)
+
+    Retorna um DataFrame com serie, inicio, fim e periodos_faltantes (uma linha por lacuna).
+    """
+    colunas = _colunas_padrao(df, coluna_data, colunas)
+    frequencia = frequencia or inferir_frequencia(df[coluna_data])
+    grade, matriz = _matriz_grade(df, coluna_data, colunas, frequencia)
+    valido = np.isfinite(matriz)
+    lacuna = ~valido & _interior(valido)
+
+    # Bordas de cada trecho de lacuna, coluna a coluna (transposta: nonzero sai ordenado por coluna)
+    borda = np.zeros((len(colunas), 1), dtype='int8')
+    mudancas = np.diff(np.hstack([borda, lacuna.T.astype('int8'), borda]), axis=1)
+    colunas_inicio, inicios = np.nonzero(mudancas == 1)
+    _, fins = np.nonzero(mudancas == -1)
+
+    periodos = pd.PeriodIndex.from_ordinals(grade, freq=frequencia) if len(grade) else None
+    return pd.DataFrame({
+        'serie': np.asarray(colunas, dtype=object)[colunas_inicio],
+        'inicio': periodos[inicios].to_timestamp() if len(inicios) else pd.DatetimeIndex([]),
+        'fim': periodos[fins - 1].to_timestamp() if len(fins) else pd.DatetimeIndex([]),
+        'periodos_faltantes': (fins - inicios).astype('int64'),
+    })
+
+
+def _colunas_padrao(df, coluna_data, colunas):
+    if colunas is not None:
+        return list(colunas)
+    return [c for c in df.select_dtypes(include='number').columns if c != coluna_data]
+
+
+def _preencher_carry(matriz, valido, datas, frequencia):
+    posicoes = np.where(valido, np.arange(len(matriz))[:, None], 0)
+    ultima = np.maximum.accumulate(posicoes, axis=0)
+    return np.take_along_axis(matriz, ultima, axis=0)
+
+
+def _preencher_linear(matriz, valido, datas, frequencia):
+    preenchida = matriz.copy()
+    eixo = np.arange(len(matriz))
+    for j in range(matriz.shape[1]):
+        if valido[:, j].any():
+            preenchida[:, j] = np.interp(eixo, eixo[valido[:, j]], matriz[valido[:, j], j])
+    return preenchida
+
+
+def _preencher_sazonal(matriz, valido, datas, frequencia):
+    periodo = PERIODOS_SAZONAIS.get(frequencia)
+    # Sem ciclo sazonal definido (ou menos de dois ciclos observados): cai para linear
+    if periodo is None or len(matriz) < 2 * periodo:
+        return _preencher_linear(matriz, valido, datas, frequencia)
+    estacoes = estacoes_do_indice(datas, periodo)
+    # A média móvel da decomposição aceita NaN, mas fica NaN em toda janela que cruza uma lacuna;
+    # sobre a série já interpolada a tendência existe perto das lacunas e os fatores usam mais ciclos
+    base = _preencher_linear(matriz, valido, datas, frequencia)
+    _, fatores, _ = decompor(base, estacoes, periodo, 'aditivo')
+    sazonal = np.nan_to_num(fatores)[estacoes]
+    return _preencher_linear(matriz - sazonal, valido, datas, frequencia) + sazonal
+
+
+PREENCHEDORES = {
+    'carry': _preencher_carry,
+    'linear': _preencher_linear,
+    'sazonal': _preencher_sazonal,
+}
+
+
+def preencher_lacunas(df, coluna_data, colunas=None, metodo='linear', frequencia=None, intervalo='total'):
+    """
+    Coloca as séries na grade completa de períodos e preenche as lacunas internas
+
+    metodo: 'carry', 'linear' ou 'sazonal', ou um dict {coluna: metodo}.
+    intervalo='total' mantém da primeira à última data de qualquer série (bordas ficam NaN,
+    com origem 'ausente'); intervalo='comum' recorta para os períodos em que todas as séries
+    têm valor, deixando a matriz densa.
+    Retorna DataFrame com coluna_data (início de cada período), as séries e <serie>_origem.
+    """
+    colunas = _colunas_padrao(df, coluna_data, colunas)
+    frequencia = frequencia or inferir_frequencia(df[coluna_data])
+    metodos = metodo if isinstance(metodo, dict) else {c: metodo for c in colunas}
+    invalidos = set(metodos.values()) - set(METODOS)
+    if invalidos:
+        raise ValueError(f"Método de preenchimento inválido: {sorted(invalidos)}")
+
+    grade, matriz = _matriz_grade(df, coluna_data, colunas, frequencia)
+    datas = pd.PeriodIndex.from_ordinals(grade, freq=frequencia).to_timestamp()
+    valido = np.isfinite(matriz)
+    lacuna = ~valido & _interior(valido)
+
+    preenchida = matriz.copy()
+    origem = np.where(valido, ORIGENS.index('observado'), ORIGENS.index('ausente')).astype('int8')
+    for nome_metodo in METODOS:
+        indices = [j for j, c in enumerate(colunas) if metodos.get(c, 'linear') == nome_metodo]
+        if not indices:
+            continue
+        estimada = PREENCHEDORES[nome_metodo](matriz[:, indices], valido[:, indices], datas, frequencia)
+        alvo = lacuna[:, indices]
+        bloco = preenchida[:, indices]
+        bloco[alvo] = estimada[alvo]
+        preenchida[:, indices] = bloco
+        origem[:, indices] = np.where(alvo, ORIGENS.index(nome_metodo), origem[:, indices])
+
+    if intervalo == 'comum':
+        completas = np.isfinite(preenchida).all(axis=1)
+        preenchida, origem, datas = preenchida[completas], origem[completas], datas[completas]
+    elif intervalo != 'total':
+        raise ValueError(f"Intervalo inválido: {intervalo}")
+
+    resultado = pd.DataFrame(preenchida, columns=colunas)
+    resultado.insert(0, coluna_data, datas)
+    for j, coluna in enumerate(colunas):
+        resultado[coluna + SUFIXO_ORIGEM] = pd.Categorical.from_codes(origem[:, j], ORIGENS)
+    return resultado
+
+
+def resumo_preenchimento(df_denso):
+    """Contagem de valores por origem em cada série (a partir das colunas <serie>_origem)"""
+    colunas = [c for c in df_denso.columns if c.endswith(SUFIXO_ORIGEM)]
+    return pd.DataFrame({
+        c[:-len(SUFIXO_ORIGEM)]: df_denso[c].value_counts().reindex(ORIGENS, fill_value=0)
+        for c in colunas
+    }).T
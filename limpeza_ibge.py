@@ -0,0 +1,229 @@
+### Limpeza dos extratos SIDRA (IBGE) arquivo a arquivo, em paralelo ###
+# Cada extrato é limpo num processo do pool (renomeia colunas, valida, converte valor e aplica o
+# processamento do tipo de dado). O DataFrame limpo volta ao processo principal como um stream
+# Arrow IPC num segmento de memória compartilhada, sem pickle de DataFrame; o resultado final é
+# montado na ordem (ordenada) dos arquivos, qualquer que seja a ordem de conclusão.
+# As mensagens de cada arquivo são capturadas no processo e impressas em bloco, na mesma ordem.
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # sem pyarrow o DataFrame volta pelo pickle do pool
+    pa = None
+
+from consolidacao_censo import MAPEAMENTO_IBGE
+from validacao import ARQUIVO_RELATORIO, validar, regras_sidra, gravar_relatorio
+
+
+# ---------------------------------------------------------------------- processamento por tipo
+def processar_dados_renda(df, nome_arquivo):
+    """Processamento específico para dados de renda"""
+    print(f"   💰 Processamento RENDA: {nome_arquivo}")
+
+    # Identificar se tem dados de renda domiciliar
+    if 'dimensao3_nome' in df.columns:
+        variaveis_renda = df[df['dimensao3_nome'].str.contains('renda|salário|income', case=False, na=False)]
+        if not variaveis_renda.empty:
+            print(f"      Variáveis de renda encontradas: {len(variaveis_renda)}")
+
+    return df
+
+
+def processar_dados_despesas(df, nome_arquivo):
+    """Processamento específico para dados de despesas"""
+    print(f"   🛒 Processamento DESPESAS: {nome_arquivo}")
+
+    if 'dimensao3_nome' in df.columns:
+        variaveis_despesas = df[df['dimensao3_nome'].str.contains('despesa|gasto|consumo', case=False, na=False)]
+        if not variaveis_despesas.empty:
+            print(f"      Variáveis de despesas encontradas: {len(variaveis_despesas)}")
+
+    return df
+
+
+def processar_dados_emprego(df, nome_arquivo):
+    """Processamento específico para dados de emprego"""
+    print(f"   💼 Processamento EMPREGO: {nome_arquivo}")
+
+    if 'dimensao3_nome' in df.columns:
+        variaveis_emprego = df[df['dimensao3_nome'].str.contains('desocupação|emprego|ocupação|informalidade', case=False, na=False)]
+        if not variaveis_emprego.empty:
+            print(f"      Variáveis de emprego encontradas: {len(variaveis_emprego)}")
+
+    return df
+
+
+def processar_dados_bens(df, nome_arquivo):
+    """Processamento específico para dados de posse de bens"""
+    print(f"   🏠 Processamento BENS: {nome_arquivo}")
+
+    if 'dimensao3_nome' in df.columns:
+        variaveis_bens = df[df['dimensao3_nome'].str.contains('PIB|consumo|vendas', case=False, na=False)]
+        if not variaveis_bens.empty:
+            print(f"      Variáveis econômicas encontradas: {len(variaveis_bens)}")
+
+    return df
+
+
+# (palavras no nome do arquivo, tipo, processamento) — vale a primeira que casar
+TIPOS_ARQUIVO = [
+    (('renda',), 'renda', processar_dados_renda),
+    (('despesas', 'consumo'), 'despesas', processar_dados_despesas),
+    (('emprego',), 'emprego', processar_dados_emprego),
+    (('educacao',), 'educacao', None),
+    (('trabalho',), 'trabalho', None),
+    (('bens',), 'bens', processar_dados_bens),
+]
+
+
+def tipo_do_arquivo(nome_arquivo):
+    """(tipo, função de processamento ou None) a partir do nome do arquivo"""
+    nome = nome_arquivo.lower()
+    for palavras, tipo, funcao in TIPOS_ARQUIVO:
+        if any(p in nome for p in palavras):
+            return tipo, funcao
+    return 'geral', None
+
+
+def limpar_arquivo(caminho, diretorio_saida=None, destino_validacao=ARQUIVO_RELATORIO):
+    """
+    Limpa um extrato SIDRA: mapeamento de colunas, validação, valor numérico e processamento do tipo
+
+    Grava <arquivo>_processado.csv em diretorio_saida (se informado).
+    Retorna (df, tipo, caminho_saida, relatório de validação).
+    """
+    nome_arquivo = os.path.basename(caminho)
+    print(f"\n📁 PROCESSANDO: {nome_arquivo}")
+
+    df = pd.read_csv(caminho, sep=',', encoding='utf-8')
+    print(f"   Dimensões originais: {df.shape}")
+
+    # 1. APLICAR MAPEAMENTO DE COLUNAS IBGE
+    mapeamento_aplicar = {col: MAPEAMENTO_IBGE[col] for col in df.columns if col in MAPEAMENTO_IBGE}
+    df = df.rename(columns=mapeamento_aplicar)
+    print(f"   Colunas renomeadas: {len(mapeamento_aplicar)}")
+
+    # Regras de qualidade antes da conversão (os sinais '..', '-', 'X' ficam registrados)
+    relatorio = validar(df, regras_sidra(df), tabela=nome_arquivo, destino=destino_validacao)
+
+    # 2. TRATAMENTO DA COLUNA VALOR
+    if 'valor' in df.columns:
+        # Converter valores com ".." para NaN (dados não disponíveis)
+        df['valor'] = df['valor'].replace('..', np.nan)
+        df['valor_convertido'] = pd.to_numeric(df['valor'], errors='coerce')
+        convertidos = df['valor_convertido'].notna().sum()
+        print(f"   Valores convertidos para numérico: {convertidos}/{len(df)}")
+
+    # 3. TIPO DE ANÁLISE PELO NOME DO ARQUIVO
+    tipo, processar = tipo_do_arquivo(nome_arquivo)
+    if processar is not None:
+        df = processar(df, nome_arquivo)
+
+    # 4. VARIÁVEIS RELEVANTES
+    if 'dimensao3_nome' in df.columns:
+        variaveis_unicas = df['dimensao3_nome'].unique()
+        print(f"   Variáveis encontradas: {list(variaveis_unicas[:5])}")
+
+    # 5. SALVAR DADOS PROCESSADOS
+    caminho_saida = None
+    if diretorio_saida:
+        caminho_saida = os.path.join(diretorio_saida, f"{os.path.splitext(nome_arquivo)[0]}_processado.csv")
+        df.to_csv(caminho_saida, index=False, encoding='utf-8')
+        print(f"   ✅ Salvo: {caminho_saida}")
+
+    return df, tipo, caminho_saida, relatorio
+
+
+# ---------------------------------------------------------------------- execução paralela
+def _para_memoria_compartilhada(df):
+    """Serializa o DataFrame como stream Arrow IPC num segmento novo; retorna (nome, tamanho)"""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    saida = pa.BufferOutputStream()
+    with ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    dados = saida.getvalue()
+    segmento = shared_memory.SharedMemory(create=True, size=max(dados.size, 1))
+    try:
+        segmento.buf[:dados.size] = memoryview(dados).cast('B')
+    except Exception:
+        segmento.close()
+        segmento.unlink()
+        raise
+    # Quem libera o segmento é o processo principal; sem isto o resource_tracker do worker
+    # removeria o segmento quando o worker terminasse
+    resource_tracker.unregister(segmento._name, 'shared_memory')
+    nome = segmento.name
+    segmento.close()
+    return nome, dados.size
+
+
+def _de_memoria_compartilhada(nome, tamanho):
+    """Lê o DataFrame do segmento e libera o segmento"""
+    segmento = shared_memory.SharedMemory(name=nome)
+    try:
+        # Uma cópia para um buffer do Arrow: o segmento pode ser liberado logo em seguida
+        buffer = pa.py_buffer(bytes(segmento.buf[:tamanho]))
+    finally:
+        segmento.close()
+        segmento.unlink()
+    return ipc.open_stream(buffer).read_all().to_pandas()
+
+
+def _limpar_em_processo(args):
+    """Tarefa do pool: limpa um arquivo com as mensagens capturadas; nunca levanta exceção"""
+    caminho, diretorio_saida = args
+    mensagens = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(mensagens):
+            # O relatório de validação é gravado pelo processo principal
+            df, tipo, caminho_saida, relatorio = limpar_arquivo(caminho, diretorio_saida, destino_validacao=None)
+        dados = _para_memoria_compartilhada(df) if pa is not None else df
+        return {'dados': dados, 'tipo': tipo, 'caminho': caminho_saida,
+                'relatorio': relatorio, 'mensagens': mensagens.getvalue()}
+    except Exception as e:
+        return {'erro': f"{type(e).__name__}: {e}", 'mensagens': mensagens.getvalue()}
+
+
+def limpar_arquivos(caminhos, diretorio_saida=None, processos=None):
+    """
+    Limpa vários extratos em paralelo (um arquivo por tarefa)
+
+    Retorna {nome_arquivo: {'dataframe', 'tipo', 'caminho'}} na ordem dos caminhos ordenados;
+    arquivos com erro ficam de fora (a mensagem é impressa). processos=1 roda sem pool.
+    """
+    caminhos = sorted(caminhos)
+    if diretorio_saida:
+        os.makedirs(diretorio_saida, exist_ok=True)
+    tarefas = [(c, diretorio_saida) for c in caminhos]
+
+    if processos == 1 or len(tarefas) <= 1:
+        resultados = [_limpar_em_processo(t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            resultados = list(executor.map(_limpar_em_processo, tarefas))
+
+    arquivos_processados = {}
+    for caminho, resultado in zip(caminhos, resultados):
+        nome_arquivo = os.path.basename(caminho)
+        print(resultado['mensagens'], end='')
+        if 'erro' in resultado:
+            print(f"   ❌ Erro: {resultado['erro']}")
+            continue
+        dados = resultado['dados']
+        df = _de_memoria_compartilhada(*dados) if isinstance(dados, tuple) else dados
+        # Relatórios de validação são gravados aqui, na ordem dos arquivos
+        gravar_relatorio(resultado['relatorio'])
+        arquivos_processados[nome_arquivo] = {
+            'dataframe': df,
+            'tipo': resultado['tipo'],
+            'caminho': resultado['caminho'],
+        }
+    return arquivos_processados
@@ -0,0 +1,191 @@
+### Curvas de Lorenz e de concentração ponderadas, com grade adaptativa e testes de dominância ###
+# Cada distribuição (ex.: UF × ano) vira uma curva linear por partes com vértices
+#   p_k = Σ_{i≤k} w_i / W      L_k = Σ_{i≤k} w_i y_i / Y      (observações ordenadas por renda)
+# Microdados e dados agrupados (percentual da população e renda média de cada classe) usam o mesmo
+# cálculo: no agrupado cada classe é uma "observação" com peso = percentual. Todas as distribuições
+# são ordenadas de uma vez (lexsort por grupo e renda).
+# As curvas são avaliadas numa grade comum de p; a grade adaptativa começa uniforme e divide os
+# intervalos onde alguma curva se afasta da interpolação linear mais que a tolerância (tipicamente
+# a cauda superior). Com todas as curvas numa matriz C × G, a dominância entre todos os pares é
+# um mínimo/máximo das diferenças, em blocos de linhas.
+import numpy as np
+import pandas as pd
+
+ARQUIVO_CLASSES = 'data/raw/fgv/distribuicao_classes_sociais.csv'
+
+# Códigos da matriz de dominância (linha i em relação à coluna j)
+IGUAIS = 0
+DOMINA = 1
+DOMINADA = -1
+CRUZAM = 2
+
+# Limite de elementos (pares × pontos da grade) de cada bloco do teste de dominância
+MAX_ELEMENTOS_BLOCO = 2 ** 24
+
+
+def _vertices(grupos, ordenacao, valores, pesos):
+    """(códigos dos grupos presentes, [p de cada grupo], [L de cada grupo])"""
+    ordem = np.lexsort((ordenacao, grupos))
+    grupos, valores, pesos = grupos[ordem], valores[ordem], pesos[ordem]
+    presentes, inicios = np.unique(grupos, return_index=True)
+    fins = np.r_[inicios[1:], len(grupos)]
+    ps, ls = [], []
+    for inicio, fim in zip(inicios, fins):
+        w = np.r_[0, np.cumsum(pesos[inicio:fim])]
+        massa = np.r_[0, np.cumsum(pesos[inicio:fim] * valores[inicio:fim])]
+        ps.append(w / w[-1])
+        ls.append(massa / massa[-1])
+    return presentes, ps, ls
+
+
+def _avaliar(ps, ls, grade):
+    """Matriz C × G com cada curva avaliada nos pontos da grade"""
+    return np.vstack([np.interp(grade, p, l) for p, l in zip(ps, ls)]) if ps else np.empty((0, len(grade)))
+
+
+def grade_adaptativa(ps, ls, tolerancia=1e-4, pontos_iniciais=33, max_pontos=1025):
+    """
+    Grade de p em [0, 1] refinada onde alguma curva se afasta da interpolação linear
+
+    Cada intervalo cujo ponto médio erra mais que tolerancia (em qualquer curva) é dividido ao meio,
+    até não haver mais divisões ou a grade chegar a max_pontos.
+    """
+    grade = np.linspace(0, 1, pontos_iniciais)
+    valores = _avaliar(ps, ls, grade)
+    while len(grade) < max_pontos:
+        meios = (grade[:-1] + grade[1:]) / 2
+        nos_meios = _avaliar(ps, ls, meios)
+        erro = np.abs(nos_meios - (valores[:, :-1] + valores[:, 1:]) / 2).max(axis=0, initial=0)
+        dividir = np.flatnonzero(erro > tolerancia)
+        if len(dividir) == 0:
+            break
+        dividir = dividir[np.argsort(-erro[dividir], kind='stable')][:max_pontos - len(grade)]
+        ordem = np.argsort(np.r_[grade, meios[dividir]], kind='stable')
+        grade = np.r_[grade, meios[dividir]][ordem]
+        valores = np.hstack([valores, nos_meios[:, dividir]])[:, ordem]
+    return grade
+
+
+class CurvasLorenz:
+    """
+    Curvas de Lorenz (ou de concentração) de várias distribuições numa grade comum
+
+    chaves: DataFrame com as colunas de agrupamento (uma linha por curva)
+    grade: pontos p (fração acumulada da população)
+    valores: matriz curvas × grade com L(p)
+    medias: média ponderada de cada distribuição (para a curva de Lorenz generalizada)
+    """
+
+    def __init__(self, chaves, grade, valores, medias):
+        self.chaves = chaves.reset_index(drop=True)
+        self.grade = grade
+        self.valores = valores
+        self.medias = medias
+
+    def __len__(self):
+        return len(self.valores)
+
+    def generalizadas(self):
+        """Curvas de Lorenz generalizadas: média × L(p)"""
+        return self.valores * self.medias[:, None]
+
+    def gini(self):
+        """Gini de cada curva pela regra do trapézio na grade (exato se a grade contém os vértices)"""
+        largura = np.diff(self.grade)
+        return 1 - (largura * (self.valores[:, 1:] + self.valores[:, :-1])).sum(axis=1)
+
+    def tabela(self):
+        """Formato longo: colunas de agrupamento, p e L"""
+        n = len(self.grade)
+        tabela = self.chaves.loc[self.chaves.index.repeat(n)].reset_index(drop=True)
+        tabela['p'] = np.tile(self.grade, len(self))
+        tabela['L'] = self.valores.ravel()
+        return tabela
+
+    def dominancia(self, generalizada=False, tolerancia=1e-9):
+        """
+        Matriz C × C (int8) da relação da curva i com a curva j na grade
+
+        DOMINA: L_i ≥ L_j em toda a grade e maior em algum ponto (i menos desigual);
+        DOMINADA: o contrário; IGUAIS; CRUZAM: nenhuma domina.
+        """
+        curvas = self.generalizadas() if generalizada else self.valores
+        c, g = curvas.shape
+        resultado = np.empty((c, c), dtype='int8')
+        bloco = max(1, MAX_ELEMENTOS_BLOCO // max(c * g, 1))
+        for inicio in range(0, c, bloco):
+            diferenca = curvas[inicio:inicio + bloco, None, :] - curvas[None, :, :]
+            acima = (diferenca > tolerancia).any(axis=2)
+            abaixo = (diferenca < -tolerancia).any(axis=2)
+            relacao = np.full(acima.shape, CRUZAM, dtype='int8')
+            relacao[acima & ~abaixo] = DOMINA
+            relacao[abaixo & ~acima] = DOMINADA
+            relacao[~acima & ~abaixo] = IGUAIS
+            resultado[inicio:inicio + bloco] = relacao
+        return resultado
+
+    def tabela_dominancia(self, generalizada=False, tolerancia=1e-9):
+        """Pares (i, j) em que a curva i domina a curva j, com as chaves de cada lado"""
+        i, j = np.nonzero(self.dominancia(generalizada, tolerancia) == DOMINA)
+        esquerda = self.chaves.iloc[i].add_suffix('_domina').reset_index(drop=True)
+        direita = self.chaves.iloc[j].add_suffix('_dominada').reset_index(drop=True)
+        return pd.concat([esquerda, direita], axis=1)
+
+
+def _chaves(df, por):
+    """Código do grupo de cada linha (-1 se alguma chave faltar) e DataFrame com as chaves de cada código"""
+    por = [por] if isinstance(por, str) else list(por or [])
+    if not por:
+        return np.zeros(len(df), dtype='int64'), pd.DataFrame(index=[0])
+    codigos, chaves = pd.MultiIndex.from_frame(df[por]).factorize(sort=True)
+    # Linhas sem UF/ano etc. ficam fora, como em pobreza.curvas_pobreza
+    codigos = np.where(df[por].isna().any(axis=1).to_numpy(), -1, codigos)
+    return codigos.astype('int64'), chaves.set_names(por).to_frame(index=False)
+
+
+def _montar(df, coluna_valor, coluna_peso, por, coluna_ordenacao, grade, tolerancia, max_pontos):
+    valores = df[coluna_valor].to_numpy(dtype='float64', na_value=np.nan)
+    pesos = (np.ones(len(df)) if coluna_peso is None
+             else df[coluna_peso].to_numpy(dtype='float64', na_value=0.0))
+    ordenacao = valores if coluna_ordenacao is None else df[coluna_ordenacao].to_numpy(dtype='float64', na_value=np.nan)
+    grupos, chaves = _chaves(df, por)
+    validos = np.isfinite(valores) & np.isfinite(ordenacao) & (pesos > 0) & (grupos >= 0)
+    grupos, ordenacao, valores, pesos = grupos[validos], ordenacao[validos], valores[validos], pesos[validos]
+
+    presentes, ps, ls = _vertices(grupos, ordenacao, valores, pesos)
+    if grade is None:
+        grade = grade_adaptativa(ps, ls, tolerancia, max_pontos=max_pontos)
+    grade = np.asarray(grade, dtype='float64')
+    massa = np.bincount(grupos, weights=pesos * valores, minlength=len(chaves))
+    populacao = np.bincount(grupos, weights=pesos, minlength=len(chaves))
+    return CurvasLorenz(chaves.iloc[presentes], grade, _avaliar(ps, ls, grade),
+                        massa[presentes] / populacao[presentes])
+
+
+def curvas_lorenz(df, coluna_renda, por=None, coluna_peso=None, coluna_ordenacao=None, grade=None,
+                  tolerancia=1e-4, max_pontos=1025):
+    """
+    Curvas de Lorenz de microdados, uma por grupo de `por` (ex.: ['uf', 'ano'])
+
+    Com coluna_ordenacao, as observações são ordenadas por essa coluna e o resultado é a curva de
+    concentração de coluna_renda (ex.: transferências ordenadas pela renda domiciliar per capita).
+    Sem grade, usa grade_adaptativa com a tolerância informada.
+    """
+    return _montar(df, coluna_renda, coluna_peso, por, coluna_ordenacao, grade, tolerancia, max_pontos)
+
+
+def curvas_agrupadas(df, coluna_percentual='percentual_populacao', coluna_renda_media='renda_media_mensal',
+                     por=None, grade=None, tolerancia=1e-4, max_pontos=1025):
+    """
+    Curvas de Lorenz de dados agrupados (participação da população e renda média de cada classe)
+
+    Aceita distribuicao_classes_sociais.csv ou a tabela por UF e período de classes_renda.
+    A interpolação linear supõe igualdade dentro de cada classe, então a curva é um limite
+    superior da curva verdadeira (e o Gini, um limite inferior).
+    """
+    return _montar(df, coluna_renda_media, coluna_percentual, por, None, grade, tolerancia, max_pontos)
+
+
+def carregar_curva_classes(caminho=ARQUIVO_CLASSES, **kwargs):
+    """Curva de Lorenz nacional a partir da distribuição de classes sociais da FGV"""
+    return curvas_agrupadas(pd.read_csv(caminho), **kwargs)
@@ -0,0 +1,123 @@
+### Índices FGT (proporção, hiato e severidade da pobreza) para grades de linhas de pobreza ###
+# A renda é ordenada uma vez por (UF, período) e acumulada em três somas ponderadas:
+#   W_c = Σ w      S1_c = Σ w·y      S2_c = Σ w·y²      (sobre as c menores rendas)
+# Para cada linha z, c = número de rendas abaixo de z (np.searchsorted) e
+#   FGT0 = W_c / W      FGT1 = (z·W_c - S1_c) / (z·W)      FGT2 = (z²·W_c - 2z·S1_c + S2_c) / (z²·W)
+# Assim a curva inteira de incidência (centenas de linhas) custa o mesmo que uma linha só.
+import numpy as np
+import pandas as pd
+
+from classes_renda import LIMITES_SM, salario_minimo
+
+# Linhas em múltiplos do salário mínimo, as mesmas das classes de renda
+LINHA_EXTREMA_POBREZA_SM = LIMITES_SM[0]
+LINHA_POBREZA_SM = LIMITES_SM[1]
+
+
+def grade_linhas(inicio, fim, passo):
+    """Grade de linhas de pobreza de inicio a fim (inclusive), ex.: grade_linhas(0, 2000, 10)"""
+    return np.arange(inicio, fim + passo / 2, passo, dtype='float64')
+
+
+def _fgt_ordenado(renda, pesos, linhas, inclusiva=False):
+    """FGT(0, 1, 2) de um grupo com a renda já ordenada, para todas as linhas (matriz 3 × L)"""
+    w = np.r_[0, np.cumsum(pesos)]
+    s1 = np.r_[0, np.cumsum(pesos * renda)]
+    s2 = np.r_[0, np.cumsum(pesos * renda * renda)]
+    c = np.searchsorted(renda, linhas, side='right' if inclusiva else 'left')
+    total = w[-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        fgt0 = w[c] / total
+        fgt1 = (linhas * w[c] - s1[c]) / (linhas * total)
+        fgt2 = (linhas * linhas * w[c] - 2 * linhas * s1[c] + s2[c]) / (linhas * linhas * total)
+    # Linha zero: ninguém abaixo, hiato e severidade nulos (evita 0/0)
+    fgt1 = np.where(linhas > 0, fgt1, 0.0)
+    fgt2 = np.where(linhas > 0, np.clip(fgt2, 0, None), 0.0)
+    return np.vstack([fgt0, fgt1, fgt2])
+
+
+def fgt(renda, linhas, peso=None, inclusiva=False):
+    """
+    FGT(0, 1, 2) de um vetor de rendas para uma linha ou uma grade de linhas
+
+    Retorna DataFrame com linha, pobreza (proporção), hiato_pobreza e severidade_pobreza.
+    Por padrão é pobre quem tem renda < linha; inclusiva=True usa renda ≤ linha.
+    """
+    renda = np.asarray(renda, dtype='float64')
+    pesos = np.ones_like(renda) if peso is None else np.asarray(peso, dtype='float64')
+    linhas = np.atleast_1d(np.asarray(linhas, dtype='float64'))
+    validos = np.isfinite(renda) & np.isfinite(pesos) & (pesos > 0)
+    ordem = np.argsort(renda[validos], kind='stable')
+    indices = _fgt_ordenado(renda[validos][ordem], pesos[validos][ordem], linhas, inclusiva)
+    return pd.DataFrame({'linha': linhas, 'pobreza': indices[0], 'hiato_pobreza': indices[1],
+                         'severidade_pobreza': indices[2]})
+
+
+def curvas_pobreza(df, coluna_renda, linhas, coluna_periodo, coluna_uf=None, coluna_peso=None,
+                   coluna_ano=None, inclusiva=False):
+    """
+    FGT(0, 1, 2) por UF e período para toda a grade de linhas
+
+    Com coluna_ano, a renda é convertida em múltiplos do salário mínimo do ano e as linhas
+    são lidas em salários mínimos (ex.: np.linspace(0, 2, 81)). Sem coluna de UF, o resultado
+    é nacional (uf = 'BR'). Retorna formato longo: uf, periodo, linha, populacao, pobreza,
+    hiato_pobreza, severidade_pobreza.
+    """
+    linhas = np.atleast_1d(np.asarray(linhas, dtype='float64'))
+    renda = df[coluna_renda].to_numpy(dtype='float64', na_value=np.nan)
+    if coluna_ano is not None:
+        # Sem ano não há salário mínimo de referência: a renda fica NaN e a linha sai como as sem UF
+        anos = pd.to_numeric(df[coluna_ano], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        tem_ano = np.isfinite(anos)
+        renda = np.where(tem_ano, renda, np.nan)
+        renda[tem_ano] /= salario_minimo(anos[tem_ano].astype('int64'))
+    pesos = (np.ones(len(df)) if coluna_peso is None
+             else df[coluna_peso].to_numpy(dtype='float64', na_value=0.0))
+
+    codigos_uf, ufs = pd.factorize(df[coluna_uf] if coluna_uf else pd.Series('BR', index=df.index), sort=True)
+    codigos_periodo, periodos = pd.factorize(df[coluna_periodo], sort=True)
+    grupos = codigos_uf.astype('int64') * len(periodos) + codigos_periodo
+    validos = np.isfinite(renda) & (pesos > 0) & (codigos_uf >= 0) & (codigos_periodo >= 0)
+    renda, pesos, grupos = renda[validos], pesos[validos], grupos[validos]
+
+    # Uma ordenação para todos os grupos: por grupo e, dentro dele, por renda
+    ordem = np.lexsort((renda, grupos))
+    renda, pesos, grupos = renda[ordem], pesos[ordem], grupos[ordem]
+    presentes, inicios = np.unique(grupos, return_index=True)
+    fins = np.r_[inicios[1:], len(grupos)]
+
+    n_linhas = len(linhas)
+    indices = np.empty((len(presentes), 3, n_linhas))
+    populacao = np.empty(len(presentes))
+    for i, (inicio, fim) in enumerate(zip(inicios, fins)):
+        indices[i] = _fgt_ordenado(renda[inicio:fim], pesos[inicio:fim], linhas, inclusiva)
+        populacao[i] = pesos[inicio:fim].sum()
+
+    return pd.DataFrame({
+        'uf': np.repeat(np.asarray(ufs)[presentes // len(periodos)], n_linhas),
+        'periodo': np.repeat(np.asarray(periodos)[presentes % len(periodos)], n_linhas),
+        'linha': np.tile(linhas, len(presentes)),
+        'populacao': np.repeat(populacao, n_linhas),
+        'pobreza': indices[:, 0].ravel(),
+        'hiato_pobreza': indices[:, 1].ravel(),
+        'severidade_pobreza': indices[:, 2].ravel(),
+    })
+
+
+def serie_pobreza(df, coluna_renda, coluna_ano, coluna_peso=None, coluna_periodo=None,
+                  linha_pobreza_sm=LINHA_POBREZA_SM, linha_extrema_sm=LINHA_EXTREMA_POBREZA_SM):
+    """
+    pobreza_percentual e extrema_pobreza_percentual por período a partir de microdados
+
+    Mesmas colunas de serie_temporal_desigualdade.csv, com as linhas em salários mínimos e fechadas
+    à direita como nas classes de renda (quem tem exatamente 0,25 SM está em extrema pobreza).
+    """
+    coluna_periodo = coluna_periodo or coluna_ano
+    curvas = curvas_pobreza(df, coluna_renda, [linha_extrema_sm, linha_pobreza_sm], coluna_periodo,
+                            coluna_peso=coluna_peso, coluna_ano=coluna_ano, inclusiva=True)
+    tabela = curvas.pivot(index='periodo', columns='linha', values='pobreza') * 100
+    return pd.DataFrame({
+        coluna_periodo: tabela.index,
+        'pobreza_percentual': tabela[linha_pobreza_sm].to_numpy(),
+        'extrema_pobreza_percentual': tabela[linha_extrema_sm].to_numpy(),
+    })
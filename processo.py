@@ -1,18 +1,29 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
 import warnings
 import os
+from instrumentacao import medir_etapa, exportar_prometheus
+from estatisticas_moveis import tabela_correlacoes_moveis, estatisticas_moveis
+from regressao_defasagens import regressoes_defasadas
+from ajuste_sazonal import ajustar_sazonalmente
+from ingestao import ler_csv
+from validacao import validar, regras_serie_mensal
+from lacunas import detectar_lacunas, preencher_lacunas
+from armazem_series import ArmazemSeries, DIRETORIO_ARMAZEM
 warnings.filterwarnings('ignore')
 
-# Configuração para melhor visualização
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
-
 # Diretório específico onde estão os arquivos
 DIRETORIO_BASE = r"C:\Users\Pedro\Documents\coisas que o FDP do ENZO quer\IPEA\data\raw\ipea"
+DIRETORIO_PROCESSADOS = r"C:\Users\Pedro\Documents\coisas que o FDP do ENZO quer\IPEA\data\processed"
+
+def preparar_graficos():
+    """Importa matplotlib/seaborn sob demanda e aplica o estilo dos gráficos"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
+    return plt
 
 def verificar_arquivos():
     """Verifica se os arquivos existem no diretório específico"""
@@ -78,11 +89,11 @@ def carregar_dados_raw():
     try:
         # Carregar dados de inflação
         print(f"📥 Carregando: {arquivos_encontrados['inflacao']}")
-        inflacao_df = pd.read_csv(arquivos_encontrados['inflacao'])
+        inflacao_df = ler_csv(arquivos_encontrados['inflacao'])
         
         # Carregar dados de desocupação
         print(f"📥 Carregando: {arquivos_encontrados['desocupacao']}")
-        desocupacao_df = pd.read_csv(arquivos_encontrados['desocupacao'])
+        desocupacao_df = ler_csv(arquivos_encontrados['desocupacao'])
         
         print(f"✅ Dados de inflação carregados: {inflacao_df.shape}")
         print(f"✅ Dados de desocupação carregados: {desocupacao_df.shape}")
@@ -143,6 +154,15 @@ def processar_desocupacao(desocupacao_df):
     
     return desocupacao_df
 
+def validar_dados(inflacao_df, desocupacao_df):
+    """Aplica as regras de qualidade às duas séries (relatório em data/diagnostics/validacao.jsonl)"""
+    print("\n🔎 Validando dados...")
+    
+    relatorio_inflacao = validar(inflacao_df, regras_serie_mensal('VALDATA', 'VALVALOR', minimo=0), 'inflacao_ipca')
+    relatorio_desocupacao = validar(desocupacao_df, regras_serie_mensal('VALDATA', 'VALVALOR', minimo=0, maximo=100), 'taxa_desocupacao')
+    
+    return relatorio_inflacao['ok'] and relatorio_desocupacao['ok']
+
 def filtrar_periodo_comum(inflacao_df, desocupacao_df, ano_inicio=2012):
     """Filtra os dados para o período comum entre as duas séries"""
     print(f"\n🎯 Filtrando para período comum (a partir de {ano_inicio})...")
@@ -172,6 +192,19 @@ def criar_dataset_combinado(inflacao_df, desocupacao_df):
     # Combinar os datasets
     dataset_combinado = pd.merge(inflacao_clean, desocupacao_clean, on='VALDATA', how='inner')
     
+    # Meses ausentes em qualquer série: refaz sobre a grade mensal completa com os valores preenchidos
+    # (IPCA é índice: interpolação linear; desocupação tem sazonalidade forte)
+    lacunas = detectar_lacunas(dataset_combinado, 'VALDATA', ['IPCA', 'TAXA_DESOCUPACAO'], frequencia='M')
+    if len(lacunas):
+        painel = pd.merge(inflacao_clean, desocupacao_clean, on='VALDATA', how='outer')
+        dataset_combinado = preencher_lacunas(
+            painel, 'VALDATA', ['IPCA', 'TAXA_DESOCUPACAO'],
+            metodo={'IPCA': 'linear', 'TAXA_DESOCUPACAO': 'sazonal'},
+            frequencia='M', intervalo='comum',
+        )
+        preenchidos = sum(int((dataset_combinado[f'{c}_origem'] != 'observado').sum()) for c in ['IPCA', 'TAXA_DESOCUPACAO'])
+        print(f"  ⚠️ {preenchidos} valores mensais ausentes preenchidos (origem em *_origem)")
+    
     print(f"✅ Dataset combinado criado: {dataset_combinado.shape}")
     print(f"  📅 Período coberto: {dataset_combinado['VALDATA'].min()} até {dataset_combinado['VALDATA'].max()}")
     print(f"  📊 Total de observações: {len(dataset_combinado)}")
@@ -200,6 +233,15 @@ def criar_features_adicionais(dataset_combinado):
     df['DESOCUPACAO_VARIACAO_MENSAL'] = df['TAXA_DESOCUPACAO'].diff()
     df['DESOCUPACAO_VARIACAO_ANUAL'] = df['TAXA_DESOCUPACAO'].diff(12)
     
+    # Séries dessazonalizadas (IPCA é um índice: modelo multiplicativo)
+    series = df.set_index('VALDATA')
+    ipca_dessaz = ajustar_sazonalmente(series[['IPCA']], modelo='multiplicativo')
+    desocupacao_dessaz = ajustar_sazonalmente(series[['TAXA_DESOCUPACAO']], modelo='aditivo')
+    df['IPCA_DESSAZ'] = ipca_dessaz['IPCA'].to_numpy()
+    df['TAXA_DESOCUPACAO_DESSAZ'] = desocupacao_dessaz['TAXA_DESOCUPACAO'].to_numpy()
+    df['IPCA_VARIACAO_MENSAL_DESSAZ'] = df['IPCA_DESSAZ'].pct_change() * 100
+    df['DESOCUPACAO_VARIACAO_MENSAL_DESSAZ'] = df['TAXA_DESOCUPACAO_DESSAZ'].diff()
+    
     # Classificar períodos por nível de inflação
     conditions = [
         df['IPCA_VARIACAO_ANUAL'] < 3,
@@ -244,9 +286,52 @@ def analisar_dados(dataset_completo):
     
     return correlacao, stats_anual
 
+def analisar_janelas_moveis(dataset_completo, janelas=(12, 24, 36)):
+    """Calcula correlações, volatilidades e z-scores em janelas móveis de 12/24/36 meses"""
+    print("\n🪟 Calculando estatísticas em janelas móveis...")
+    
+    series = dataset_completo.set_index('VALDATA')[['IPCA_VARIACAO_ANUAL', 'TAXA_DESOCUPACAO']]
+    
+    correlacoes = tabela_correlacoes_moveis(series, janelas)
+    estatisticas = estatisticas_moveis(series, janelas)
+    
+    for janela in janelas:
+        ultimas = correlacoes[correlacoes['janela'] == janela]
+        if not ultimas.empty:
+            ultima = ultimas.iloc[-1]
+            print(f"  🔗 Correlação {janela}M ({ultima['periodo']:%Y-%m}): {ultima['correlacao']:.3f}")
+    
+    return correlacoes, estatisticas
+
+def estimar_curva_phillips(dataset_completo, defasagens=range(0, 25)):
+    """Regride a inflação anual na desocupação defasada (0-24 meses) por subperíodo"""
+    print("\n📉 Estimando curva de Phillips com defasagens...")
+    
+    series = dataset_completo.set_index('VALDATA')[['IPCA_VARIACAO_ANUAL', 'TAXA_DESOCUPACAO']]
+    subperiodos = [
+        (None, None),
+        (None, '2019-12-31'),
+        ('2020-01-01', None),
+    ]
+    
+    resultados = regressoes_defasadas(
+        series,
+        pares=[('IPCA_VARIACAO_ANUAL', 'TAXA_DESOCUPACAO')],
+        defasagens=defasagens,
+        subperiodos=subperiodos,
+    )
+    
+    melhores = resultados.sort_values('r2', ascending=False).groupby(['inicio', 'fim']).head(1)
+    for _, linha in melhores.iterrows():
+        print(f"  📐 {linha['inicio']:%Y-%m} a {linha['fim']:%Y-%m}: defasagem {linha['defasagem']}m, "
+              f"beta={linha['beta']:.3f} (t HAC={linha['t_beta_hac']:.2f}), R²={linha['r2']:.3f}")
+    
+    return resultados
+
 def visualizar_dados(dataset_completo):
     """Cria visualizações dos dados"""
     print("\n📈 Criando visualizações...")
+    plt = preparar_graficos()
     
     fig, axes = plt.subplots(2, 2, figsize=(16, 12))
     fig.suptitle('Análise de Inflação e Taxa de Desocupação (2012-2025)', fontsize=16, fontweight='bold')
@@ -295,7 +380,7 @@ def salvar_dados_processados(dataset_completo):
     print("\n💾 Salvando dados processados...")
     
     # Criar diretório para dados processados se não existir
-    dir_processados = r"C:\Users\Pedro\Documents\coisas que o FDP do ENZO quer\IPEA\data\processed"
+    dir_processados = DIRETORIO_PROCESSADOS
     os.makedirs(dir_processados, exist_ok=True)
     
     # Formatar datas para exibição
@@ -323,40 +408,103 @@ def salvar_dados_processados(dataset_completo):
     # Mostrar preview dos dados salvos
     print("\n👀 Preview dos dados processados:")
     print(dataset_salvar.head())
+    
+    return caminho_completo, caminho_resumo
+
+def publicar_series(dataset_completo, diretorio=DIRETORIO_ARMAZEM):
+    """Publica as séries mensais no armazém binário (lido pelo serviço de consultas)"""
+    colunas = [c for c in dataset_completo.select_dtypes(include='number').columns
+               if c not in ('ANO', 'MES', 'TRIMESTRE')]
+    armazem = ArmazemSeries(diretorio)
+    with armazem.lote():
+        for coluna in colunas:
+            armazem.gravar(coluna, dataset_completo['VALDATA'], dataset_completo[coluna],
+                           frequencia='M', origem='processo.py')
+    print(f"✓ {len(colunas)} séries publicadas em {diretorio}")
+    return colunas
+
+def carregar_dados_processados():
+    """Relê o dataset combinado salvo pela última execução (para refazer só os gráficos)"""
+    caminho = os.path.join(DIRETORIO_PROCESSADOS, 'dados_combinados_processados.csv')
+    dataset = ler_csv(caminho)
+    dataset['VALDATA'] = pd.to_datetime(dataset['VALDATA'])
+    return dataset
 
-def main():
-    """Função principal"""
+def main(graficos=True):
+    """Função principal (graficos=False para execuções só de dados, ex. cron)"""
     print("=== PROCESSAMENTO DE DADOS ECONÔMICOS DO IPEA ===\n")
     print(f"📁 Diretório dos dados: {DIRETORIO_BASE}")
     
     try:
         # 1. Carregar dados raw
-        inflacao_raw, desocupacao_raw = carregar_dados_raw()
+        with medir_etapa('carregar_dados_raw') as registro:
+            inflacao_raw, desocupacao_raw = carregar_dados_raw()
+            registro.leitura(os.path.join(DIRETORIO_BASE, 'inflacao_ipca_raw.csv'))
+            registro.leitura(os.path.join(DIRETORIO_BASE, 'taxa_desocupacao_raw.csv'))
+            if inflacao_raw is not None and desocupacao_raw is not None:
+                registro.linhas(saida=len(inflacao_raw) + len(desocupacao_raw))
         
         if inflacao_raw is None or desocupacao_raw is None:
             return
         
         # 2. Processar dados individuais
-        inflacao_processada = processar_inflacao(inflacao_raw)
-        desocupacao_processada = processar_desocupacao(desocupacao_raw)
+        with medir_etapa('processar_inflacao') as registro:
+            inflacao_processada = processar_inflacao(inflacao_raw)
+            registro.linhas(entrada=len(inflacao_raw), saida=len(inflacao_processada))
+        with medir_etapa('processar_desocupacao') as registro:
+            desocupacao_processada = processar_desocupacao(desocupacao_raw)
+            registro.linhas(entrada=len(desocupacao_raw), saida=len(desocupacao_processada))
+        
+        with medir_etapa('validar_dados') as registro:
+            dados_validos = validar_dados(inflacao_processada, desocupacao_processada)
+            registro.linhas(entrada=len(inflacao_processada) + len(desocupacao_processada))
+        if not dados_validos:
+            print("⚠️  Há violações de qualidade nos dados; veja data/diagnostics/validacao.jsonl")
         
         # 3. Filtrar período comum
-        inflacao_filtrada, desocupacao_filtrada = filtrar_periodo_comum(inflacao_processada, desocupacao_processada)
+        with medir_etapa('filtrar_periodo_comum') as registro:
+            inflacao_filtrada, desocupacao_filtrada = filtrar_periodo_comum(inflacao_processada, desocupacao_processada)
+            registro.linhas(entrada=len(inflacao_processada) + len(desocupacao_processada),
+                            saida=len(inflacao_filtrada) + len(desocupacao_filtrada))
         
         # 4. Combinar datasets
-        dataset_combinado = criar_dataset_combinado(inflacao_filtrada, desocupacao_filtrada)
+        with medir_etapa('criar_dataset_combinado') as registro:
+            dataset_combinado = criar_dataset_combinado(inflacao_filtrada, desocupacao_filtrada)
+            registro.linhas(entrada=len(inflacao_filtrada) + len(desocupacao_filtrada), saida=len(dataset_combinado))
         
         # 5. Criar features adicionais
-        dataset_completo = criar_features_adicionais(dataset_combinado)
+        with medir_etapa('criar_features_adicionais') as registro:
+            dataset_completo = criar_features_adicionais(dataset_combinado)
+            registro.linhas(entrada=len(dataset_combinado), saida=len(dataset_completo))
         
         # 6. Análise dos dados
-        correlacao, stats_anual = analisar_dados(dataset_completo)
+        with medir_etapa('analisar_dados') as registro:
+            correlacao, stats_anual = analisar_dados(dataset_completo)
+            registro.linhas(entrada=len(dataset_completo), saida=len(stats_anual))
+        with medir_etapa('analisar_janelas_moveis') as registro:
+            correlacoes_moveis, estatisticas_janela = analisar_janelas_moveis(dataset_completo)
+            registro.linhas(entrada=len(dataset_completo), saida=len(correlacoes_moveis))
+        with medir_etapa('estimar_curva_phillips') as registro:
+            regressoes_phillips = estimar_curva_phillips(dataset_completo)
+            registro.linhas(entrada=len(dataset_completo), saida=len(regressoes_phillips))
         
         # 7. Visualizações
-        visualizar_dados(dataset_completo)
+        if graficos:
+            with medir_etapa('visualizar_dados') as registro:
+                visualizar_dados(dataset_completo)
+                registro.linhas(entrada=len(dataset_completo))
         
         # 8. Salvar dados processados
-        salvar_dados_processados(dataset_completo)
+        with medir_etapa('salvar_dados_processados') as registro:
+            caminhos_salvos = salvar_dados_processados(dataset_completo)
+            for caminho in caminhos_salvos:
+                registro.escrita(caminho)
+            registro.linhas(entrada=len(dataset_completo))
+        with medir_etapa('publicar_series') as registro:
+            series_publicadas = publicar_series(dataset_completo)
+            registro.linhas(entrada=len(dataset_completo), saida=len(series_publicadas))
+        
+        exportar_prometheus()
         
         print("\n🎉 PROCESSAMENTO CONCLUÍDO COM SUCESSO ===")
         print(f"📊 Total de observações processadas: {len(dataset_completo)}")
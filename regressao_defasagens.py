@@ -0,0 +1,151 @@
+### Regressões defasadas em lote (curva de Phillips e afins) ###
+# Ajusta y_t = alfa + beta * x_{t-L} para todos os pares de séries, defasagens L e subperíodos.
+# Os coeficientes, o R² e o erro-padrão HAC (Newey-West) saem de produtos cruzados acumulados,
+# então cada especificação custa O(1) depois de uma passada O(n) por par e defasagem.
+import itertools
+
+import numpy as np
+import pandas as pd
+
+DEFASAGENS_PADRAO = range(0, 25)
+
+# Monômios usados para montar o resíduo ponderado u_t = (x_t - x̄) * e_t
+# u_t = c · [x*y, x², x, y, 1]
+_N_MONOMIOS = 5
+
+
+def _acumular(matriz):
+    acumulado = np.zeros((matriz.shape[0] + 1,) + matriz.shape[1:])
+    np.cumsum(matriz, axis=0, out=acumulado[1:])
+    return acumulado
+
+
+def _defasar(matriz, defasagem):
+    """Desloca as linhas para baixo (x_{t-L}), preenchendo o início com NaN"""
+    if defasagem == 0:
+        return matriz
+    deslocada = np.full_like(matriz, np.nan)
+    deslocada[defasagem:] = matriz[:-defasagem]
+    return deslocada
+
+
+def _posicoes_subperiodos(indice, subperiodos):
+    """Converte rótulos (inicio, fim) inclusivos em posições [ini, fim) do índice"""
+    if subperiodos is None:
+        return [(0, len(indice))], [(indice[0], indice[-1])]
+    posicoes, rotulos = [], []
+    for inicio, fim in subperiodos:
+        ini = 0 if inicio is None else int(indice.searchsorted(inicio, side='left'))
+        fin = len(indice) if fim is None else int(indice.searchsorted(fim, side='right'))
+        if fin <= ini:
+            raise ValueError(f"Subperíodo vazio: {inicio} a {fim}")
+        posicoes.append((ini, fin))
+        rotulos.append((indice[ini], indice[fin - 1]))
+    return posicoes, rotulos
+
+
+def regressoes_defasadas(df, pares=None, defasagens=DEFASAGENS_PADRAO, subperiodos=None, lags_hac=None):
+    """
+    Ajusta MQO simples para cada combinação (dependente, explicativa, defasagem, subperíodo)
+
+    df: DataFrame com uma coluna por série e índice temporal ordenado (frequência regular)
+    pares: lista de (dependente, explicativa); padrão = todos os pares ordenados de colunas
+    subperiodos: lista de (inicio, fim) em rótulos do índice; None = amostra inteira
+    lags_hac: janela de Newey-West; padrão = floor(4 * (n/100)^(2/9))
+
+    Retorna um DataFrame com coeficientes, R², erro-padrão HAC do beta e estatística t.
+    """
+    colunas = list(df.columns)
+    if pares is None:
+        pares = [(y, x) for y, x in itertools.permutations(colunas, 2)]
+    pares = list(pares)
+    pos_y = np.array([colunas.index(y) for y, _ in pares])
+    pos_x = np.array([colunas.index(x) for _, x in pares])
+
+    matriz = df.to_numpy(dtype='float64')
+    n = len(matriz)
+    if lags_hac is None:
+        lags_hac = int(np.floor(4 * (n / 100) ** (2 / 9)))
+
+    # Centralizar melhora a estabilidade das somas; alfa é corrigido no final
+    centro = np.nanmean(matriz, axis=0)
+    matriz = matriz - centro
+
+    posicoes, rotulos = _posicoes_subperiodos(df.index, subperiodos)
+    ini = np.array([p[0] for p in posicoes])
+    fim = np.array([p[1] for p in posicoes])
+
+    resultados = []
+    for defasagem in defasagens:
+        y = matriz[:, pos_y]
+        x = _defasar(matriz, defasagem)[:, pos_x]
+        valido = np.isfinite(y) & np.isfinite(x)
+        y = np.where(valido, y, 0.0)
+        x = np.where(valido, x, 0.0)
+        v = valido.astype('float64')
+
+        # (n, pares, monômios), zerados onde a observação não existe
+        monomios = np.stack([x * y, x * x, x, y, v], axis=2)
+
+        # Momentos de primeira e segunda ordem por subperíodo: (subperíodos, pares, monômios)
+        acumulado = _acumular(monomios)
+        soma = acumulado[fim] - acumulado[ini]
+        s_xy, s_xx, s_x, s_y, n_obs = (soma[..., m] for m in range(_N_MONOMIOS))
+        acumulado_yy = _acumular(y * y)
+        s_yy = acumulado_yy[fim] - acumulado_yy[ini]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_x = s_x / n_obs
+            media_y = s_y / n_obs
+            sxx_c = s_xx - s_x * media_x
+            sxy_c = s_xy - s_x * media_y
+            syy_c = s_yy - s_y * media_y
+            beta = sxy_c / sxx_c
+            alfa = media_y - beta * media_x
+            r2 = sxy_c ** 2 / (sxx_c * syy_c)
+
+        # Coeficientes de u_t = (x - x̄)(y - ȳ) - beta (x - x̄)² na base de monômios
+        coef = np.stack([
+            np.ones_like(beta),
+            -beta,
+            -media_y + 2 * beta * media_x,
+            -media_x,
+            media_x * media_y - beta * media_x ** 2,
+        ], axis=-1)
+
+        # Newey-West: Γ_j = c' G_j c, com G_j = Σ_t f(t) f(t-j)' dentro do subperíodo
+        variancia_longo_prazo = np.zeros_like(beta)
+        for j in range(lags_hac + 1):
+            produtos = np.einsum('tpa,tpb->tpab', monomios[j:], monomios[:n - j])
+            acumulado_j = _acumular(produtos)
+            # t percorre [ini + j, fim); o índice do acumulado é t - j
+            inicio_j = np.minimum(ini, np.maximum(fim - j, 0))
+            fim_j = np.maximum(fim - j, inicio_j)
+            g = acumulado_j[fim_j] - acumulado_j[inicio_j]
+            gama = np.einsum('spa,spab,spb->sp', coef, g, coef)
+            peso = 1.0 if j == 0 else 2 * (1 - j / (lags_hac + 1))
+            variancia_longo_prazo += peso * gama
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ep_beta = np.sqrt(np.maximum(variancia_longo_prazo, 0.0)) / sxx_c
+
+        n_sub, n_pares = beta.shape
+        resultados.append(pd.DataFrame({
+            'dependente': np.tile([y_ for y_, _ in pares], n_sub),
+            'explicativa': np.tile([x_ for _, x_ in pares], n_sub),
+            'defasagem': defasagem,
+            'inicio': np.repeat([r[0] for r in rotulos], n_pares),
+            'fim': np.repeat([r[1] for r in rotulos], n_pares),
+            'n_obs': n_obs.ravel().astype('int64'),
+            # Desfaz a centralização: y = alfa + beta x  =>  alfa_original = alfa + cy - beta cx
+            'alfa': (alfa + centro[pos_y] - beta * centro[pos_x]).ravel(),
+            'beta': beta.ravel(),
+            'r2': r2.ravel(),
+            'ep_beta_hac': ep_beta.ravel(),
+        }))
+
+    tabela = pd.concat(resultados, ignore_index=True)
+    tabela['t_beta_hac'] = tabela['beta'] / tabela['ep_beta_hac']
+    # Especificações com menos de 3 observações não identificam o modelo
+    tabela.loc[tabela['n_obs'] < 3, ['alfa', 'beta', 'r2', 'ep_beta_hac', 't_beta_hac']] = np.nan
+    return tabela
@@ -0,0 +1,341 @@
+### Desigualdade e pobreza estimadas a partir de dados agrupados em faixas ###
+# Cada tabela (ex.: classes sociais de uma UF num ano: participação da população e renda média de
+# cada faixa) dá pontos (p_k, L_k) da curva de Lorenz. Três formas paramétricas são ajustadas a
+# todas as tabelas de uma vez:
+#   gq (quadrática geral, Villaseñor-Arnold): L(1-L) = a(p²-L) + bL(p-1) + c(p-L)      (MQO)
+#   beta (Kakwani): ln(p-L) = ln θ + γ ln p + δ ln(1-p)                                   (MQO)
+#   lognormal: L = Φ(Φ⁻¹(p) - σ)                                       (Gauss-Newton, Jacobiano analítico)
+# Os MQO são equações normais empilhadas (tabelas × 3 × 3) resolvidas num único np.linalg.solve;
+# tabelas com menos faixas entram com peso zero nos pontos que faltam. Gini e pobreza saem das
+# fórmulas de Datt (1998) e, para a severidade, de quadratura de Gauss-Legendre sobre L'(p).
+# A lognormal precisa de scipy (Φ e Φ⁻¹); gq e beta só usam numpy.
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.special import ndtr, ndtri
+except ImportError:  # scipy é opcional: só a lognormal depende dele
+    ndtr = ndtri = None
+
+MODELOS = ('gq', 'beta', 'lognormal')
+# Sem scipy, o padrão ajusta só os modelos que não dependem dele
+MODELOS_PADRAO = MODELOS if ndtr is not None else ('gq', 'beta')
+PARAMETROS = {'gq': ('a', 'b', 'c'), 'beta': ('theta', 'gamma', 'delta'), 'lognormal': ('sigma',)}
+# Participações na renda reportadas: (nome da coluna, p, parte de baixo?)
+PARTICIPACOES = (('participacao_40_mais_pobres', 0.4, True), ('participacao_10_mais_ricos', 0.9, False))
+NOS_QUADRATURA = 48
+ITERACOES_GAUSS_NEWTON = 30
+
+
+def _exigir_scipy():
+    if ndtr is None:
+        raise ImportError("O modelo lognormal requer o pacote scipy (pip install scipy)")
+
+
+# ---------------------------------------------------------------------- pontos da curva
+def pontos_lorenz(df, coluna_percentual='percentual_populacao', coluna_renda_media='renda_media_mensal',
+                  por=None, coluna_participacao_renda=None):
+    """
+    Pontos interiores (p_k, L_k) de cada tabela, empilhados em matrizes tabelas × faixas
+
+    Com coluna_participacao_renda (participação de cada faixa na renda, como nas tabelas SIDRA por
+    faixa), ela é usada no lugar de participação da população × renda média; sem renda média
+    (coluna_renda_media=None) a média de cada tabela fica NaN.
+    Retorna (chaves, P, L, mascara, medias); mascara marca os pontos válidos de cada linha.
+    """
+    por = [por] if isinstance(por, str) else list(por or [])
+    populacao = df[coluna_percentual].to_numpy(dtype='float64', na_value=np.nan)
+    renda_media = (np.full(len(df), np.nan) if coluna_renda_media is None
+                   else df[coluna_renda_media].to_numpy(dtype='float64', na_value=np.nan))
+    massa = (populacao * renda_media if coluna_participacao_renda is None
+             else df[coluna_participacao_renda].to_numpy(dtype='float64', na_value=np.nan))
+    if por:
+        grupos, chaves = pd.MultiIndex.from_frame(df[por]).factorize(sort=True)
+        chaves = chaves.set_names(por).to_frame(index=False)
+        # Tabelas sem UF/período etc. ficam fora, como nas curvas de lorenz.py
+        grupos = np.where(df[por].isna().any(axis=1).to_numpy(), -1, grupos)
+    else:
+        grupos, chaves = np.zeros(len(df), dtype='int64'), pd.DataFrame(index=[0])
+    # Faixas vazias (participação zero ou renda média ausente) não mudam a curva
+    validos = (grupos >= 0) & (populacao > 0) & np.isfinite(massa) & (massa >= 0)
+    grupos, populacao, massa, renda_media = grupos[validos], populacao[validos], massa[validos], renda_media[validos]
+
+    # Ordem por grupo e renda média da faixa; somas acumuladas reiniciadas em cada grupo
+    ordem = np.lexsort((massa / populacao, grupos))
+    grupos, populacao, massa, renda_media = grupos[ordem], populacao[ordem], massa[ordem], renda_media[ordem]
+    presentes, inicios, contagens = np.unique(grupos, return_index=True, return_counts=True)
+    linha = np.searchsorted(presentes, grupos)
+    coluna = np.arange(len(grupos)) - inicios[linha]
+
+    total_populacao = np.bincount(linha, weights=populacao)
+    total_massa = np.bincount(linha, weights=massa)
+    acumulado_populacao = np.cumsum(populacao) - np.r_[0, np.cumsum(populacao)][inicios][linha]
+    acumulado_massa = np.cumsum(massa) - np.r_[0, np.cumsum(massa)][inicios][linha]
+
+    # O último ponto de cada tabela é (1, 1) e não entra no ajuste
+    largura = max(contagens.max() - 1, 1) if len(contagens) else 1
+    P = np.full((len(presentes), largura), np.nan)
+    L = np.full((len(presentes), largura), np.nan)
+    interiores = coluna < contagens[linha] - 1
+    P[linha[interiores], coluna[interiores]] = (acumulado_populacao / total_populacao[linha])[interiores]
+    L[linha[interiores], coluna[interiores]] = (acumulado_massa / total_massa[linha])[interiores]
+    mascara = np.isfinite(P) & (P > 0) & (P < 1)
+
+    medias = np.bincount(linha, weights=populacao * renda_media, minlength=len(presentes)) / total_populacao
+    return chaves.iloc[presentes].reset_index(drop=True), P, L, mascara, medias
+
+
+def _mqo_empilhado(X, y, pesos):
+    """MQO ponderado de várias regressões de uma vez: X (B × n × k), y e pesos (B × n) → (B × k, sse)"""
+    X = np.where(pesos[..., None] > 0, X, 0.0)
+    y = np.where(pesos > 0, y, 0.0)
+    Xw = X * pesos[..., None]
+    normal = np.einsum('bni,bnj->bij', Xw, X)
+    termo = np.einsum('bni,bn->bi', Xw, y)
+    # Tabelas com pontos insuficientes ficam com matriz singular: resolvidas com identidade e descartadas
+    singular = np.abs(np.linalg.det(normal)) < 1e-14
+    normal[singular] = np.eye(X.shape[2])
+    coeficientes = np.linalg.solve(normal, termo[..., None])[..., 0]
+    coeficientes[singular] = np.nan
+    residuos = y - np.einsum('bnk,bk->bn', X, coeficientes)
+    return coeficientes, (pesos * residuos ** 2).sum(axis=1)
+
+
+# ---------------------------------------------------------------------- quadrática geral (GQ)
+def ajustar_gq(P, L, mascara):
+    """Parâmetros (a, b, c) da Lorenz quadrática geral para cada tabela e a soma dos quadrados em L(1-L)"""
+    X = np.stack([P ** 2 - L, L * (P - 1), P - L], axis=-1)
+    return _mqo_empilhado(X, L * (1 - L), mascara.astype('float64'))
+
+
+def _gq_auxiliares(parametros):
+    a, b, c = parametros.T
+    e = -(a + b + c + 1)
+    m = b ** 2 - 4 * a
+    n = 2 * b * e - 4 * c
+    with np.errstate(invalid='ignore'):
+        r = np.sqrt(n ** 2 - 4 * m * e ** 2)
+    return a, b, c, e, m, n, r
+
+
+def lorenz_gq(parametros, p):
+    """L(p) para cada tabela (linhas) e cada p (colunas)"""
+    _, b, _, e, m, n, _ = (x[:, None] for x in _gq_auxiliares(parametros))
+    with np.errstate(invalid='ignore'):
+        return -(b * p + e + np.sqrt(m * p ** 2 + n * p + e ** 2)) / 2
+
+
+def _derivada_gq(parametros, p):
+    _, b, _, e, m, n, _ = (x[:, None] for x in _gq_auxiliares(parametros))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return -b / 2 - (2 * m * p + n) / (4 * np.sqrt(m * p ** 2 + n * p + e ** 2))
+
+
+def gini_gq(parametros):
+    """Gini da GQ (Datt, 1998)"""
+    a, b, c, e, m, n, r = _gq_auxiliares(parametros)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        base = e / 2 - n * (b + 2) / (4 * m)
+        raiz = np.sqrt(np.abs(m))
+        negativo = r ** 2 / (8 * m * raiz) * (np.arcsin((2 * m + n) / r) - np.arcsin(n / r))
+        positivo = -r ** 2 / (8 * m * raiz) * np.log(np.abs((2 * m + n + 2 * raiz * (a + c - 1))
+                                                             / (n - 2 * e * raiz)))
+    return base + np.where(m < 0, negativo, positivo)
+
+
+def proporcao_pobres_gq(parametros, razao):
+    """H tal que L'(H) = z/μ (Datt, 1998); razao = z/μ por tabela"""
+    _, b, _, _, m, n, r = _gq_auxiliares(parametros)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        termo = b + 2 * razao
+        return -(n + r * termo / np.sqrt(termo ** 2 - m)) / (2 * m)
+
+
+# ---------------------------------------------------------------------- beta (Kakwani)
+def ajustar_beta(P, L, mascara):
+    """Parâmetros (θ, γ, δ) da Lorenz beta para cada tabela e a soma dos quadrados em ln(p-L)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        validos = mascara & (P - L > 0)
+        X = np.stack([np.ones_like(P), np.log(P), np.log(1 - P)], axis=-1)
+        coeficientes, sse = _mqo_empilhado(X, np.log(P - L), validos.astype('float64'))
+    coeficientes[:, 0] = np.exp(coeficientes[:, 0])
+    return coeficientes, sse
+
+
+def lorenz_beta(parametros, p):
+    theta, gamma, delta = (x[:, None] for x in parametros.T)
+    return p - theta * p ** gamma * (1 - p) ** delta
+
+
+def _derivada_beta(parametros, p):
+    theta, gamma, delta = (x[:, None] for x in parametros.T)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 1 - theta * p ** gamma * (1 - p) ** delta * (gamma / p - delta / (1 - p))
+
+
+def _log_beta(x, y):
+    lgamma = np.vectorize(math.lgamma, otypes=['float64'])
+    finitos = np.isfinite(x) & np.isfinite(y) & (x > 0) & (y > 0)
+    resultado = np.full(np.shape(x), np.nan)
+    resultado[finitos] = lgamma(x[finitos]) + lgamma(y[finitos]) - lgamma(x[finitos] + y[finitos])
+    return resultado
+
+
+def gini_beta(parametros):
+    """Gini da Lorenz beta: 2θ·B(1+γ, 1+δ)"""
+    theta, gamma, delta = parametros.T
+    return 2 * theta * np.exp(_log_beta(1 + gamma, 1 + delta))
+
+
+def _proporcao_pobres_bissecao(derivada, parametros, razao, iteracoes=60):
+    """H com L'(H) = z/μ por bisseção vetorizada (L' é crescente numa curva de Lorenz válida)"""
+    baixo = np.zeros(len(parametros))
+    alto = np.ones(len(parametros))
+    for _ in range(iteracoes):
+        meio = (baixo + alto) / 2
+        abaixo = derivada(parametros, meio[:, None])[:, 0] < razao
+        baixo = np.where(abaixo, meio, baixo)
+        alto = np.where(abaixo, alto, meio)
+    return (baixo + alto) / 2
+
+
+# ---------------------------------------------------------------------- lognormal
+def lorenz_lognormal(parametros, p):
+    _exigir_scipy()
+    return ndtr(ndtri(p) - parametros[:, :1])
+
+
+def ajustar_lognormal(P, L, mascara, iteracoes=ITERACOES_GAUSS_NEWTON, tolerancia=1e-10):
+    """
+    σ da lognormal para cada tabela por Gauss-Newton em L_k = Φ(Φ⁻¹(p_k) - σ)
+
+    Jacobiano analítico: ∂L/∂σ = -φ(Φ⁻¹(p) - σ). Partida: melhor σ de uma grade grossa.
+    """
+    _exigir_scipy()
+    pesos = mascara.astype('float64')
+    P = np.where(mascara, P, 0.5)
+    L = np.where(mascara, L, 0.5)
+    quantis = ndtri(P)
+
+    grade = np.linspace(0.05, 3, 60)
+    erros = (pesos[:, None, :] * (L[:, None, :] - ndtr(quantis[:, None, :] - grade[None, :, None])) ** 2).sum(axis=2)
+    sigma = grade[np.argmin(erros, axis=1)]
+
+    for _ in range(iteracoes):
+        argumento = quantis - sigma[:, None]
+        residuo = L - ndtr(argumento)
+        jacobiano = -np.exp(-argumento ** 2 / 2) / np.sqrt(2 * np.pi)
+        # Passo de Gauss-Newton para um parâmetro: Σ w·J·r / Σ w·J²
+        passo = (pesos * jacobiano * residuo).sum(axis=1) / (pesos * jacobiano ** 2).sum(axis=1)
+        sigma = np.clip(sigma + passo, 1e-6, None)
+        if np.nanmax(np.abs(passo), initial=0) < tolerancia:
+            break
+    residuo = L - ndtr(quantis - sigma[:, None])
+    return sigma[:, None], (pesos * residuo ** 2).sum(axis=1)
+
+
+# ---------------------------------------------------------------------- medidas derivadas
+def _severidade_quadratura(derivada, parametros, proporcao, inverso_razao):
+    """FGT2 = ∫₀^H (1 - (μ/z)·L'(p))² dp por Gauss-Legendre em [0, H]"""
+    nos, pesos = np.polynomial.legendre.leggauss(NOS_QUADRATURA)
+    metade = proporcao[:, None] / 2
+    p = metade * (nos[None, :] + 1)
+    integrando = (1 - inverso_razao[:, None] * derivada(parametros, p)) ** 2
+    return (metade * pesos[None, :] * integrando).sum(axis=1)
+
+
+def _medidas_lognormal(sigma, razao):
+    """Gini, H, FGT1 e FGT2 fechados da lognormal; razao = z/μ"""
+    gini = 2 * ndtr(sigma / np.sqrt(2)) - 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        a = np.log(razao) / sigma + sigma / 2
+        inverso = 1 / razao
+        proporcao = ndtr(a)
+        hiato = proporcao - inverso * ndtr(a - sigma)
+        severidade = proporcao - 2 * inverso * ndtr(a - sigma) + inverso ** 2 * np.exp(sigma ** 2) * ndtr(a - 2 * sigma)
+    return gini, proporcao, hiato, severidade
+
+
+LORENZ = {'gq': lorenz_gq, 'beta': lorenz_beta, 'lognormal': lorenz_lognormal}
+AJUSTES = {'gq': ajustar_gq, 'beta': ajustar_beta, 'lognormal': ajustar_lognormal}
+DERIVADAS = {'gq': _derivada_gq, 'beta': _derivada_beta}
+
+
+def _valida(modelo, parametros, tolerancia=1e-6):
+    """Curva de Lorenz válida numa grade: 0 ≤ L ≤ p, crescente e convexa"""
+    p = np.linspace(0.001, 0.999, 201)
+    with np.errstate(invalid='ignore'):
+        curva = LORENZ[modelo](parametros, p)
+        incrementos = np.diff(curva, axis=1)
+        return (np.isfinite(curva).all(axis=1)
+                & (curva >= -tolerancia).all(axis=1) & (curva <= p + tolerancia).all(axis=1)
+                & (incrementos >= -tolerancia).all(axis=1) & (np.diff(incrementos, axis=1) >= -tolerancia).all(axis=1))
+
+
+def estimar(df, modelos=MODELOS_PADRAO, coluna_percentual='percentual_populacao', coluna_renda_media='renda_media_mensal',
+            por=None, linha_pobreza=None, coluna_participacao_renda=None):
+    """
+    Ajusta as curvas de Lorenz paramétricas a todas as tabelas e deriva Gini, participações e pobreza
+
+    Uma linha por (tabela, modelo): chaves, modelo, parâmetros, media, sse_lorenz (erro nos pontos
+    de L), valida (curva de Lorenz bem comportada), gini, participações (40% mais pobres, 10% mais ricos) e, com linha_pobreza
+    (na unidade da renda média; escalar ou um valor por tabela), pobreza, hiato_pobreza e
+    severidade_pobreza (FGT 0, 1 e 2).
+    """
+    chaves, P, L, mascara, medias = pontos_lorenz(df, coluna_percentual, coluna_renda_media, por,
+                                                  coluna_participacao_renda)
+    partes = []
+    for modelo in modelos:
+        if modelo not in AJUSTES:
+            raise ValueError(f"Modelo desconhecido: {modelo} (use {list(MODELOS)})")
+        parametros, sse = AJUSTES[modelo](P, L, mascara)
+        tabela = chaves.copy()
+        tabela['modelo'] = modelo
+        for nome, valores in zip(PARAMETROS[modelo], parametros.T):
+            tabela[nome] = valores
+        tabela['media'] = medias
+        # Erro no espaço de L, comparável entre os modelos (o sse de cada ajuste não é)
+        with np.errstate(invalid='ignore'):
+            tabela['sse_lorenz'] = np.where(mascara, (L - LORENZ[modelo](parametros, np.where(mascara, P, 0.5))) ** 2,
+                                            0).sum(axis=1)
+        tabela['valida'] = _valida(modelo, parametros)
+
+        p_participacoes = np.array([p for _, p, _ in PARTICIPACOES])
+        curva = LORENZ[modelo](parametros, p_participacoes)
+        for (nome, _, de_baixo), valores in zip(PARTICIPACOES, curva.T):
+            tabela[nome] = valores if de_baixo else 1 - valores
+
+        razao = None
+        if linha_pobreza is not None:
+            razao = np.broadcast_to(np.asarray(linha_pobreza, dtype='float64'), medias.shape) / medias
+        if modelo == 'lognormal':
+            gini, proporcao, hiato, severidade = _medidas_lognormal(parametros[:, 0], razao if razao is not None else 1.0)
+        else:
+            gini = gini_gq(parametros) if modelo == 'gq' else gini_beta(parametros)
+            if razao is not None:
+                if modelo == 'gq':
+                    proporcao = proporcao_pobres_gq(parametros, razao)
+                else:
+                    proporcao = _proporcao_pobres_bissecao(_derivada_beta, parametros, razao)
+                proporcao = np.clip(proporcao, 0, 1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    hiato = proporcao - LORENZ[modelo](parametros, proporcao[:, None])[:, 0] / razao
+                    severidade = _severidade_quadratura(DERIVADAS[modelo], parametros, proporcao, 1 / razao)
+        tabela['gini'] = gini
+        if razao is not None:
+            tabela['pobreza'] = proporcao
+            tabela['hiato_pobreza'] = hiato
+            tabela['severidade_pobreza'] = severidade
+        partes.append(tabela)
+    return pd.concat(partes, ignore_index=True)
+
+
+def melhor_ajuste(estimativas):
+    """Para cada tabela, o modelo válido de menor sse_lorenz (ou o de menor erro, se nenhum for válido)"""
+    chaves = list(estimativas.columns[:estimativas.columns.get_loc('modelo')])
+    ordenadas = estimativas.sort_values(['valida', 'sse_lorenz'], ascending=[False, True], kind='stable')
+    if not chaves:
+        return ordenadas.head(1).reset_index(drop=True)
+    return ordenadas.drop_duplicates(chaves).sort_values(chaves).reset_index(drop=True)
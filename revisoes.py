@@ -0,0 +1,167 @@
+### Histórico de revisões das séries coletadas (BCB, IPEA) com consulta por safra ###
+# Cada coleta é comparada com o estado atual da série por um diff vetorizado por chave (período):
+# só os pontos inseridos, alterados ou removidos são acrescentados ao log da série, marcados com a
+# safra (instante da coleta). O log é um arquivo binário só de acréscimo (registros de tamanho fixo);
+# o estado em qualquer safra é o último registro de cada período com safra ≤ a pedida.
+# O armazenamento cresce com as revisões, não com cópias inteiras da série, e um backtest pode
+# ler os dados exatamente como estavam numa data.
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from armazem_series import _nome_arquivo, _periodo, datas_para_periodos, periodos_para_datas
+
+DIRETORIO_REVISOES = 'data/revisoes'
+ARQUIVO_INDICE = 'indice.json'
+REGISTRO = np.dtype([('periodo', '<i4'), ('valor', '<f8'), ('safra', '<M8[ns]'), ('removido', '?')])
+
+
+def _safra(valor=None):
+    """Safra como datetime64[ns]; sem valor, o instante atual"""
+    return np.datetime64(pd.Timestamp(valor if valor is not None else datetime.now()).as_unit('ns').to_datetime64())
+
+
+def _estado(log, safra=None):
+    """(períodos, valores) vigentes no log até a safra (inclusive), sem os pontos removidos"""
+    if safra is not None:
+        log = log[log['safra'] <= safra]
+    if len(log) == 0:
+        return np.empty(0, dtype='int32'), np.empty(0, dtype='float64')
+    # O log está em ordem de safra: ordenação estável por período deixa o último registro por último
+    ordem = np.argsort(log['periodo'], kind='stable')
+    log = log[ordem]
+    ultimo = np.r_[log['periodo'][1:] != log['periodo'][:-1], True]
+    vigentes = log[ultimo & ~log['removido']]
+    return vigentes['periodo'], vigentes['valor']
+
+
+def diferencas(periodos_antigos, valores_antigos, periodos_novos, valores_novos, tolerancia=0.0):
+    """
+    Diff por chave entre dois estados (períodos ordenados e únicos)
+
+    Retorna máscaras (inseridos, alterados) sobre os novos e removidos sobre os antigos.
+    Valores iguais (ou ambos NaN, ou diferença ≤ tolerancia) não contam como alteração.
+    """
+    if len(periodos_antigos) == 0:
+        return (np.ones(len(periodos_novos), dtype=bool), np.zeros(len(periodos_novos), dtype=bool),
+                np.zeros(0, dtype=bool))
+    posicoes = np.minimum(np.searchsorted(periodos_antigos, periodos_novos), len(periodos_antigos) - 1)
+    existentes = periodos_antigos[posicoes] == periodos_novos
+    antigos = np.where(existentes, valores_antigos[posicoes], np.nan)
+    with np.errstate(invalid='ignore'):
+        iguais = (np.abs(valores_novos - antigos) <= tolerancia) | (np.isnan(valores_novos) & np.isnan(antigos))
+    removidos = ~np.isin(periodos_antigos, periodos_novos, assume_unique=True)
+    return ~existentes, existentes & ~iguais, removidos
+
+
+class RevisoesSeries:
+    """Logs de revisão de várias séries num diretório, com um índice JSON das safras de cada uma"""
+
+    def __init__(self, diretorio=DIRETORIO_REVISOES):
+        self.diretorio = diretorio
+        self.indice = {}
+        caminho = self._caminho(ARQUIVO_INDICE)
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as f:
+                self.indice = json.load(f)['series']
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _gravar_indice(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._caminho(ARQUIVO_INDICE)
+        with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'series': self.indice}, f, ensure_ascii=False, indent=1)
+        os.replace(caminho + '.tmp', caminho)
+
+    def series(self):
+        return sorted(self.indice)
+
+    def log(self, chave):
+        """Registros do log da série (array estruturado) em ordem de safra"""
+        info = self.indice.get(chave)
+        if not info or info['n'] == 0:
+            return np.empty(0, dtype=REGISTRO)
+        # Só os n registros do índice: bytes de uma gravação interrompida são ignorados
+        return np.fromfile(self._caminho(info['arquivo']), dtype=REGISTRO, count=info['n'])
+
+    # ------------------------------------------------------------------ escrita
+    def registrar(self, chave, datas, valores, safra=None, remover_ausentes=False, tolerancia=0.0, **metadados):
+        """
+        Compara uma coleta com o estado atual e acrescenta ao log só o que mudou
+
+        Períodos repetidos na coleta mantêm o último valor. Com remover_ausentes, períodos que
+        sumiram da coleta são marcados como removidos (use só quando a coleta cobre a série inteira).
+        Retorna {'safra', 'inseridos', 'alterados', 'removidos'}.
+        """
+        safra = _safra(safra)
+        periodos = datas_para_periodos(datas)
+        valores = np.asarray(valores, dtype='float64')
+        ordem = np.argsort(periodos, kind='stable')
+        periodos, valores = periodos[ordem], valores[ordem]
+        ultimo = np.r_[periodos[1:] != periodos[:-1], True]
+        periodos, valores = periodos[ultimo], valores[ultimo]
+
+        info = self.indice.get(chave)
+        # Compara com a última coleta (com ou sem mudanças), não só com a última safra do log
+        if info and 'ultima_coleta' in info and safra <= _safra(info['ultima_coleta']):
+            raise ValueError(f"Safra {safra} não é posterior à última coleta de {chave} ({info['ultima_coleta']})")
+        log = self.log(chave)
+        periodos_atuais, valores_atuais = _estado(log)
+        inseridos, alterados, removidos = diferencas(periodos_atuais, valores_atuais, periodos, valores, tolerancia)
+        if not remover_ausentes:
+            removidos[:] = False
+
+        mudou = inseridos | alterados
+        novos = np.empty(int(mudou.sum() + removidos.sum()), dtype=REGISTRO)
+        novos['periodo'] = np.r_[periodos[mudou], periodos_atuais[removidos]]
+        novos['valor'] = np.r_[valores[mudou], np.full(int(removidos.sum()), np.nan)]
+        novos['safra'] = safra
+        novos['removido'] = np.r_[np.zeros(int(mudou.sum()), dtype=bool), np.ones(int(removidos.sum()), dtype=bool)]
+
+        resumo = {'safra': str(safra), 'inseridos': int(inseridos.sum()), 'alterados': int(alterados.sum()),
+                  'removidos': int(removidos.sum())}
+        info = info or {'arquivo': f"{_nome_arquivo(chave)}.revisoes", 'n': 0, 'safras': []}
+        info.update(metadados)
+        info['ultima_coleta'] = str(safra)
+        if len(novos):
+            os.makedirs(self.diretorio, exist_ok=True)
+            caminho = self._caminho(info['arquivo'])
+            with open(caminho, 'ab') as f:
+                # Descarta sobras de uma gravação interrompida antes de acrescentar
+                f.truncate(info['n'] * REGISTRO.itemsize)
+                novos.tofile(f)
+            info['n'] += len(novos)
+            info['safras'].append(resumo)
+        self.indice[chave] = info
+        self._gravar_indice()
+        return resumo
+
+    # ------------------------------------------------------------------ leitura
+    def serie(self, chave, safra=None):
+        """Série como estava na safra (padrão: a mais recente), indexada por data"""
+        periodos, valores = _estado(self.log(chave), None if safra is None else _safra(safra))
+        return pd.Series(valores, index=periodos_para_datas(periodos), name=chave)
+
+    def safras(self, chave):
+        """Uma linha por safra com mudanças: quantos pontos entraram, mudaram e saíram"""
+        tabela = pd.DataFrame(self.indice.get(chave, {}).get('safras', []),
+                              columns=['safra', 'inseridos', 'alterados', 'removidos'])
+        tabela['safra'] = pd.to_datetime(tabela['safra'])
+        return tabela
+
+    def historico(self, chave, data=None):
+        """Log em formato de tabela (periodo, valor, safra, removido); com data, só as revisões dela"""
+        log = self.log(chave)
+        if data is not None:
+            log = log[log['periodo'] == _periodo(data)]
+        return pd.DataFrame({
+            'data': periodos_para_datas(log['periodo']),
+            'valor': log['valor'],
+            'safra': log['safra'],
+            'removido': log['removido'],
+        })
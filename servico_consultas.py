@@ -0,0 +1,327 @@
+### Serviço HTTP local de consultas sobre o armazém de séries (para dashboards) ###
+# As séries consultadas ficam num cache colunar em memória (arrays numpy de períodos e
+# valores) com despejo LRU por tamanho em bytes. Cada consulta filtra a janela por busca
+# binária e reamostra/agrega com reduceat, sem pandas no caminho quente. O índice do armazém
+# é relido de tempos em tempos; só as séries com versão nova saem do cache.
+#
+# Uso: python servico_consultas.py --porta 8765
+#   GET /series?uf=SP&prefixo=ipca          lista séries e metadados
+#   GET /consulta?serie=IPCA,TAXA_DESOCUPACAO&inicio=2015&fim=2020-06&frequencia=Q&agregacao=mean
+#   GET /resumo?serie=IPCA&inicio=2020      n, média, mínimo, máximo e último valor da janela
+#   GET /saude                              estado do cache
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from armazem_series import ArmazemSeries, DIRETORIO_ARMAZEM
+
+PORTA_PADRAO = 8765
+CAPACIDADE_CACHE_MB = 256
+INTERVALO_RECARGA = 2.0  # segundos entre verificações do índice do armazém
+FREQUENCIAS = ('D', 'M', 'Q', 'Y')
+AGREGACOES = ('mean', 'sum', 'min', 'max', 'last', 'count')
+
+
+class CacheColunar:
+    """Cache LRU de (períodos, valores) por série, limitado pelo total de bytes"""
+
+    def __init__(self, capacidade_bytes):
+        self.capacidade = capacidade_bytes
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def obter(self, chave, versao):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None or item[0] != versao:
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1], item[2]
+
+    def guardar(self, chave, versao, periodos, valores):
+        tamanho = periodos.nbytes + valores.nbytes
+        with self._trava:
+            self._remover(chave)
+            self._itens[chave] = (versao, periodos, valores)
+            self._bytes += tamanho
+            while self._bytes > self.capacidade and len(self._itens) > 1:
+                self._remover(next(iter(self._itens)))
+
+    def invalidar(self, chaves):
+        with self._trava:
+            for chave in chaves:
+                self._remover(chave)
+
+    def _remover(self, chave):
+        item = self._itens.pop(chave, None)
+        if item is not None:
+            self._bytes -= item[1].nbytes + item[2].nbytes
+
+    def chaves(self):
+        with self._trava:
+            return list(self._itens)
+
+    def estado(self):
+        with self._trava:
+            return {'series': len(self._itens), 'bytes': self._bytes, 'capacidade_bytes': self.capacidade,
+                    'acertos': self.acertos, 'faltas': self.faltas}
+
+
+def _limite(texto, fim=False):
+    """'2015', '2015-06' ou '2015-06-30' -> AAAAMMDD do início (ou do fim) do período"""
+    if not texto:
+        return None
+    periodo = pd.Period(texto)
+    data = periodo.end_time if fim else periodo.start_time
+    return data.year * 10000 + data.month * 100 + data.day
+
+
+def _chaves_periodo(periodos, frequencia):
+    """Chave inteira do período de cada data AAAAMMDD na frequência pedida"""
+    periodos = periodos.astype('int64')
+    ano, mes = periodos // 10000, periodos // 100 % 100
+    if frequencia == 'D':
+        return periodos
+    if frequencia == 'M':
+        return ano * 100 + mes
+    if frequencia == 'Q':
+        return ano * 100 + ((mes - 1) // 3) * 3 + 1
+    return ano * 100 + 1
+
+
+def reamostrar(periodos, valores, frequencia, agregacao='mean'):
+    """
+    Agrega a série (períodos ordenados) para a frequência pedida com reduceat
+
+    Retorna (primeiro dia de cada período como AAAAMMDD, valores agregados); NaN são ignorados.
+    """
+    if agregacao not in AGREGACOES:
+        raise ValueError(f"Agregação inválida: {agregacao}")
+    if len(periodos) == 0:
+        return periodos, valores
+    chaves = _chaves_periodo(periodos, frequencia)
+    inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+    validos = np.isfinite(valores)
+    contagem = np.add.reduceat(validos.astype('int64'), inicios)
+
+    if agregacao == 'count':
+        resultado = contagem.astype('float64')
+    elif agregacao in ('mean', 'sum'):
+        soma = np.add.reduceat(np.where(validos, valores, 0.0), inicios)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            resultado = soma / contagem if agregacao == 'mean' else np.where(contagem > 0, soma, np.nan)
+    elif agregacao == 'min':
+        resultado = np.fmin.reduceat(valores, inicios)
+    elif agregacao == 'max':
+        resultado = np.fmax.reduceat(valores, inicios)
+    else:
+        # Último valor válido de cada período: posição do último válido acumulada até o fim do grupo
+        posicoes = np.maximum.accumulate(np.where(validos, np.arange(len(valores)), -1))
+        ultimos = posicoes[np.r_[inicios[1:], len(valores)] - 1]
+        resultado = np.where(ultimos >= inicios, valores[np.maximum(ultimos, 0)], np.nan)
+
+    chaves_saida = chaves[inicios]
+    if frequencia != 'D':
+        chaves_saida = chaves_saida * 100 + 1
+    return chaves_saida.astype('int32'), resultado
+
+
+def _datas_texto(periodos):
+    p = periodos.astype('int64')
+    return [f"{a:04d}-{m:02d}-{d:02d}" for a, m, d in zip(p // 10000, p // 100 % 100, p % 100)]
+
+
+def _valores_json(valores):
+    return [None if not np.isfinite(v) else float(v) for v in valores]
+
+
+class ServicoConsultas:
+    """Consultas sobre o armazém com cache em memória e recarga incremental do índice"""
+
+    def __init__(self, diretorio=DIRETORIO_ARMAZEM, capacidade_mb=CAPACIDADE_CACHE_MB,
+                 intervalo_recarga=INTERVALO_RECARGA):
+        self.armazem = ArmazemSeries(diretorio)
+        self.cache = CacheColunar(int(capacidade_mb * 1024 * 1024))
+        self.intervalo_recarga = intervalo_recarga
+        self._trava_armazem = threading.Lock()
+        self._ultima_recarga = time.monotonic()
+
+    def recarregar(self, forcar=False):
+        """Relê o índice do armazém (no máximo a cada intervalo_recarga) e invalida séries alteradas"""
+        agora = time.monotonic()
+        if not forcar and agora - self._ultima_recarga < self.intervalo_recarga:
+            return []
+        with self._trava_armazem:
+            self._ultima_recarga = agora
+            alteradas = self.armazem.recarregar_indice()
+            removidas = [c for c in self.cache.chaves() if c not in self.armazem.indice]
+        self.cache.invalidar(alteradas + removidas)
+        return alteradas
+
+    def listar(self, uf=None, prefixo=None):
+        self.recarregar()
+        indice = self.armazem.indice
+        return {chave: info for chave, info in sorted(indice.items())
+                if (uf is None or str(info.get('uf', '')).upper() == uf.upper())
+                and (prefixo is None or chave.lower().startswith(prefixo.lower()))}
+
+    def _colunas(self, chave, nova_tentativa=True):
+        info = self.armazem.indice.get(chave)
+        if info is None:
+            raise KeyError(chave)
+        colunas = self.cache.obter(chave, info['versao'])
+        if colunas is None:
+            # Cópia em memória: o cache não segura os memmaps (que podem ser substituídos em disco)
+            try:
+                with self._trava_armazem:
+                    versao = self.armazem.indice[chave]['versao']
+                    periodos, valores = self.armazem.fatia(chave)
+                    colunas = (np.array(periodos), np.array(valores))
+            except OSError:
+                # Versão substituída por uma publicação em andamento: relê o índice e tenta uma vez
+                if not nova_tentativa:
+                    raise
+                self.recarregar(forcar=True)
+                return self._colunas(chave, nova_tentativa=False)
+            self.cache.guardar(chave, versao, *colunas)
+        return colunas
+
+    def janela(self, chave, inicio=None, fim=None):
+        """(períodos, valores) da série entre inicio e fim ('AAAA', 'AAAA-MM' ou 'AAAA-MM-DD')"""
+        periodos, valores = self._colunas(chave)
+        ini = 0 if not inicio else int(np.searchsorted(periodos, _limite(inicio), side='left'))
+        fin = len(periodos) if not fim else int(np.searchsorted(periodos, _limite(fim, fim=True), side='right'))
+        return periodos[ini:fin], valores[ini:fin]
+
+    def _selecionar(self, series, uf):
+        if series:
+            return series
+        return list(self.listar(uf=uf))
+
+    def consultar(self, series=None, inicio=None, fim=None, uf=None, frequencia=None, agregacao='mean'):
+        """Janela de cada série, opcionalmente reamostrada; sem séries, todas as da UF"""
+        self.recarregar()
+        if frequencia is not None and frequencia not in FREQUENCIAS:
+            raise ValueError(f"Frequência inválida: {frequencia}")
+        resultado = {}
+        for chave in self._selecionar(series, uf):
+            periodos, valores = self.janela(chave, inicio, fim)
+            if frequencia is not None:
+                periodos, valores = reamostrar(periodos, valores, frequencia, agregacao)
+            resultado[chave] = {'datas': _datas_texto(periodos), 'valores': _valores_json(valores)}
+        return resultado
+
+    def resumir(self, series=None, inicio=None, fim=None, uf=None):
+        """n, média, mínimo, máximo e último valor de cada série na janela"""
+        self.recarregar()
+        resultado = {}
+        for chave in self._selecionar(series, uf):
+            periodos, valores = self.janela(chave, inicio, fim)
+            validos = valores[np.isfinite(valores)]
+            vazio = len(validos) == 0
+            resultado[chave] = {
+                'n': int(len(validos)),
+                'media': None if vazio else float(validos.mean()),
+                'minimo': None if vazio else float(validos.min()),
+                'maximo': None if vazio else float(validos.max()),
+                'ultimo': None if vazio else float(validos[-1]),
+                'data_ultimo': None if vazio else _datas_texto(periodos[np.isfinite(valores)][-1:])[0],
+            }
+        return resultado
+
+
+def _lista(parametros, nome):
+    valores = [v for texto in parametros.get(nome, []) for v in texto.split(',') if v]
+    return valores or None
+
+
+def _unico(parametros, nome, padrao=None):
+    return parametros.get(nome, [padrao])[-1]
+
+
+def criar_manipulador(servico):
+    """Classe de handler HTTP ligada ao serviço"""
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def _responder(self, status, corpo):
+            dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(dados)))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            inicio = time.perf_counter()
+            url = urlparse(self.path)
+            p = parse_qs(url.query)
+            try:
+                if url.path == '/series':
+                    corpo = {'series': servico.listar(_unico(p, 'uf'), _unico(p, 'prefixo'))}
+                elif url.path == '/consulta':
+                    corpo = {'series': servico.consultar(
+                        _lista(p, 'serie'), _unico(p, 'inicio'), _unico(p, 'fim'), _unico(p, 'uf'),
+                        _unico(p, 'frequencia'), _unico(p, 'agregacao', 'mean'))}
+                elif url.path == '/resumo':
+                    corpo = {'series': servico.resumir(
+                        _lista(p, 'serie'), _unico(p, 'inicio'), _unico(p, 'fim'), _unico(p, 'uf'))}
+                elif url.path == '/saude':
+                    corpo = {'cache': servico.cache.estado(), 'series_no_indice': len(servico.armazem.indice)}
+                else:
+                    self._responder(404, {'erro': f"Caminho desconhecido: {url.path}"})
+                    return
+            except KeyError as e:
+                self._responder(404, {'erro': f"Série não encontrada: {e.args[0]}"})
+                return
+            except ValueError as e:
+                self._responder(400, {'erro': str(e)})
+                return
+            except OSError as e:
+                # Armazém sendo republicado (ou arquivo ilegível): o cliente pode repetir a consulta
+                self._responder(503, {'erro': f"Armazém indisponível: {e}"})
+                return
+            corpo['ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+            self._responder(200, corpo)
+
+        def log_message(self, formato, *args):
+            # Sem log por requisição no terminal (dashboards consultam com muita frequência)
+            pass
+
+    return Manipulador
+
+
+def servir(diretorio=DIRETORIO_ARMAZEM, porta=PORTA_PADRAO, host='127.0.0.1', capacidade_mb=CAPACIDADE_CACHE_MB):
+    """Sobe o servidor (uma thread por conexão) até Ctrl+C"""
+    servico = ServicoConsultas(diretorio, capacidade_mb)
+    servidor = ThreadingHTTPServer((host, porta), criar_manipulador(servico))
+    servidor.daemon_threads = True
+    print(f"✅ Serviço de consultas em http://{host}:{porta} ({len(servico.armazem.indice)} séries em {diretorio})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n✓ Serviço encerrado")
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serviço HTTP de consultas sobre o armazém de séries')
+    parser.add_argument('--diretorio', default=DIRETORIO_ARMAZEM)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--capacidade-mb', type=float, default=CAPACIDADE_CACHE_MB)
+    argumentos = parser.parse_args()
+    servir(argumentos.diretorio, argumentos.porta, argumentos.host, argumentos.capacidade_mb)
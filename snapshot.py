@@ -0,0 +1,261 @@
+### Snapshot versionado do painel macro (IPEA, BCB e FGV) num único arquivo Arrow ###
+# As séries numéricas de cada fonte são harmonizadas (data de início do período, valor float64)
+# e gravadas num arquivo Arrow IPC comprimido, com um record batch por série: um consumidor
+# mapeia o arquivo (pa.memory_map) e lê/descomprime só o batch da série que pedir.
+# O id do snapshot é o sha256 do conteúdo (hash de cada série + metadados), então o mesmo
+# conteúdo nunca é gravado duas vezes, e comparar versões é comparar os hashes do manifesto.
+# LATEST aponta para o snapshot mais recente.
+import glob
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow é opcional fora desta etapa
+    pa = None
+
+from lacunas import inferir_frequencia
+
+DIRETORIO_SNAPSHOTS = 'data/snapshots'
+ARQUIVO_ULTIMO = 'LATEST'
+VERSAO_SNAPSHOT = 1
+COMPRESSAO = 'zstd'
+
+# Cada fonte: arquivo, coluna de data e colunas numéricas que não são séries
+FONTES = {
+    'ipea': {'caminho': 'data/processed/dados_combinados_processados.csv', 'coluna_data': 'VALDATA',
+             'ignorar': ['ANO', 'MES', 'TRIMESTRE']},
+    'bcb_divida_credito': {'caminho': 'data/processed/analise_divida_credito.csv', 'coluna_data': 'data'},
+    'bcb_impacto_inflacao': {'caminho': 'data/processed/impacto_inflacao.csv', 'coluna_data': 'data'},
+    'fgv_serie_temporal': {'caminho': 'data/raw/fgv/processado/serie_temporal_processado.csv', 'coluna_data': 'ano'},
+    'fgv_credito_total': {'caminho': 'data/raw/fgv/processado/credito_total_2018_2024.csv', 'coluna_data': 'data'},
+}
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ImportError("O snapshot requer o pacote pyarrow (pip install pyarrow)")
+
+
+def _datas(coluna):
+    """Datas de qualquer formato usado nas fontes (ano inteiro, AAAA-MM-DD, AAAA-MM)"""
+    if pd.api.types.is_integer_dtype(coluna) or pd.api.types.is_float_dtype(coluna):
+        return pd.to_datetime(coluna.astype('Int64').astype(str), format='%Y', errors='coerce')
+    return pd.to_datetime(coluna, errors='coerce', format='mixed')
+
+
+def harmonizar_fonte(nome, caminho, coluna_data, ignorar=()):
+    """
+    Formato longo (serie, data, valor) das colunas numéricas de uma fonte
+
+    A data vira o início do período da frequência inferida (M, Q, Y...). Retorna
+    (DataFrame, {serie: frequencia}).
+    """
+    df = pd.read_csv(caminho)
+    datas = _datas(df[coluna_data])
+    frequencia = inferir_frequencia(datas.dropna())
+    inicio_periodo = pd.PeriodIndex(datas, freq=frequencia).to_timestamp()
+    colunas = [c for c in df.select_dtypes(include='number').columns if c != coluna_data and c not in ignorar]
+
+    partes = []
+    for coluna in colunas:
+        parte = pd.DataFrame({'serie': f'{nome}.{coluna}', 'data': inicio_periodo,
+                              'valor': df[coluna].to_numpy(dtype='float64', na_value=np.nan)})
+        partes.append(parte[parte['data'].notna()])
+    longo = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=['serie', 'data', 'valor'])
+    # Período repetido na fonte: vale a última linha
+    longo = longo.drop_duplicates(['serie', 'data'], keep='last').sort_values(['serie', 'data'], kind='stable')
+    return longo.reset_index(drop=True), {f'{nome}.{c}': frequencia for c in colunas}
+
+
+def _hash_serie(nome, frequencia, dias, valores):
+    h = hashlib.sha256()
+    h.update(f'{nome}\0{frequencia}\0'.encode('utf-8'))
+    h.update(np.ascontiguousarray(dias, dtype='<i4').tobytes())
+    h.update(np.ascontiguousarray(valores, dtype='<f8').tobytes())
+    return h.hexdigest()
+
+
+def _hash_arquivo(caminho):
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def exportar_snapshot(fontes=None, diretorio=DIRETORIO_SNAPSHOTS, compressao=COMPRESSAO):
+    """
+    Harmoniza as fontes disponíveis e grava o snapshot (se o conteúdo for novo)
+
+    Retorna o manifesto; LATEST passa a apontar para ele em qualquer caso.
+    """
+    _exigir_pyarrow()
+    fontes = FONTES if fontes is None else fontes
+    esquema = pa.schema([('data', pa.date32()), ('valor', pa.float64())])
+
+    lotes, series, origem = [], {}, {}
+    for nome, config in fontes.items():
+        if not os.path.exists(config['caminho']):
+            print(f"⚠️  {nome}: {config['caminho']} não encontrado, fora do snapshot")
+            continue
+        longo, frequencias = harmonizar_fonte(nome, config['caminho'], config['coluna_data'], config.get('ignorar', ()))
+        origem[nome] = {'caminho': config['caminho'], 'sha1': _hash_arquivo(config['caminho'])}
+        inicios = np.flatnonzero(np.r_[True, longo['serie'].to_numpy()[1:] != longo['serie'].to_numpy()[:-1]]) if len(longo) else []
+        for ini, fim in zip(inicios, list(inicios[1:]) + [len(longo)]):
+            bloco = longo.iloc[ini:fim]
+            serie = bloco['serie'].iloc[0]
+            dias = bloco['data'].to_numpy(dtype='datetime64[D]').astype('int32')
+            valores = bloco['valor'].to_numpy()
+            series[serie] = {
+                'lote': len(lotes),
+                'fonte': nome,
+                'frequencia': frequencias[serie],
+                'n': int(len(bloco)),
+                'inicio': bloco['data'].iloc[0].strftime('%Y-%m-%d'),
+                'fim': bloco['data'].iloc[-1].strftime('%Y-%m-%d'),
+                'sha256': _hash_serie(serie, frequencias[serie], dias, valores),
+            }
+            lotes.append(pa.record_batch([pa.array(dias, type=pa.int32()).cast(pa.date32()),
+                                          pa.array(valores, type=pa.float64())], schema=esquema))
+
+    conteudo = json.dumps({'versao': VERSAO_SNAPSHOT, 'series': {s: i['sha256'] for s, i in sorted(series.items())}},
+                          sort_keys=True)
+    identificador = hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+    manifesto = {
+        'id': identificador,
+        'versao': VERSAO_SNAPSHOT,
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'compressao': compressao,
+        'fontes': origem,
+        'series': series,
+    }
+
+    os.makedirs(diretorio, exist_ok=True)
+    base = os.path.join(diretorio, f'snapshot-{identificador[:16]}')
+    if os.path.exists(base + '.arrow'):
+        print(f"✓ Snapshot {identificador[:16]} já existe (conteúdo inalterado)")
+        with open(base + '.json', encoding='utf-8') as f:
+            manifesto = json.load(f)
+    else:
+        # O manifesto também vai nos metadados do esquema: o arquivo .arrow se basta sozinho
+        esquema_arquivo = esquema.with_metadata({'manifesto': json.dumps(manifesto, ensure_ascii=False)})
+        opcoes = ipc.IpcWriteOptions(compression=compressao)
+        temporario = f'{base}.arrow.{os.getpid()}.tmp'
+        with pa.OSFile(temporario, 'wb') as destino, ipc.new_file(destino, esquema_arquivo, options=opcoes) as escritor:
+            for lote in lotes:
+                escritor.write_batch(lote)
+        os.replace(temporario, base + '.arrow')
+        _gravar_json(base + '.json', manifesto)
+        print(f"✅ Snapshot {identificador[:16]}: {len(series)} séries de {len(origem)} fontes em {base}.arrow")
+
+    _gravar_texto(os.path.join(diretorio, ARQUIVO_ULTIMO), identificador)
+    return manifesto
+
+
+def _gravar_json(caminho, dados):
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=1)
+    os.replace(caminho + '.tmp', caminho)
+
+
+def _gravar_texto(caminho, texto):
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(texto + '\n')
+    os.replace(caminho + '.tmp', caminho)
+
+
+def listar_snapshots(diretorio=DIRETORIO_SNAPSHOTS):
+    """Manifestos de todos os snapshots, do mais antigo ao mais recente"""
+    manifestos = []
+    for caminho in glob.glob(os.path.join(diretorio, 'snapshot-*.json')):
+        with open(caminho, encoding='utf-8') as f:
+            manifestos.append(json.load(f))
+    return sorted(manifestos, key=lambda m: m['criado_em'])
+
+
+def _resolver(identificador, diretorio):
+    """Id completo a partir de None (LATEST) ou de um prefixo"""
+    if identificador is None:
+        with open(os.path.join(diretorio, ARQUIVO_ULTIMO), encoding='utf-8') as f:
+            identificador = f.read().strip()
+    candidatos = glob.glob(os.path.join(diretorio, f'snapshot-{identificador[:16]}*.arrow'))
+    if len(candidatos) != 1:
+        raise KeyError(f"Snapshot não encontrado (ou prefixo ambíguo): {identificador}")
+    return candidatos[0]
+
+
+class Snapshot:
+    """Snapshot aberto por memory map; cada série é lida do seu próprio record batch"""
+
+    def __init__(self, identificador=None, diretorio=DIRETORIO_SNAPSHOTS):
+        _exigir_pyarrow()
+        self.caminho = _resolver(identificador, diretorio)
+        self._mapa = pa.memory_map(self.caminho, 'r')
+        self._leitor = ipc.open_file(self._mapa)
+        self.manifesto = json.loads(self._leitor.schema.metadata[b'manifesto'])
+        self.id = self.manifesto['id']
+
+    def series(self, fonte=None):
+        return sorted(s for s, info in self.manifesto['series'].items() if fonte is None or info['fonte'] == fonte)
+
+    def serie(self, nome):
+        """pandas.Series indexada pela data de início de cada período"""
+        lote = self._leitor.get_batch(self.manifesto['series'][nome]['lote'])
+        return pd.Series(lote.column('valor').to_numpy(zero_copy_only=False),
+                         index=pd.DatetimeIndex(lote.column('data').to_numpy(zero_copy_only=False)), name=nome)
+
+    def painel(self, nomes=None, frequencia=None):
+        """Séries lado a lado (colunas) — todas, as listadas ou as de uma frequência"""
+        nomes = nomes or [s for s in self.series()
+                          if frequencia is None or self.manifesto['series'][s]['frequencia'] == frequencia]
+        return pd.concat([self.serie(n) for n in nomes], axis=1) if nomes else pd.DataFrame()
+
+    def fechar(self):
+        self._mapa.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+def comparar_snapshots(antigo, novo, diretorio=DIRETORIO_SNAPSHOTS, detalhar=False):
+    """
+    Séries adicionadas, removidas e alteradas entre dois snapshots (ids ou prefixos)
+
+    Só os manifestos são lidos; com detalhar=True, as séries alteradas são abertas e
+    comparadas data a data (valores novos, removidos e revisados).
+    """
+    with Snapshot(antigo, diretorio) as a, Snapshot(novo, diretorio) as b:
+        series_a, series_b = a.manifesto['series'], b.manifesto['series']
+        alteradas = sorted(s for s in set(series_a) & set(series_b) if series_a[s]['sha256'] != series_b[s]['sha256'])
+        resultado = {
+            'antigo': a.id,
+            'novo': b.id,
+            'adicionadas': sorted(set(series_b) - set(series_a)),
+            'removidas': sorted(set(series_a) - set(series_b)),
+            'alteradas': alteradas,
+        }
+        if detalhar:
+            resultado['detalhes'] = {}
+            for nome in alteradas:
+                lado_a, lado_b = a.serie(nome).align(b.serie(nome), join='outer')
+                revisadas = lado_a.notna() & lado_b.notna() & ~np.isclose(lado_a, lado_b, equal_nan=True)
+                resultado['detalhes'][nome] = {
+                    'novas_datas': int((lado_a.isna() & lado_b.notna()).sum()),
+                    'datas_removidas': int((lado_a.notna() & lado_b.isna()).sum()),
+                    'valores_revisados': int(revisadas.sum()),
+                }
+    return resultado
+
+
+if __name__ == '__main__':
+    exportar_snapshot()
@@ -0,0 +1,243 @@
+### Hierarquia territorial do IBGE e agregação vetorizada município -> níveis superiores ###
+# O índice guarda os municípios ordenados e, para cada nível (microrregião, mesorregião, UF,
+# grande região, Brasil), um array com a posição do "pai" de cada município. Agregar para um
+# nível é um único np.bincount sobre (grupo, pai); com os mesmos arrays saem somas, médias
+# ponderadas pela população e os índices de Theil-T e MLD (decomponíveis) de cada território.
+# UF, região e Brasil vêm do próprio código do município; micro e mesorregião vêm da tabela de
+# municípios da API de localidades do IBGE.
+import os
+
+import numpy as np
+import pandas as pd
+
+# Códigos de nível territorial do SIDRA
+NIVEIS = {
+    6: 'Município',
+    9: 'Microrregião Geográfica',
+    8: 'Mesorregião Geográfica',
+    3: 'Unidade da Federação',
+    2: 'Grande Região',
+    1: 'Brasil',
+}
+ORDEM_NIVEIS = [6, 9, 8, 3, 2, 1]
+URL_MUNICIPIOS = 'https://servicodados.ibge.gov.br/api/v1/localidades/municipios'
+ARQUIVO_MUNICIPIOS = 'data/external/municipios_ibge.csv'
+
+
+def carregar_tabela_municipios(caminho=ARQUIVO_MUNICIPIOS, baixar=True, timeout=60):
+    """
+    Tabela municipio/microrregiao/mesorregiao (códigos IBGE)
+
+    Lida do CSV local; se não existir e baixar=True, vem da API de localidades e é salva.
+    """
+    if os.path.exists(caminho):
+        return pd.read_csv(caminho, dtype={'municipio': 'int64', 'microrregiao': 'int64', 'mesorregiao': 'int64'})
+    if not baixar:
+        raise FileNotFoundError(caminho)
+
+    import requests
+    print("📥 Baixando tabela de municípios do IBGE...")
+    resposta = requests.get(URL_MUNICIPIOS, timeout=timeout)
+    resposta.raise_for_status()
+    tabela = pd.DataFrame([
+        {
+            'municipio': m['id'],
+            'nome': m['nome'],
+            'microrregiao': m['microrregiao']['id'],
+            'mesorregiao': m['microrregiao']['mesorregiao']['id'],
+        }
+        for m in resposta.json()
+    ])
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    tabela.to_csv(caminho, index=False, encoding='utf-8')
+    print(f"✅ {len(tabela)} municípios salvos em {caminho}")
+    return tabela
+
+
+class IndiceTerritorial:
+    """Municípios ordenados e o array de pais de cada nível superior"""
+
+    def __init__(self, municipios, microrregioes=None, mesorregioes=None):
+        municipios = np.asarray(municipios, dtype='int64')
+        ordem = np.argsort(municipios, kind='stable')
+        self.municipios = municipios[ordem]
+        if np.any(self.municipios[1:] == self.municipios[:-1]):
+            raise ValueError("Código de município repetido no índice territorial")
+
+        uf = self.municipios // 100000
+        codigos_pai = {6: self.municipios, 3: uf, 2: uf // 10, 1: np.ones_like(uf)}
+        if microrregioes is not None:
+            codigos_pai[9] = np.asarray(microrregioes, dtype='int64')[ordem]
+        if mesorregioes is not None:
+            codigos_pai[8] = np.asarray(mesorregioes, dtype='int64')[ordem]
+
+        # codigos[nivel]: códigos ordenados do nível; pai[nivel][i]: posição do pai do município i
+        self.codigos, self.pai = {}, {}
+        for nivel, codigos in codigos_pai.items():
+            self.codigos[nivel], self.pai[nivel] = np.unique(codigos, return_inverse=True)
+
+    @classmethod
+    def de_tabela(cls, tabela=None):
+        """Índice completo (com micro e mesorregiões) a partir da tabela de municípios"""
+        tabela = carregar_tabela_municipios() if tabela is None else tabela
+        return cls(tabela['municipio'], tabela.get('microrregiao'), tabela.get('mesorregiao'))
+
+    @property
+    def niveis(self):
+        return [n for n in ORDEM_NIVEIS if n in self.codigos]
+
+    def posicoes(self, codigos_municipio):
+        """Posição de cada código de município no índice (KeyError para códigos desconhecidos)"""
+        codigos = np.asarray(codigos_municipio, dtype='int64')
+        posicoes = np.searchsorted(self.municipios, codigos)
+        encontrados = self.municipios[np.minimum(posicoes, len(self.municipios) - 1)] == codigos
+        if not encontrados.all():
+            desconhecidos = np.unique(codigos[~encontrados])
+            raise KeyError(f"Municípios fora do índice territorial: {desconhecidos[:10].tolist()}")
+        return posicoes
+
+    def pais(self, codigos_municipio, nivel):
+        """Código do território do nível pedido que contém cada município"""
+        return self.codigos[nivel][self.pai[nivel][self.posicoes(codigos_municipio)]]
+
+
+def _grupos(df, por):
+    """Código do grupo de cada linha e as chaves (uma linha por grupo)"""
+    if not por:
+        return np.zeros(len(df), dtype='int64'), pd.DataFrame(index=[0])
+    codigos = df.groupby(list(por), sort=True, dropna=False).ngroup().to_numpy(dtype='int64')
+    chaves = df[list(por)].iloc[np.unique(codigos, return_index=True)[1]].reset_index(drop=True)
+    return codigos, chaves
+
+
+def _montar(chaves, nivel, codigos_nivel, presentes, colunas):
+    """DataFrame longo (por..., nivel_territorial_codigo, territorio_codigo, colunas) das células presentes"""
+    n_unidades = len(codigos_nivel)
+    grupo, unidade = np.divmod(np.flatnonzero(presentes), n_unidades)
+    resultado = chaves.iloc[grupo].reset_index(drop=True)
+    resultado['nivel_territorial_codigo'] = nivel
+    resultado['territorio_codigo'] = codigos_nivel[unidade]
+    for nome, valores in colunas.items():
+        resultado[nome] = valores[presentes]
+    return resultado
+
+
+def agregar_niveis(df, indice, coluna_municipio, colunas_soma=(), colunas_media=(), coluna_peso=None,
+                   por=None, niveis=None):
+    """
+    Agrega dados municipais para todos os níveis do índice de uma vez
+
+    colunas_soma são somadas; colunas_media viram médias ponderadas por coluna_peso (ou simples).
+    Uma soma com alguma parte ausente (NaN) fica NaN, e n_faltantes_<coluna> conta as partes ausentes.
+    por: colunas que separam as séries (variável, ano, categoria...), agregadas em paralelo.
+    Retorna formato longo com nivel_territorial_codigo e territorio_codigo.
+    """
+    posicoes = indice.posicoes(df[coluna_municipio].to_numpy())
+    grupos, chaves = _grupos(df, por)
+    pesos = np.ones(len(df)) if coluna_peso is None else df[coluna_peso].to_numpy(dtype='float64', na_value=np.nan)
+    somas = {c: df[c].to_numpy(dtype='float64', na_value=np.nan) for c in colunas_soma}
+    medias = {c: df[c].to_numpy(dtype='float64', na_value=np.nan) for c in colunas_media}
+
+    partes = []
+    for nivel in niveis or indice.niveis:
+        codigos_nivel = indice.codigos[nivel]
+        celula = grupos * len(codigos_nivel) + indice.pai[nivel][posicoes]
+        tamanho = (grupos.max() + 1 if len(grupos) else 0) * len(codigos_nivel)
+
+        contagem = np.bincount(celula, minlength=tamanho)
+        colunas = {'n_municipios': contagem}
+        for nome, valores in somas.items():
+            ausentes = ~np.isfinite(valores)
+            faltantes = np.bincount(celula, weights=ausentes, minlength=tamanho).astype('int64')
+            soma = np.bincount(celula, weights=np.where(ausentes, 0.0, valores), minlength=tamanho)
+            colunas[nome] = np.where(faltantes > 0, np.nan, soma)
+            colunas[f'n_faltantes_{nome}'] = faltantes
+        for nome, valores in medias.items():
+            validos = np.isfinite(valores) & np.isfinite(pesos)
+            peso_total = np.bincount(celula[validos], weights=pesos[validos], minlength=tamanho)
+            ponderado = np.bincount(celula[validos], weights=pesos[validos] * valores[validos], minlength=tamanho)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                colunas[nome] = ponderado / peso_total
+        if coluna_peso is not None:
+            colunas[coluna_peso] = np.bincount(celula, weights=np.nan_to_num(pesos), minlength=tamanho)
+        partes.append(_montar(chaves, nivel, codigos_nivel, contagem > 0, colunas))
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def desigualdade_agregada(df, indice, coluna_municipio, coluna_populacao, coluna_renda_media,
+                          coluna_theil=None, coluna_mld=None, por=None, niveis=None):
+    """
+    Theil-T e MLD de cada território a partir dos municípios (população, renda média e,
+    se houver, os índices internos de cada município)
+
+    Sem os índices internos, o resultado é só a desigualdade entre municípios. Para o grupo g:
+      T_g = [Σ p·y·(T_i + ln y_i)] / Y_g - ln ȳ_g      L_g = [Σ p·(L_i - ln y_i)] / P_g + ln ȳ_g
+    O Gini não é decomponível e por isso não é agregado aqui.
+    """
+    populacao = df[coluna_populacao].to_numpy(dtype='float64', na_value=np.nan)
+    renda = df[coluna_renda_media].to_numpy(dtype='float64', na_value=np.nan)
+    theil = np.zeros(len(df)) if coluna_theil is None else df[coluna_theil].to_numpy(dtype='float64', na_value=np.nan)
+    mld = np.zeros(len(df)) if coluna_mld is None else df[coluna_mld].to_numpy(dtype='float64', na_value=np.nan)
+    validos = (populacao > 0) & (renda > 0) & np.isfinite(theil) & np.isfinite(mld)
+
+    df = df[validos]
+    populacao, renda, theil, mld = populacao[validos], renda[validos], theil[validos], mld[validos]
+    posicoes = indice.posicoes(df[coluna_municipio].to_numpy())
+    grupos, chaves = _grupos(df, por)
+    log_renda = np.log(renda)
+    massa = populacao * renda
+
+    partes = []
+    for nivel in niveis or indice.niveis:
+        codigos_nivel = indice.codigos[nivel]
+        celula = grupos * len(codigos_nivel) + indice.pai[nivel][posicoes]
+        tamanho = (grupos.max() + 1 if len(grupos) else 0) * len(codigos_nivel)
+
+        pop_total = np.bincount(celula, weights=populacao, minlength=tamanho)
+        massa_total = np.bincount(celula, weights=massa, minlength=tamanho)
+        soma_theil = np.bincount(celula, weights=massa * (theil + log_renda), minlength=tamanho)
+        soma_mld = np.bincount(celula, weights=populacao * (mld - log_renda), minlength=tamanho)
+        presentes = pop_total > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = massa_total / pop_total
+            colunas = {
+                coluna_populacao: pop_total,
+                coluna_renda_media: media,
+                'theil_t': soma_theil / massa_total - np.log(media),
+                'mld': soma_mld / pop_total + np.log(media),
+            }
+        partes.append(_montar(chaves, nivel, codigos_nivel, presentes, colunas))
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def agregar_sidra(df, indice, coluna_territorio='dimensao1_codigo', niveis=None):
+    """
+    Soma o 'valor' de um extrato SIDRA municipal (colunas já renomeadas) para os níveis superiores
+
+    Só faz sentido para unidades aditivas (pessoas, domicílios, R$ totais); as demais
+    dimensões e a unidade de medida separam as séries. O resultado mantém as colunas do
+    extrato, com o código do território em coluna_territorio e o nível em nivel_territorial_codigo.
+    O marcador '-' (zero absoluto) conta como zero; células com outros marcadores ('..', '...', 'X')
+    deixam o total NaN e são contadas em n_faltantes_valor.
+    """
+    municipais = df[df['nivel_territorial_codigo'].astype(str) == '6']
+    marcadores = (municipais['valor_marcador'] if 'valor_marcador' in municipais.columns
+                  else municipais['valor']).astype('string').str.strip()
+    # Linhas numéricas têm marcador <NA>: sem o fillna, o mask as trataria como '-' e zeraria o valor
+    zero_absoluto = (marcadores == '-').fillna(False).to_numpy(dtype=bool)
+    valor = pd.to_numeric(municipais['valor'], errors='coerce').mask(zero_absoluto, 0.0)
+    municipais = municipais.assign(valor=valor)
+    municipais = municipais[pd.to_numeric(municipais[coluna_territorio], errors='coerce').notna()]
+    municipais = municipais.assign(**{coluna_territorio: municipais[coluna_territorio].astype('int64')})
+    por = [c for c in municipais.columns
+           if c.startswith('dimensao') and c.endswith('_codigo') and c != coluna_territorio]
+    por += [c for c in ('unidade_medida_codigo',) if c in municipais.columns]
+
+    agregado = agregar_niveis(municipais, indice, coluna_territorio, colunas_soma=['valor'],
+                              por=por, niveis=[n for n in (niveis or indice.niveis) if n != 6])
+    agregado[coluna_territorio] = agregado.pop('territorio_codigo').astype(str)
+    agregado['nivel_territorial_codigo'] = agregado['nivel_territorial_codigo'].astype(str)
+    agregado['nivel_territorial_nome'] = agregado['nivel_territorial_codigo'].astype(int).map(NIVEIS)
+    return agregado
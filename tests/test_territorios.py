@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from territorios import IndiceTerritorial, agregar_sidra
+
+
+def _extrato(valores, marcadores):
+    municipios = ['1100015', '1100023', '3500105', '3500204']
+    return pd.DataFrame({
+        'nivel_territorial_codigo': '6',
+        'dimensao1_codigo': municipios,
+        'unidade_medida_codigo': '1',
+        'valor': pd.array(valores, dtype='Float64'),
+        'valor_marcador': pd.array(marcadores, dtype='string'),
+    })
+
+
+def _totais_uf(agregado):
+    ufs = agregado[agregado['nivel_territorial_codigo'] == '3']
+    return dict(zip(ufs['dimensao1_codigo'], ufs['valor']))
+
+
+def test_marcador_zero_absoluto_nao_zera_valores_numericos():
+    indice = IndiceTerritorial(np.array([1100015, 1100023, 3500105, 3500204]))
+    df = _extrato([10.0, None, 5.0, None], [None, '-', None, '-'])
+    agregado = agregar_sidra(df, indice)
+    assert _totais_uf(agregado) == {'11': 10.0, '35': 5.0}
+    assert (agregado['n_faltantes_valor'] == 0).all()
+
+
+def test_marcador_de_sigilo_deixa_total_ausente():
+    indice = IndiceTerritorial(np.array([1100015, 1100023, 3500105, 3500204]))
+    df = _extrato([10.0, None, 5.0, 2.0], [None, 'X', None, None])
+    totais = _totais_uf(agregar_sidra(df, indice))
+    assert np.isnan(totais['11'])
+    assert totais['35'] == 7.0
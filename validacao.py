@@ -0,0 +1,257 @@
+### Validação de qualidade dos dados com regras vetorizadas ###
+# Cada regra avalia a tabela inteira com operações de coluna (numpy/pandas) e devolve uma
+# máscara das linhas que a violam. validar() roda todas as regras de uma tabela numa passada
+# e acrescenta o relatório (uma linha JSON por tabela) em data/diagnostics/validacao.jsonl.
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_RELATORIOS = 'data/diagnostics'
+ARQUIVO_RELATORIO = os.path.join(DIRETORIO_RELATORIOS, 'validacao.jsonl')
+
+# Sinais do SIDRA/IBGE que viram NaN na conversão numérica:
+# '-' zero absoluto, '..' não se aplica, '...' não disponível, 'X' inibido (sigilo)
+MARCADORES_SIDRA = ('-', '..', '...', 'X')
+
+
+def _numerico(serie):
+    return pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _grupos(df, colunas):
+    """Código inteiro do grupo de cada linha (0 para todas se não houver colunas de grupo)"""
+    if not colunas:
+        return np.zeros(len(df), dtype='int64')
+    return df.groupby(list(colunas), sort=False, dropna=False).ngroup().to_numpy(dtype='int64')
+
+
+def _regra(nome, colunas, avaliar, nivel='erro', **parametros):
+    return {'regra': nome, 'colunas': list(colunas), 'nivel': nivel,
+            'parametros': parametros, 'avaliar': avaliar}
+
+
+# ---------------------------------------------------------------------- regras
+def nao_nulo(coluna, nivel='erro'):
+    """Valores ausentes na coluna"""
+    def avaliar(df):
+        return df[coluna].isna().to_numpy(), {}
+    return _regra('nao_nulo', [coluna], avaliar, nivel)
+
+
+def faixa(coluna, minimo=None, maximo=None, nivel='erro'):
+    """Valores fora de [minimo, maximo] (ausentes não contam como violação)"""
+    def avaliar(df):
+        valores = _numerico(df[coluna])
+        mascara = np.zeros(len(valores), dtype=bool)
+        if minimo is not None:
+            mascara |= valores < minimo
+        if maximo is not None:
+            mascara |= valores > maximo
+        return mascara, {}
+    return _regra('faixa', [coluna], avaliar, nivel, minimo=minimo, maximo=maximo)
+
+
+def datas_monotonas(coluna, por=None, estrita=True, nivel='erro'):
+    """Datas que não crescem em relação à linha anterior do mesmo grupo (na ordem da tabela)"""
+    def avaliar(df):
+        grupos = _grupos(df, por)
+        datas = pd.to_datetime(df[coluna], errors='coerce').to_numpy(dtype='datetime64[ns]').astype('int64')
+        ordem = np.argsort(grupos, kind='stable')
+        g, d = grupos[ordem], datas[ordem]
+        mesmo_grupo = g[1:] == g[:-1]
+        recuo = d[1:] <= d[:-1] if estrita else d[1:] < d[:-1]
+        mascara = np.zeros(len(df), dtype=bool)
+        mascara[ordem[1:][mesmo_grupo & recuo]] = True
+        return mascara, {}
+    return _regra('datas_monotonas', [coluna] + list(por or []), avaliar, nivel, estrita=estrita)
+
+
+def periodos_unicos(colunas, nivel='erro'):
+    """Linhas repetidas para a mesma chave (período e, se houver, grupo); a primeira não conta"""
+    def avaliar(df):
+        return df.duplicated(subset=list(colunas), keep='first').to_numpy(), {}
+    return _regra('periodos_unicos', colunas, avaliar, nivel)
+
+
+def sem_lacunas(coluna, frequencia='M', por=None, nivel='aviso'):
+    """Períodos faltantes entre observações consecutivas do mesmo grupo (marca a linha após a lacuna)"""
+    def avaliar(df):
+        grupos = _grupos(df, por)
+        datas = pd.to_datetime(df[coluna], errors='coerce')
+        validas = datas.notna().to_numpy()
+        ordinais = np.full(len(df), np.iinfo('int64').min, dtype='int64')
+        ordinais[validas] = pd.PeriodIndex(datas[validas], freq=frequencia).asi8
+        ordem = np.lexsort((ordinais, grupos))
+        ordem = ordem[validas[ordem]]
+        g, o = grupos[ordem], ordinais[ordem]
+        saltos = np.diff(o)
+        lacuna = (g[1:] == g[:-1]) & (saltos > 1)
+        mascara = np.zeros(len(df), dtype=bool)
+        mascara[ordem[1:][lacuna]] = True
+        return mascara, {'periodos_faltantes': int((saltos[lacuna] - 1).sum())}
+    return _regra('sem_lacunas', [coluna] + list(por or []), avaliar, nivel, frequencia=frequencia)
+
+
+def soma_igual(coluna, total=100.0, tolerancia=1.0, por=None, nivel='erro'):
+    """Grupos cuja soma da coluna difere de total por mais que a tolerância (marca todas as linhas do grupo)"""
+    def avaliar(df):
+        grupos = _grupos(df, por)
+        valores = np.nan_to_num(_numerico(df[coluna]))
+        somas = np.bincount(grupos, weights=valores)
+        desvio = np.abs(somas - total)
+        violados = desvio > tolerancia
+        detalhe = {'grupos_violados': int(violados.sum()),
+                   'maior_desvio': round(float(desvio.max()), 6) if len(desvio) else 0.0}
+        return violados[grupos], detalhe
+    return _regra('soma_igual', [coluna] + list(por or []), avaliar, nivel,
+                  total=total, tolerancia=tolerancia)
+
+
+def unidade_consistente(coluna_unidade, por, nivel='erro'):
+    """Grupos (ex.: cada variável) com mais de uma unidade de medida"""
+    def avaliar(df):
+        grupos = _grupos(df, por)
+        unidades, valores_unidade = pd.factorize(df[coluna_unidade], use_na_sentinel=False)
+        n_unidades = max(len(valores_unidade), 1)
+        pares = np.unique(grupos * n_unidades + unidades)
+        unidades_por_grupo = np.bincount(pares // n_unidades)
+        violados = unidades_por_grupo > 1
+        return violados[grupos], {'grupos_violados': int(violados.sum())}
+    return _regra('unidade_consistente', [coluna_unidade] + list(por), avaliar, nivel)
+
+
+def sem_marcadores(coluna, marcadores=MARCADORES_SIDRA, nivel='aviso'):
+    """Células com sinais de dado não numérico (ex.: '..' do SIDRA) que virariam NaN"""
+    def avaliar(df):
+        serie = df[coluna]
+        if pd.api.types.is_numeric_dtype(serie):
+            return np.zeros(len(df), dtype=bool), {}
+        mascara = serie.astype('string').str.strip().isin(marcadores).to_numpy(dtype=bool, na_value=False)
+        contagem = serie[mascara].astype('string').str.strip().value_counts()
+        return mascara, {'por_marcador': {str(k): int(v) for k, v in contagem.items()}}
+    return _regra('sem_marcadores', [coluna], avaliar, nivel, marcadores=list(marcadores))
+
+
+# ---------------------------------------------------------------------- conjuntos de regras
+def regras_serie_mensal(coluna_data, coluna_valor, minimo=None, maximo=None):
+    """Série mensal: datas presentes, crescentes, sem repetição e sem meses faltando"""
+    return [
+        nao_nulo(coluna_data),
+        nao_nulo(coluna_valor),
+        datas_monotonas(coluna_data),
+        periodos_unicos([coluna_data]),
+        sem_lacunas(coluna_data, 'M'),
+        faixa(coluna_valor, minimo, maximo),
+    ]
+
+
+def regras_sidra(df):
+    """
+    Tabela SIDRA já com as colunas renomeadas (MAPEAMENTO_IBGE)
+
+    A dimensão da variável é a que tem o rótulo 'Variável' na linha de rótulos do sidrapy
+    (a ordem das dimensões muda entre tabelas); cada variável deve ter uma só unidade.
+    """
+    regras = []
+    if 'valor' in df.columns:
+        regras.append(sem_marcadores('valor'))
+    variavel = _dimensao_variavel(df)
+    if 'unidade_medida_codigo' in df.columns and variavel:
+        regras.append(unidade_consistente('unidade_medida_codigo', [variavel]))
+    dimensoes = [c for c in df.columns if c.startswith('dimensao') and c.endswith('_codigo')]
+    if dimensoes:
+        regras.append(periodos_unicos(dimensoes))
+    return regras
+
+
+def _dimensao_variavel(df):
+    for k in range(1, 10):
+        nome, codigo = f'dimensao{k}_nome', f'dimensao{k}_codigo'
+        if nome in df.columns and codigo in df.columns and (df[nome].head(1) == 'Variável').any():
+            return codigo
+    return None
+
+
+def regras_distribuicao_classes():
+    """Distribuição por classe social: percentuais entre 0 e 100 somando 100"""
+    return [
+        nao_nulo('classe_social'),
+        periodos_unicos(['classe_social']),
+        faixa('percentual_populacao', 0, 100),
+        faixa('renda_media_mensal', 0),
+        soma_igual('percentual_populacao', 100, tolerancia=1.0),
+    ]
+
+
+# ---------------------------------------------------------------------- execução
+def _exemplo(valor):
+    if isinstance(valor, (np.integer, np.floating)):
+        return valor.item()
+    if isinstance(valor, (int, float, str)):
+        return valor
+    return str(valor)
+
+
+def validar(df, regras, tabela, destino=ARQUIVO_RELATORIO, max_exemplos=5, silencioso=False):
+    """
+    Avalia todas as regras sobre a tabela e grava o relatório
+
+    Retorna o relatório (dict); 'ok' é falso se alguma regra de nível 'erro' tiver violações.
+    """
+    inicio = time.perf_counter()
+    resultados = []
+    for regra in regras:
+        resultado = {k: regra[k] for k in ('regra', 'colunas', 'nivel', 'parametros')}
+        try:
+            mascara, detalhe = regra['avaliar'](df)
+            posicoes = np.flatnonzero(mascara)
+            resultado.update(
+                violacoes=int(len(posicoes)),
+                exemplos=[_exemplo(v) for v in df.index[posicoes[:max_exemplos]]],
+                **detalhe,
+            )
+        except Exception as e:
+            # Coluna ausente ou tipo inesperado: a regra conta como violada
+            resultado.update(violacoes=None, falha=f"{type(e).__name__}: {e}")
+        resultados.append(resultado)
+
+    relatorio = {
+        'tabela': tabela,
+        'validado_em': datetime.now().isoformat(timespec='seconds'),
+        'linhas': int(len(df)),
+        'segundos': round(time.perf_counter() - inicio, 6),
+        'ok': all(r['nivel'] != 'erro' or r['violacoes'] == 0 for r in resultados),
+        'regras': resultados,
+    }
+
+    if destino:
+        gravar_relatorio(relatorio, destino)
+
+    if not silencioso:
+        _imprimir(relatorio)
+    return relatorio
+
+
+def gravar_relatorio(relatorio, destino=ARQUIVO_RELATORIO):
+    """Acrescenta um relatório ao JSONL (usado também para relatórios gerados em outros processos)"""
+    os.makedirs(os.path.dirname(destino) or '.', exist_ok=True)
+    with open(destino, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(relatorio, ensure_ascii=False) + '\n')
+
+
+def _imprimir(relatorio):
+    problemas = [r for r in relatorio['regras'] if r['violacoes'] != 0]
+    if not problemas:
+        print(f"✅ Validação {relatorio['tabela']}: {len(relatorio['regras'])} regras ok "
+              f"({relatorio['linhas']} linhas)")
+        return
+    simbolo = '✅' if relatorio['ok'] else '❌'
+    print(f"{simbolo} Validação {relatorio['tabela']}: {len(problemas)} de {len(relatorio['regras'])} regras com ocorrências")
+    for r in problemas:
+        alerta = '⚠️ ' if r['nivel'] == 'aviso' else '❌'
+        descricao = r.get('falha') or f"{r['violacoes']} linhas"
+        print(f"   {alerta} {r['regra']}({', '.join(r['colunas'])}): {descricao}")